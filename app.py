@@ -2,14 +2,31 @@
 # AI Workflow Optimizer — Custom workflow input → AI-optimized workflow
 # =========================
 
-import json
-import time
-import streamlit as st
-from openai import OpenAI
-from openai import RateLimitError, APIError, APITimeoutError
+from collections.abc import Mapping
 
-from process_library import DOMAINS, TOOL_LIBRARY, get_default_steps
+import uuid
 
+import streamlit as st
+
+from process_library import (
+    DOMAINS, LIBRARY_INDEX, TIME_HORIZONS, INDUSTRIES, MATURITY_LEVELS, CONSTRAINT_OPTIONS, get_default_steps,
+)
+from prompt_builder import MAX_INPUT_STEPS, MAX_LONG_STEPS, PROMPT_VERSION, clean_lines, request_fields
+from result_cache import ResultCache, make_cache_key
+from snapshot_pack import SnapshotPack
+from similarity_cache import SimilarityCache
+from speculation import Speculator
+from singleflight import SingleFlight
+from local_optimizer import optimize_locally
+from flow_html import MAX_FLOW_STEPS, flow_html, page_starts
+from metrics import configure_logging, inc, span, write_metrics_file
+from schema_validator import ResultValidator
+from engine import Engine
+from segmented import MAX_SEGMENT_STEPS, generate_segmented, preview_segmented
+from llm_client import get_client
+
+
+configure_logging()
 
 # -------------------------
 # Page config
@@ -137,185 +154,124 @@ if "last_result" not in st.session_state:
     st.session_state.last_result = None
 if "last_error" not in st.session_state:
     st.session_state.last_error = None
+# Non-fatal status, e.g. "showing the rule-based result" in degraded mode
+if "last_notice" not in st.session_state:
+    st.session_state.last_notice = None
 # We still keep last_raw in state for internal repair logic (not displayed)
 if "last_raw" not in st.session_state:
     st.session_state.last_raw = None
+# Inputs the last result was generated from (fallback labels in the results view)
+if "last_fields" not in st.session_state:
+    st.session_state.last_fields = None
+
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # keys this session's speculative job
 
 
 # -------------------------
-# Helpers
+# Result cache (shared across sessions; disk level shared across processes)
 # -------------------------
-def clean_lines(text: str) -> list[str]:
-    lines = []
-    for raw in (text or "").splitlines():
-        s = raw.strip()
-        if not s:
-            continue
-        s = s.replace("•", "-").strip()
-        if len(s) > 140:
-            s = s[:140]
-        lines.append(s)
-    return lines[:18]
-
-def extract_json_object(text: str) -> str | None:
-    """Extract the first complete top-level JSON object from a string."""
-    if not text:
-        return None
-    start = text.find("{")
-    if start == -1:
-        return None
-    depth, in_str, escape = 0, False, False
-    for i in range(start, len(text)):
-        ch = text[i]
-        if in_str:
-            if escape:
-                escape = False
-            elif ch == "\\":
-                escape = True
-            elif ch == '"':
-                in_str = False
-        else:
-            if ch == '"':
-                in_str = True
-            elif ch == "{":
-                depth += 1
-            elif ch == "}":
-                depth -= 1
-                if depth == 0:
-                    return text[start:i+1]
-    return None
-
-def parse_json_safely(raw: str) -> dict:
-    raw = (raw or "").strip()
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    return ResultCache()
+
+
+@st.cache_resource
+def get_similarity_cache() -> SimilarityCache:
+    """Near-duplicate index over the result cache (reuse, or seed a steps-only delta request)."""
+    return SimilarityCache(get_result_cache())
+
+
+@st.cache_resource
+def get_snapshot_pack() -> SnapshotPack:
+    """Precomputed results for the library templates (empty if snapshot_pack.py was never built)."""
+    return SnapshotPack.load()
+
+
+@st.cache_resource
+def get_speculator() -> Speculator:
+    """Background generation pool shared by all sessions (one latest-wins job per session)."""
+    return Speculator(cache=get_result_cache(), validator=get_validator())
+
+
+@st.cache_resource
+def get_validator() -> ResultValidator:
+    from process_library import TOOL_LIBRARY  # lazily loaded from the library pack
+
+    return ResultValidator(TOOL_LIBRARY)
+
+
+@st.cache_resource
+def get_inflight() -> SingleFlight:
+    """Coalesces identical concurrent requests across sessions (keyed on the cache key)."""
+    return SingleFlight()
+
+
+@st.cache_resource
+def get_engine(api_key: str) -> Engine:
+    """Headless pipeline wired to the shared caches, snapshot pack, validator and in-flight table."""
+    return Engine(
+        api_key,
+        cache=get_result_cache(),
+        snapshots=get_snapshot_pack(),
+        validator=get_validator(),
+        inflight=get_inflight(),
+        similar=get_similarity_cache(),
+    )
+
+
+def has_api_key() -> bool:
     try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        extracted = extract_json_object(raw)
-        if extracted:
-            return json.loads(extracted)
-        raise
-
-def call_openai_with_retry(client: OpenAI, messages, max_retries: int = 3, max_tokens: int = 2000):
-    last_err = None
-    for attempt in range(max_retries):
-        try:
-            return client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=messages,
-                temperature=0.10,
-                max_tokens=max_tokens,
-                response_format={"type": "json_object"},
-            )
-        except (RateLimitError, APITimeoutError, APIError) as e:
-            last_err = e
-            time.sleep(1.2 * (2 ** attempt))
-    raise last_err
-
-def try_repair_json(client: OpenAI, raw_partial: str) -> str:
-    """If model output gets truncated, ask it to output the complete valid JSON object."""
-    repair_prompt = f"""
-You returned an incomplete/truncated JSON object. Return ONLY one complete valid JSON object.
-
-Rules:
-- Output must be a single JSON object (no markdown, no extra commentary).
-- Preserve the same schema and keys.
-- Complete any open arrays/objects and missing fields.
-- Ensure JSON is valid.
-
-PARTIAL_JSON_START:
-{raw_partial}
-PARTIAL_JSON_END
-""".strip()
-
-    messages = [
-        {"role": "system", "content": "Return ONLY one valid JSON object. No markdown."},
-        {"role": "user", "content": repair_prompt},
-    ]
-    resp = call_openai_with_retry(client, messages, max_retries=2, max_tokens=1800)
-    return resp.choices[0].message.content or ""
-
-
-ICON = {
-    "HUMAN": "👤",
-    "ERP": "🧾",
-    "AI": "🤖",
-    "AI+HUMAN": "🤖👤",
-    "AI+ERP": "🤖🧾",
-    "AI+ERP+HUMAN": "🤖🧾👤"
-}
+        return "OPENAI_API_KEY" in st.secrets and bool(str(st.secrets["OPENAI_API_KEY"]).strip())
+    except FileNotFoundError:  # no secrets.toml at all: same as no key
+        return False
 
-def normalize_actor(actor: str) -> str:
-    a = (actor or "HUMAN").upper().replace(" ", "")
-    if a in ("HUMAN", "PERSON"):
-        return "HUMAN"
-    if a in ("ERP", "SYSTEM"):
-        return "ERP"
-    if a in ("AI", "LLM"):
-        return "AI"
-    if "+" in a:
-        parts = [p for p in a.split("+") if p]
-        allowed = [p for p in parts if p in ("AI", "ERP", "HUMAN")]
-        if len(allowed) >= 2:
-            order = {"AI": 0, "ERP": 1, "HUMAN": 2}
-            allowed = sorted(set(allowed), key=lambda x: order.get(x, 99))
-            a2 = "+".join(allowed)
-            return a2 if a2 in ICON else "AI+ERP+HUMAN"
-    return "HUMAN"
-
-def chip_class(actor: str) -> str:
-    a = (actor or "").upper().replace(" ", "")
-    if "+" in a:
-        return "chip chip-mixed"
-    if a == "AI":
-        return "chip chip-ai"
-    if a == "ERP":
-        return "chip chip-erp"
-    return "chip chip-human"
-
-def shorten_label(label: str) -> str:
-    if not label:
-        return "Step"
-    words = label.strip().split()
-    return " ".join(words[:3]) if len(words) > 3 else " ".join(words)
-
-def render_vertical_flow(steps, highlight_future: bool = False):
+
+# -------------------------
+# Helpers
+# -------------------------
+def render_vertical_flow(steps, highlight_future: bool = False, target=None, start: int = 0):
+    # target: optional st.empty() placeholder, so streamed steps re-draw in place
+    target = target or st
     if not isinstance(steps, list) or len(steps) == 0:
-        st.info("No steps to display.")
+        target.info("No steps to display.")
         return
-
-    blocks = []
-    capped = steps[:12]
-    for i, s in enumerate(capped):
-        sid = (s.get("id") or "").strip()
-        label = shorten_label((s.get("label") or "").strip())
-        actor = normalize_actor(s.get("actor") or "HUMAN")
-        intent = (s.get("intent") or "").strip()
-        icon = ICON.get(actor, "👤")
-
-        ai_step = ("AI" in actor)
-        human_upshift = (intent in ("Decision", "Relationship"))
-
-        step_classes = ["step"]
-        if highlight_future and ai_step:
-            step_classes.append("ai-highlight")
-        if highlight_future and human_upshift:
-            step_classes.append("human-upshift")
-
-        id_html = f'<span class="idpill">{sid}</span>' if sid else ""
-        tag_html = f'<span class="tag">{intent}</span>' if intent else ""
-
-        blocks.append(f"""
-          <div class="{' '.join(step_classes)}">
-            <div class="step-row">
-              <div class="step-label">{id_html}{tag_html}{label}</div>
-              <div class="{chip_class(actor)}">{icon} {actor}</div>
-            </div>
-          </div>
-        """)
-        if i != len(capped) - 1:
-            blocks.append('<div class="arrow-down">↓</div>')
-
-    st.markdown(f'<div class="flow-vertical">{"".join(blocks)}</div>', unsafe_allow_html=True)
+    target.markdown(flow_html(steps, highlight_future, start), unsafe_allow_html=True)
+
+def page_picker(n: int, key: str) -> int:
+    """Start index of the chosen page; no control for flows that fit on one page."""
+    starts = page_starts(n)
+    if len(starts) == 1:
+        return 0
+    return st.selectbox(
+        "Steps", starts, key=key,
+        format_func=lambda i: f"{i + 1}–{min(i + MAX_FLOW_STEPS, n)} of {n}",
+    )
+
+# Long flows render one page at a time; paging reruns only the fragment.
+@st.fragment
+def paged_flow(steps: list, highlight_future: bool, key: str):
+    render_vertical_flow(steps, highlight_future, start=page_picker(len(steps), key))
+
+@st.fragment
+def step_mapping(future_steps: list):
+    start = page_picker(len(future_steps), "page_mapping")
+    # One markdown element for all rows (was one per row).
+    rows = []
+    for fs in future_steps[start:start + MAX_FLOW_STEPS]:
+        fid = fs.get("id", "")
+        flabel = fs.get("label", "")
+        fmaps = fs.get("maps_to", [])
+        if not isinstance(fmaps, list):
+            fmaps = []
+        left = f"<div class='mapping-title'>Future: {fid} — {flabel}</div>"
+        right_ids = ", ".join(fmaps) if fmaps else "(no mapping provided)"
+        right = f"<div class='mapping-title'>Replaces/absorbs: {right_ids}</div>"
+        rows.append(
+            f'<div class="mapping-row"><div class="mapping-left">{left}</div>'
+            f'<div class="mapping-right">{right}</div></div>'
+        )
+    st.markdown(f'<div>{"".join(rows)}</div>', unsafe_allow_html=True)
 
 
 def safe_list(x):
@@ -326,220 +282,224 @@ def safe_str(x, fallback=""):
 
 
 # -------------------------
-# UI controls (renamed)
+# Cascaded selection helpers (process search → selectboxes)
 # -------------------------
-functional_domain = st.selectbox("Functional Domain", list(DOMAINS.keys()))
-process_workflows = list(DOMAINS[functional_domain].keys())
-process_workflow = st.selectbox("Process Workflow", process_workflows)
+CASCADE_KEYS = ("sel_domain", "sel_workflow", "sel_sub_process")
 
-sub_processes_dict = DOMAINS[functional_domain][process_workflow].get("sub_processes", {}) or {}
-sub_process_options = list(sub_processes_dict.keys()) if isinstance(sub_processes_dict, dict) else []
+def reset_below(key: str):
+    """A parent selectbox changed: drop child selections so they re-default to the first option."""
+    for k in CASCADE_KEYS[CASCADE_KEYS.index(key) + 1:]:
+        st.session_state.pop(k, None)
 
-sub_process = st.selectbox(
-    "Sub Process (please select from the drop down)",
-    sub_process_options if sub_process_options else ["(No sub-processes configured)"],
-    disabled=(len(sub_process_options) == 0)
-)
+def apply_process_pick(entry):
+    st.session_state.sel_domain = entry.domain
+    st.session_state.sel_workflow = entry.workflow
+    st.session_state.sel_sub_process = entry.sub_process
 
-time_horizon = st.selectbox(
-    "Optimization time horizon",
-    [
-        "Next 6–12 months (practical quick wins)",
-        "1–2 years (scaled adoption)",
-        "3–5 years (operating model shift)"
-    ],
-    index=0
-)
-
-industry = st.selectbox(
-    "Industry context",
-    [
-        "General / Cross-industry",
-        "Technology / Software",
-        "Telecom / ICT",
-        "Financial Services",
-        "Healthcare",
-        "Manufacturing",
-        "Retail / eCommerce",
-        "Hospitality",
-        "Energy / Utilities",
-        "Government / Public sector"
-    ],
-    index=0
-)
-
-maturity = st.selectbox(
-    "Today’s automation maturity",
-    [
-        "Low (email + spreadsheets heavy)",
-        "Medium (ERP exists, many manual handoffs/exceptions)",
-        "High (standardized workflows + reporting, limited manual touchpoints)"
-    ],
-    index=1
-)
 
-constraints = st.multiselect(
-    "Constraints (choose what applies)",
-    [
-        "Strict approvals & segregation of duties (SoD)",
-        "Weak data quality / master data issues",
-        "Legacy ERP / many point solutions",
-        "Supplier/customer variability",
-        "Strong compliance / audit requirements",
-        "Cyber / privacy restrictions",
-        "Heavy exception volumes"
-    ],
-    default=[]
-)
-
-workflow_goal = DOMAINS[functional_domain][process_workflow].get("goal", "")
-sub_process_goal = ""
-if isinstance(sub_processes_dict, dict) and sub_process in sub_processes_dict:
-    sub_process_goal = sub_processes_dict[sub_process].get("goal", "")
-
-prefill_steps = get_default_steps(functional_domain, process_workflow, sub_process)
-prefill_text = "\n".join(prefill_steps) if prefill_steps else ""
-
-st.markdown("### Your current workflow (editable)")
-current_workflow_text = st.text_area(
-    "Enter one step per line (you can edit the template below).",
-    value=prefill_text,
-    height=220,
-)
+# -------------------------
+# Inputs + Generate (fragment)
+# Widget interactions inside the fragment rerun only the fragment, so tweaking
+# inputs doesn't re-inject CSS or re-render the (large) results section.
+# A full-app rerun is triggered only once a new result/error has been stored.
+# -------------------------
+@st.fragment
+def input_panel():
+    query = st.text_input("Find a process (searches sub-processes, goals and steps)", key="process_query")
+    if query.strip():
+        matches = LIBRARY_INDEX.search(query, limit=10)
+        if matches:
+            pick = st.selectbox(
+                "Matching processes",
+                matches,
+                format_func=lambda e: f"{e.sub_process} — {e.workflow} ({e.domain})",
+            )
+            st.button("Use this process", on_click=apply_process_pick, args=(pick,))
+        else:
+            st.caption("No matching processes.")
+
+    functional_domain = st.selectbox(
+        "Functional Domain", list(DOMAINS.keys()), key="sel_domain", on_change=reset_below, args=("sel_domain",)
+    )
+    process_workflows = list(DOMAINS[functional_domain].keys())
+    process_workflow = st.selectbox(
+        "Process Workflow", process_workflows, key="sel_workflow", on_change=reset_below, args=("sel_workflow",)
+    )
+
+    sub_processes_dict = DOMAINS[functional_domain][process_workflow].get("sub_processes", {}) or {}
+    sub_process_options = list(sub_processes_dict.keys()) if isinstance(sub_processes_dict, Mapping) else []
+
+    sub_process = st.selectbox(
+        "Sub Process (please select from the drop down)",
+        sub_process_options if sub_process_options else ["(No sub-processes configured)"],
+        disabled=(len(sub_process_options) == 0),
+        key="sel_sub_process",
+    )
+
+    time_horizon = st.selectbox(
+        "Optimization time horizon",
+        TIME_HORIZONS,
+        index=0
+    )
+
+    industry = st.selectbox(
+        "Industry context",
+        INDUSTRIES,
+        index=0
+    )
+
+    maturity = st.selectbox(
+        "Today’s automation maturity",
+        MATURITY_LEVELS,
+        index=1
+    )
+
+    constraints = st.multiselect(
+        "Constraints (choose what applies)",
+        CONSTRAINT_OPTIONS,
+        default=[]
+    )
+
+    prefill_steps = get_default_steps(functional_domain, process_workflow, sub_process)
+    prefill_text = "\n".join(prefill_steps) if prefill_steps else ""
+
+    st.markdown("### Your current workflow (editable)")
+    current_workflow_text = st.text_area(
+        "Enter one step per line (you can edit the template below).",
+        value=prefill_text,
+        height=220,
+    )
+
+    extra_notes = st.text_area("Optional notes (1–2 lines)", height=70)
+
+    long_mode = st.checkbox(
+        f"Long workflow mode: split into segments and optimize them in parallel (up to {MAX_LONG_STEPS} steps)",
+        value=False,
+    )
+    stream_output = st.checkbox("Show steps as they are generated (streaming)", value=True)
+    pipelined = st.checkbox(
+        "Pipeline mode: steps first, then glossary/tools/deltas/notes in parallel",
+        value=False,
+    )
+    compact = st.checkbox("Compact output format (fewer output tokens)", value=False)
+    speculate = st.checkbox(
+        "Start generating in the background while I fill in the form (uses extra tokens)",
+        value=False,
+        key="speculate",
+    )
+
+    generate = st.button("Generate optimized workflow")
+
+    steps = clean_lines(current_workflow_text, MAX_LONG_STEPS)
+    if not long_mode and len(steps) > MAX_INPUT_STEPS:
+        st.caption(
+            f"Only the first {MAX_INPUT_STEPS} of {len(steps)} steps are used — "
+            "turn on long workflow mode to optimize all of them."
+        )
+        steps = steps[:MAX_INPUT_STEPS]
+    fields = request_fields(
+        functional_domain, process_workflow, sub_process, time_horizon,
+        industry, maturity, constraints, extra_notes, steps,
+    )
+
+    if not generate:
+        # Every input change reruns this fragment: hand the latest inputs to the
+        # speculator, which supersedes the previous job and waits for them to settle.
+        segmented = long_mode and len(steps) > MAX_SEGMENT_STEPS
+        if not speculate or len(steps) < 4 or segmented or not has_api_key():
+            get_speculator().cancel(st.session_state.session_id)
+        elif get_snapshot_pack().get(make_cache_key(fields, PROMPT_VERSION)) is None:
+            get_speculator().submit(
+                st.session_state.session_id, fields, get_client(str(st.secrets["OPENAI_API_KEY"]))
+            )
+        return
 
-extra_notes = st.text_area("Optional notes (1–2 lines)", height=70)
+    if len(steps) < 4:
+        st.warning("Please enter at least 4 workflow steps (one per line).")
+        return
 
-generate = st.button("Generate optimized workflow")
+    with span("generate"):
+        run_generation(fields, stream_output, pipelined, compact, long_mode)
+    write_metrics_file()
+    st.rerun()  # kept outside run_generation's try/except so the rerun signal propagates
 
 
 # -------------------------
 # Generate (robust) → store in session_state
 # -------------------------
-if generate:
+def run_generation(
+    fields: dict, stream_output: bool, pipelined: bool = False, compact: bool = False, long_mode: bool = False,
+) -> None:
+    """Produce a result for `fields` via the engine and store it in session_state."""
     st.session_state.last_error = None
+    st.session_state.last_notice = None
     st.session_state.last_raw = None  # keep for internal repair, not displayed
+    st.session_state.last_fields = fields
 
-    steps = clean_lines(current_workflow_text)
-    if len(steps) < 4:
-        st.warning("Please enter at least 4 workflow steps (one per line).")
-        st.stop()
-
-    if "OPENAI_API_KEY" not in st.secrets or not str(st.secrets["OPENAI_API_KEY"]).strip():
-        st.error("Missing OPENAI_API_KEY in Streamlit Secrets.")
-        st.stop()
-
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    tool_lib_json = json.dumps(TOOL_LIBRARY, ensure_ascii=False)
-
-    prompt = f"""
-Return ONLY one valid JSON object (no markdown, no extra text).
-
-You are an evidence-minded operating model + process analyst.
-Transform the user's CURRENT workflow into an optimized workflow for the selected time horizon.
-
-Rules:
-- Use the user's input steps as baseline.
-- You may reorder, merge, rename, or add up to 2 missing control steps.
-- Keep step labels short: 1–2 words (max 3).
-- Include at least one explicit Control checkpoint.
-- Prefer "assist/augment" over "replace".
-
-Actors:
-- today_steps actor: HUMAN or ERP only
-- future_steps actor: HUMAN, ERP, AI, AI+HUMAN, AI+ERP, AI+ERP+HUMAN
-
-Intent: Admin / Control / Decision / Relationship
-- Today should skew more Admin.
-- Future should increase Decision + Relationship for HUMAN-owned steps.
-
-Mapping requirement:
-- Every future step MUST include maps_to: array of TODAY step ids it replaces/absorbs.
-
-Tools:
-Use ONLY the provided TOOL_LIBRARY. Do NOT invent tools.
-Return exactly 4 tool suggestions.
-
-Terminology:
-Provide a glossary of 6 terms used.
-
-TOOL_LIBRARY (JSON):
-{tool_lib_json}
-
-JSON schema (exact keys):
-functional_domain (string)
-process_workflow (string)
-sub_process (string)
-time_horizon (string)
-today_steps (array of 6–12 objects):
-  id ("T1".."T12"), label, actor ("HUMAN"|"ERP"), intent
-future_steps (array of 6–12 objects):
-  id ("F1".."F12"), label, actor, intent, maps_to (array of today ids)
-human_shift (array of 3 strings)
-deltas (array of 4 strings)
-glossary (array of 6 objects: term, definition)
-tool_suggestions (array of 4 objects: tool_category, example_tools (1–3), use_in_workflow, fit_notes)
-notes (array of 3 strings)
-
-Context:
-Functional Domain: {functional_domain}
-Process Workflow: {process_workflow}
-Sub Process: {sub_process}
-Time horizon: {time_horizon}
-Workflow goal: {workflow_goal}
-Sub-process goal: {sub_process_goal if sub_process_goal else "None"}
-Industry: {industry}
-Today maturity: {maturity}
-Constraints: {", ".join(constraints) if constraints else "None"}
-User notes: {(extra_notes.strip() if extra_notes else "None")}
-
-User CURRENT workflow steps (one per line):
-{chr(10).join(steps)}
-""".strip()
-
-    messages = [
-        {"role": "system", "content": "Return ONLY one valid JSON object. No markdown. No extra keys."},
-        {"role": "user", "content": prompt}
-    ]
+    engine = get_engine(str(st.secrets["OPENAI_API_KEY"]).strip() if has_api_key() else "")
+    hit = engine.lookup(fields)
+    if hit is not None:
+        # Untouched library template or cache hit: identical inputs + prompt version → skip the LLM.
+        st.session_state.last_result = hit.data
+        return
+
+    # Rule-based answer (< 1 ms): shown while the LLM works, and kept if the LLM is unavailable.
+    # Without long mode, up to MAX_INPUT_STEPS steps go out as one request.
+    segmented = long_mode and len(fields["steps"]) > MAX_SEGMENT_STEPS
+    preview = preview_segmented(fields) if segmented else optimize_locally(fields)
+
+    live = st.empty()
+    if engine.api_key:
+        with live.container():
+            st.markdown("#### Generating (rule-based preview shown until the AI result arrives)")
+            lc1, lc2 = st.columns(2)
+            slots = {"today_steps": lc1.empty(), "future_steps": lc2.empty()}
+        render_vertical_flow(preview["today_steps"], highlight_future=False, target=slots["today_steps"])
+        render_vertical_flow(preview["future_steps"], highlight_future=True, target=slots["future_steps"])
+
+    def on_steps(key: str, steps: list[dict]):
+        # Each streamed step replaces the preview as soon as its JSON object closes
+        # (long flows: the last page, where the newest steps are).
+        start = max(0, len(steps) - MAX_FLOW_STEPS)
+        render_vertical_flow(steps, highlight_future=(key == "future_steps"), target=slots[key], start=start)
 
     with st.spinner("Generating optimized workflow…"):
         try:
-            resp = call_openai_with_retry(client, messages, max_retries=3, max_tokens=2000)
-            raw = resp.choices[0].message.content or ""
-            st.session_state.last_raw = raw
-
-            # First parse attempt
-            try:
-                data = parse_json_safely(raw)
-            except Exception:
-                # If truncated, try repair once
-                repaired = try_repair_json(client, raw)
-                st.session_state.last_raw = repaired
-                data = parse_json_safely(repaired)
-
-            st.session_state.last_result = data
-
-        except RateLimitError:
-            st.session_state.last_error = "Rate limit/quota hit. Try again (or check billing/usage)."
+            if segmented:
+                # Segments run in parallel; each one is cached on its own.
+                result = generate_segmented(
+                    engine, fields, stream=stream_output, pipelined=pipelined, on_steps=on_steps, compact=compact,
+                )
+            else:
+                result = engine.generate(
+                    fields,
+                    stream=stream_output,
+                    pipelined=pipelined,
+                    on_steps=on_steps,
+                    speculation=get_speculator().take(st.session_state.session_id, fields),
+                    use_cache=False,
+                    preview=preview,
+                    compact=compact,
+                )
+            st.session_state.last_result = result.data
+            st.session_state.last_notice = result.notice
+            st.session_state.last_raw = result.raw
         except Exception as e:
+            inc("workflow_requests_total", outcome="error")
+            inc("workflow_errors_total", stage="generate", type=type(e).__name__)
             st.session_state.last_error = f"Unexpected error: {e}"
+        finally:
+            live.empty()  # the full result section below replaces the preview
 
 
 # -------------------------
 # Render last result (persists across reruns) — prevents blank page
 # -------------------------
-if st.session_state.last_error:
-    st.error(st.session_state.last_error)
-
-# NOTE: Debug UI has been removed on purpose.
-# (We still keep st.session_state.last_raw internally for repair parsing.)
-
-data = st.session_state.last_result
-
-if isinstance(data, dict):
-    functional_domain_out = safe_str(data.get("functional_domain"), functional_domain)
-    process_workflow_out = safe_str(data.get("process_workflow"), process_workflow)
-    sub_process_out = safe_str(data.get("sub_process"), sub_process)
-    time_horizon_out = safe_str(data.get("time_horizon"), time_horizon)
+def render_results(data: dict, fields: dict):
+    functional_domain_out = safe_str(data.get("functional_domain"), fields.get("functional_domain", ""))
+    process_workflow_out = safe_str(data.get("process_workflow"), fields.get("process_workflow", ""))
+    sub_process_out = safe_str(data.get("sub_process"), fields.get("sub_process", ""))
+    time_horizon_out = safe_str(data.get("time_horizon"), fields.get("time_horizon", ""))
 
     today_steps = safe_list(data.get("today_steps"))
     future_steps = safe_list(data.get("future_steps"))
@@ -569,7 +529,7 @@ if isinstance(data, dict):
           <div class="small-muted">Human + ERP handoffs, more admin + exception work.</div>
         </div>
         """, unsafe_allow_html=True)
-        render_vertical_flow(today_steps, highlight_future=False)
+        paged_flow(today_steps, highlight_future=False, key="page_today")
 
     with c2:
         st.markdown("""
@@ -578,26 +538,11 @@ if isinstance(data, dict):
           <div class="small-muted">Fewer handoffs, more touchless processing, humans shifted to higher-value steps.</div>
         </div>
         """, unsafe_allow_html=True)
-        render_vertical_flow(future_steps, highlight_future=True)
+        paged_flow(future_steps, highlight_future=True, key="page_future")
 
     st.markdown("### Step mapping (future → today)")
     if isinstance(future_steps, list) and len(future_steps) > 0:
-        for fs in future_steps[:12]:
-            fid = fs.get("id", "")
-            flabel = fs.get("label", "")
-            fmaps = fs.get("maps_to", [])
-            if not isinstance(fmaps, list):
-                fmaps = []
-            left = f"<div class='mapping-title'>Future: {fid} — {flabel}</div>"
-            right_ids = ", ".join(fmaps) if fmaps else "(no mapping provided)"
-            right = f"<div class='mapping-title'>Replaces/absorbs: {right_ids}</div>"
-
-            st.markdown(f"""
-            <div class="mapping-row">
-              <div class="mapping-left">{left}</div>
-              <div class="mapping-right">{right}</div>
-            </div>
-            """, unsafe_allow_html=True)
+        step_mapping(future_steps)
     else:
         st.info("No mapping available.")
 
@@ -618,6 +563,7 @@ if isinstance(data, dict):
 
     st.markdown("### Tool suggestions (examples)")
     if tool_suggestions:
+        cards = []
         for t in tool_suggestions[:4]:
             cat = safe_str(t.get("tool_category"), "Tool category")
             ex_tools = t.get("example_tools", [])
@@ -625,24 +571,26 @@ if isinstance(data, dict):
                 ex_tools = []
             use = safe_str(t.get("use_in_workflow"), "")
             fit = safe_str(t.get("fit_notes"), "")
-            st.markdown(f"""
-            <div class="card">
-              <div class="badge-blue">{cat}</div>
-              <div><strong>Example tools:</strong> {", ".join(ex_tools[:3]) if ex_tools else "—"}</div>
-              <div><strong>Use:</strong> {use}</div>
-              <div class="small-muted"><strong>Notes:</strong> {fit}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            cards.append(
+                f'<div class="card"><div class="badge-blue">{cat}</div>'
+                f'<div><strong>Example tools:</strong> {", ".join(ex_tools[:3]) if ex_tools else "—"}</div>'
+                f'<div><strong>Use:</strong> {use}</div>'
+                f'<div class="small-muted"><strong>Notes:</strong> {fit}</div></div>'
+            )
+        st.markdown(f'<div>{"".join(cards)}</div>', unsafe_allow_html=True)
     else:
         st.info("No tool suggestions available.")
 
     st.markdown("### Glossary (terminology)")
     if glossary:
+        entries = []
         for g in glossary[:8]:
             term = safe_str(g.get("term"), "")
             definition = safe_str(g.get("definition"), "")
             if term and definition:
-                st.markdown(f"**{term}:** {definition}")
+                entries.append(f"**{term}:** {definition}")
+        if entries:
+            st.markdown("\n\n".join(entries))
     else:
         st.write("—")
 
@@ -651,3 +599,18 @@ if isinstance(data, dict):
         st.write("\n".join([f"• {x}" for x in notes[:6]]))
 
     st.caption("Tip: Don’t enter sensitive info. This is a demo/prototype for exploration, not professional advice.")
+
+
+input_panel()
+
+if st.session_state.last_error:
+    st.error(st.session_state.last_error)
+if st.session_state.last_notice:
+    st.warning(st.session_state.last_notice)
+
+# NOTE: Debug UI has been removed on purpose.
+# (We still keep st.session_state.last_raw internally for repair parsing.)
+
+if isinstance(st.session_state.last_result, dict):
+    with span("render"):
+        render_results(st.session_state.last_result, st.session_state.last_fields or {})
@@ -0,0 +1,205 @@
+# =========================
+# AI Workflow Optimizer — Headless batch sweep over the process library
+#
+# Expands DOMAINS sub-processes × time horizons × industries (× maturities)
+# and runs the grid through a bounded-concurrency async client. One JSONL
+# line is written per job as soon as it finishes.
+#
+#   OPENAI_API_KEY=... python batch_sweep.py --out sweep.jsonl --concurrency 16
+# =========================
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import os
+import sys
+import time
+
+from process_library import DOMAINS, TOOL_LIBRARY, TIME_HORIZONS, INDUSTRIES, MATURITY_LEVELS, get_default_steps
+from prompt_builder import (
+    PROMPT_VERSION, RESULT_DEFAULTS, build_messages, clean_lines, is_usable_result, request_fields,
+)
+from json_utils import parse_json_safely, repair_truncated_json
+from result_cache import ResultCache, make_cache_key
+from schema_validator import ResultValidator, enforce_contract
+from metrics import configure_logging, write_metrics_file
+from llm_client import call_async_with_retry, connection_stats, get_async_client, usage_totals
+
+
+def expand_grid(
+    domains: list[str] | None = None,
+    horizons: list[str] | None = None,
+    industries: list[str] | None = None,
+    maturities: list[str] | None = None,
+) -> list[dict]:
+    """Every (domain, workflow, sub_process) × horizon × industry × maturity as request fields."""
+    templates = []
+    for domain, workflows in DOMAINS.items():
+        if domains and domain not in domains:
+            continue
+        for workflow, wf in workflows.items():
+            for sub_process in (wf.get("sub_processes") or {}):
+                templates.append((domain, workflow, sub_process))
+
+    jobs = []
+    for (domain, workflow, sub_process), horizon, industry, maturity in itertools.product(
+        templates,
+        horizons or TIME_HORIZONS,
+        industries or INDUSTRIES,
+        maturities or [MATURITY_LEVELS[1]],
+    ):
+        steps = clean_lines("\n".join(get_default_steps(domain, workflow, sub_process)))
+        jobs.append(request_fields(domain, workflow, sub_process, horizon, industry, maturity, [], "", steps))
+    return jobs
+
+
+@functools.cache
+def validator() -> ResultValidator:
+    return ResultValidator(TOOL_LIBRARY)
+
+
+def job_record(job_id: int, fields: dict) -> dict:
+    return {
+        "job_id": job_id,
+        "functional_domain": fields["functional_domain"],
+        "process_workflow": fields["process_workflow"],
+        "sub_process": fields["sub_process"],
+        "time_horizon": fields["time_horizon"],
+        "industry": fields["industry"],
+        "maturity": fields["maturity"],
+        "prompt_version": PROMPT_VERSION,
+        "cache_key": make_cache_key(fields, PROMPT_VERSION),
+    }
+
+
+async def run_job(client, sem: asyncio.Semaphore, job_id: int, fields: dict, cache: ResultCache | None) -> dict:
+    """One JSONL record; never raises (an unexpected error becomes a status="error" record)."""
+    try:
+        return await _run_job(client, sem, job_id, fields, cache)
+    except Exception as e:
+        record = job_record(job_id, fields)
+        record.update(status="error", error_type=type(e).__name__, error=str(e))
+        return record
+
+
+async def _run_job(client, sem: asyncio.Semaphore, job_id: int, fields: dict, cache: ResultCache | None) -> dict:
+    record = job_record(job_id, fields)
+    cache_key = record["cache_key"]
+    # The result cache is synchronous SQLite: keep it off the event loop.
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached is not None:
+            record.update(status="cached", latency_s=0.0, attempts=0, result=cached)
+            return record
+
+    async with sem:
+        t0 = time.perf_counter()
+        try:
+            resp, attempts = await call_async_with_retry(client, build_messages(fields), n_steps=len(fields["steps"]))
+        except Exception as e:
+            record.update(
+                status="error",
+                error_type=type(e).__name__,
+                error=str(e),
+                latency_s=round(time.perf_counter() - t0, 3),
+            )
+            return record
+        latency = time.perf_counter() - t0
+
+    raw = resp.choices[0].message.content or ""
+    usage = getattr(resp, "usage", None)
+    record.update(
+        latency_s=round(latency, 3),
+        attempts=attempts,
+        finish_reason=resp.choices[0].finish_reason,
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        cached_tokens=getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+        total_tokens=getattr(usage, "total_tokens", None),
+    )
+    try:
+        data = parse_json_safely(raw)
+        status = "ok"
+    except Exception:
+        data = repair_truncated_json(raw, RESULT_DEFAULTS)
+        status = "repaired" if is_usable_result(data) else "invalid"
+
+    record["status"] = status
+    if status == "invalid":
+        record["raw"] = raw
+        return record
+    # Local fixes only; sections that still break the contract are reported, not regenerated.
+    data, errors = enforce_contract(data, fields, validator())
+    record["contract_errors"] = sorted(errors)
+    record["result"] = data
+    # A result that still breaks the contract is reported but never served again from the cache.
+    if cache is not None and not errors:
+        await asyncio.to_thread(cache.set, cache_key, data)
+    return record
+
+
+async def run_sweep(jobs: list[dict], out, concurrency: int, use_cache: bool = True) -> dict:
+    client = get_async_client(os.environ["OPENAI_API_KEY"])
+    sem = asyncio.Semaphore(concurrency)
+    cache = ResultCache() if use_cache else None
+    counts: dict[str, int] = {}
+
+    tasks = [asyncio.create_task(run_job(client, sem, i, f, cache)) for i, f in enumerate(jobs)]
+    for fut in asyncio.as_completed(tasks):
+        record = await fut
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+    # The client is the process-wide pooled one (llm_client.get_async_client): left open for reuse.
+    return counts
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Sweep the process library through the optimizer.")
+    parser.add_argument("--out", default="-", help="JSONL output path ('-' for stdout)")
+    parser.add_argument("--concurrency", type=int, default=8, help="max in-flight LLM calls")
+    parser.add_argument("--domain", action="append", help="restrict to a functional domain (repeatable)")
+    parser.add_argument("--horizon", action="append", help="restrict to a time horizon (repeatable)")
+    parser.add_argument("--industry", action="append", help="restrict to an industry (repeatable)")
+    parser.add_argument("--all-maturities", action="store_true", help="also sweep every maturity level")
+    parser.add_argument("--limit", type=int, default=0, help="only run the first N jobs")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the shared result cache")
+    parser.add_argument("--dry-run", action="store_true", help="print the job count and exit")
+    parser.add_argument("--metrics-file", help="write stage timings/counters in Prometheus text format")
+    args = parser.parse_args(argv)
+
+    jobs = expand_grid(
+        domains=args.domain,
+        horizons=args.horizon,
+        industries=args.industry,
+        maturities=MATURITY_LEVELS if args.all_maturities else None,
+    )
+    if args.limit:
+        jobs = jobs[:args.limit]
+    if args.dry_run:
+        print(f"{len(jobs)} jobs")
+        return 0
+    if not os.environ.get("OPENAI_API_KEY", "").strip():
+        print("Missing OPENAI_API_KEY in the environment.", file=sys.stderr)
+        return 2
+
+    configure_logging()
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        t0 = time.perf_counter()
+        counts = asyncio.run(run_sweep(jobs, out, args.concurrency, use_cache=not args.no_cache))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(jobs)} jobs in {time.perf_counter() - t0:.1f}s: {counts}", file=sys.stderr)
+    print(f"connections: {connection_stats()}", file=sys.stderr)
+    print(f"tokens: {usage_totals()}", file=sys.stderr)
+    if args.metrics_file:
+        write_metrics_file(args.metrics_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
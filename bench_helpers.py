@@ -0,0 +1,231 @@
+# =========================
+# AI Workflow Optimizer — Micro-benchmarks for the per-request pure helpers
+#
+# Times clean_lines, extract_json_object, parse_json_safely, normalize_actor,
+# shorten_label and the flow HTML assembly on realistic and adversarial
+# inputs, and compares against bench_baseline.json. Each sample times the
+# case right after a fixed calibration workload and is expressed in units of
+# it, so a baseline recorded on one machine is usable on another. A case's
+# score is the median over many samples, and its noise is their relative
+# median absolute deviation. A case fails the run (exit 1) when its median is
+# slower than the baseline's by more than threshold + NOISE_K × noise.
+#
+#   python bench_helpers.py                    # compare against the baseline
+#   python bench_helpers.py --update-baseline  # record a new baseline
+#   python bench_helpers.py --threshold 0.5 --only parse
+# =========================
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections.abc import Callable
+
+from statistics import median
+
+from flow_html import flow_html, page_starts, shorten_label
+from json_utils import extract_json_object, parse_json_safely
+from local_optimizer import optimize_locally
+from process_library import INDUSTRIES, MATURITY_LEVELS, TIME_HORIZONS
+from prompt_builder import ACTORS, MAX_LONG_STEPS, clean_lines, normalize_actor, request_fields
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+DEFAULT_THRESHOLD = 0.30  # fail when > 30% slower than the baseline (normalized) ...
+NOISE_K = 3.0             # ... plus this many relative MADs of the noisier of the two runs
+SAMPLES = 9               # timed samples per case and pass
+SAMPLE_SECONDS = 0.02     # minimum loop time per sample
+
+
+# -------------------------
+# Inputs
+# -------------------------
+def _sample_result(n_steps: int = 12) -> dict:
+    steps = [f"Step {i} review vendor invoice and post to ERP ledger" for i in range(n_steps)]
+    fields = request_fields(
+        "Finance", "Record-to-Report (R2R)", "Accounts Payable (AP)", TIME_HORIZONS[0],
+        INDUSTRIES[0], MATURITY_LEVELS[1], [], "", steps,
+    )
+    return optimize_locally(fields)
+
+def build_inputs() -> dict:
+    result = _sample_result()
+    body = json.dumps(result, ensure_ascii=False)
+    escaped = dict(result, notes=['He said \\"approve\\" \\\\ then \\"post\\"' * 40] * 3)
+    nested: object = "leaf"
+    for _ in range(400):
+        nested = {"n": [nested, "x"]}
+    prose = "Sure! Here is the optimized workflow you asked for, with all sections. " * 700
+    return {
+        "result_json": body,
+        "fenced_json": "```json\n" + body + "\n```",
+        "long_preamble_json": prose + body + "\nLet me know if you need anything else.",
+        "escaped_json": "Result:\n" + json.dumps(escaped),
+        "nested_json": "Result:\n" + json.dumps(nested),
+        "workflow_text": "\n".join(f"  • Step {i}: receive, validate and route request #{i}  " for i in range(25)),
+        "workflow_text_long": "\n".join(
+            (f"Step {i} " + "with a very long description of the manual hand-off " * 4) if i % 3 else ""
+            for i in range(600)
+        ),
+        "actors": [a.lower().replace("+", " + ") for a in ACTORS] * 20 + ["system", "person", "llm", "bot"] * 10,
+        "labels": [s["label"] + " and then some more words here" for s in result["future_steps"]] * 20,
+        "steps": result["future_steps"],
+        # A long-mode flow: every page of it, as a user paging through would render.
+        "steps_long": [
+            dict(s, id=f"F{i + 1}") for i, s in enumerate((result["future_steps"] * MAX_LONG_STEPS)[:MAX_LONG_STEPS])
+        ],
+    }
+
+
+# -------------------------
+# Cases: name → (function, input key)
+# -------------------------
+CASES: dict[str, tuple[Callable, str]] = {
+    "clean_lines/typical": (clean_lines, "workflow_text"),
+    "clean_lines/600_lines": (clean_lines, "workflow_text_long"),
+    "extract_json/long_preamble": (extract_json_object, "long_preamble_json"),
+    "extract_json/escaped_strings": (extract_json_object, "escaped_json"),
+    "extract_json/deeply_nested": (extract_json_object, "nested_json"),
+    "parse_json/clean": (parse_json_safely, "result_json"),
+    "parse_json/fenced": (parse_json_safely, "fenced_json"),
+    "parse_json/long_preamble": (parse_json_safely, "long_preamble_json"),
+    "parse_json/deeply_nested": (parse_json_safely, "nested_json"),
+    "normalize_actor/mixed_200": (lambda xs: [normalize_actor(x) for x in xs], "actors"),
+    "shorten_label/240": (lambda xs: [shorten_label(x) for x in xs], "labels"),
+    "flow_html/future_steps": (lambda s: flow_html(s, True), "steps"),
+    "flow_html/150_steps_all_pages": (
+        lambda s: [flow_html(s, True, start) for start in page_starts(len(s))], "steps_long",
+    ),
+}
+
+
+def calibrate() -> float:
+    """Seconds for a fixed pure-Python workload: the unit timings are expressed in."""
+    t0 = time.perf_counter()
+    total = 0
+    for i in range(50_000):
+        total += i * i % 7
+    "".join(str(i) for i in range(5_000)).count("7")
+    return time.perf_counter() - t0
+
+def loop_count(fn: Callable, arg) -> int:
+    """Calls per sample so that one sample runs for at least SAMPLE_SECONDS."""
+    fn(arg)  # warm up
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn(arg)
+        if time.perf_counter() - t0 >= SAMPLE_SECONDS:
+            return number
+        number *= 2
+
+def sample(name: str, inputs: dict, samples: int = SAMPLES) -> list[tuple[float, float]]:
+    """(seconds per call, calibration unit) pairs for one case.
+
+    Calibration runs right before each sample so CPU frequency changes and
+    noisy neighbours affect both alike.
+    """
+    fn, key = CASES[name]
+    arg = inputs[key]
+    number = loop_count(fn, arg)
+    out = []
+    for _ in range(samples):
+        unit = calibrate()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn(arg)
+        out.append(((time.perf_counter() - t0) / number, unit))
+    return out
+
+def summarize(pairs: list[tuple[float, float]]) -> dict:
+    ratios = [s / u for s, u in pairs]
+    mid = median(ratios)
+    return {
+        "seconds": median(s for s, _ in pairs),
+        "normalized": mid,
+        "noise": median(abs(r - mid) for r in ratios) / mid if mid else 0.0,
+        "samples": len(ratios),
+    }
+
+def run(only: str | None = None, rounds: int = 1, inputs: dict | None = None, names=None) -> dict:
+    """Median normalized timing per case over `rounds` interleaved passes."""
+    inputs = inputs or build_inputs()
+    names = [n for n in (names or CASES) if not only or only in n]
+    pairs: dict[str, list] = {name: [] for name in names}
+    for _ in range(rounds):
+        for name in names:
+            pairs[name] += sample(name, inputs)
+    units = [u for rows in pairs.values() for _, u in rows]
+    return {
+        "calibration_s": median(units) if units else 0.0,
+        "python": sys.version.split()[0],
+        "cases": {name: summarize(rows) for name, rows in pairs.items()},
+        "_pairs": pairs,
+    }
+
+def allowed_slowdown(row: dict, base: dict, threshold: float) -> float:
+    return threshold + NOISE_K * max(row.get("noise", 0.0), base.get("noise", 0.0))
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Names of cases whose median is slower than the baseline's beyond the noise-aware allowance."""
+    failures = []
+    for name, row in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base and row["normalized"] > base["normalized"] * (1 + allowed_slowdown(row, base, threshold)):
+            failures.append(name)
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pure per-request helpers.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown (0.3 = 30%%)")
+    parser.add_argument("--only", help="run only cases whose name contains this")
+    parser.add_argument("--rounds", type=int, default=3, help="interleaved passes over all cases")
+    parser.add_argument("--confirm", type=int, default=2, help="re-measure apparent regressions this many times")
+    args = parser.parse_args(argv)
+
+    inputs = build_inputs()
+    current = run(args.only, rounds=args.rounds, inputs=inputs)
+    pairs = current.pop("_pairs")
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"baseline written to {args.baseline} ({len(current['cases'])} cases)")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    failures = compare(current, baseline, args.threshold)
+    for _ in range(args.confirm):
+        # A real regression shifts the median of the pooled samples; a noisy burst doesn't.
+        if not failures:
+            break
+        again = run(rounds=args.rounds, inputs=inputs, names=failures)["_pairs"]
+        for name, rows in again.items():
+            pairs[name] += rows
+            current["cases"][name] = summarize(pairs[name])
+        failures = compare(current, baseline, args.threshold)
+
+    print(f"{'case':<32} {'µs/call':>12} {'baseline':>12} {'change':>8} {'allowed':>8}")
+    for name, row in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        scale = current["calibration_s"] / baseline["calibration_s"] if base else 1.0
+        base_us = f"{base['seconds'] * scale * 1e6:12.1f}" if base else f"{'—':>12}"
+        change = f"{row['normalized'] / base['normalized'] - 1:+8.0%}" if base else f"{'new':>8}"
+        allowed = f"{allowed_slowdown(row, base, args.threshold):+8.0%}" if base else f"{'':>8}"
+        flag = "  SLOWER" if name in failures else ""
+        print(f"{name:<32} {row['seconds'] * 1e6:12.1f} {base_us} {change} {allowed}{flag}")
+    if failures:
+        print(f"\n{len(failures)} case(s) regressed beyond the allowed slowdown: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
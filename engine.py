@@ -0,0 +1,413 @@
+# =========================
+# AI Workflow Optimizer — Headless engine
+#
+# The whole Generate pipeline without Streamlit: snapshot/cache/near-duplicate
+# lookup → speculative or coalesced result → LLM call (plain, streamed or
+# pipelined; a steps-only delta when a similar result is stored) → parse →
+# local/LLM repair → contract check → cache, degrading to the local optimizer
+# when the provider is unavailable. The app, batch tools and the HTTP service
+# all drive this.
+#
+# Heavy modules (openai, httpx, the client pool) are imported on first LLM
+# call, so importing the engine or answering from snapshot/cache/local stays
+# in the tens of milliseconds.
+#
+#   echo '{"functional_domain": ..., "steps": [...]}' | python engine.py
+# =========================
+
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import NamedTuple
+
+from json_utils import parse_json_safely, repair_truncated_json
+from local_optimizer import optimize_locally
+from metrics import configure_logging, inc, span
+from prompt_builder import (
+    MAX_INPUT_STEPS, PROMPT_VERSION, RESULT_DEFAULTS, build_messages, clean_lines, is_usable_result,
+    request_fields,
+)
+from result_cache import ResultCache, make_cache_key
+from schema_validator import STEP_SECTIONS, ResultValidator, enforce_contract
+from singleflight import SingleFlight
+
+# on_steps(section, steps_so_far) — called as today/future steps arrive.
+StepsCallback = Callable[[str, list[dict]], None]
+
+MAX_PENDING_MATCHES = 256  # similarity matches from lookup() kept for the generate() that follows
+
+
+def degradable(err: Exception) -> bool:
+    """Provider errors the local answer covers for: connection failures, timeouts, 429 and 5xx.
+
+    Other API errors (400, 401, 404, ...) point at a configuration or request bug and propagate.
+    """
+    from openai import APIConnectionError, APIStatusError, RateLimitError
+
+    if isinstance(err, (APIConnectionError, RateLimitError)):  # APITimeoutError is a connection error
+        return True
+    return isinstance(err, APIStatusError) and err.status_code >= 500
+
+class GenerationResult(NamedTuple):
+    data: dict
+    source: str                  # snapshot | cache | similar | speculation | coalesced | llm | local
+    notice: str | None = None    # user-facing note when a fallback was used
+    raw: str | None = None       # model text, kept for diagnostics
+    contract_errors: dict = {}
+
+    @property
+    def from_llm(self) -> bool:
+        return self.source in ("speculation", "coalesced", "llm")
+
+
+def follow(parser, done: Callable[[], bool], on_steps: StepsCallback | None, interval: float = 0.2) -> None:
+    """Report steps from a stream someone else is consuming until done() is true."""
+    shown = {key: 0 for key in parser.steps}
+    while True:
+        finished = done()  # checked first, so steps that landed before the end are still reported
+        if on_steps is not None:
+            for key, steps in parser.steps.items():
+                if len(steps) != shown[key]:
+                    shown[key] = len(steps)
+                    on_steps(key, steps)
+        if finished:
+            return
+        time.sleep(interval)
+
+
+class Engine:
+    """Stateless per request; holds the shared cache, snapshot pack, validator and in-flight table."""
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        cache: ResultCache | None = None,
+        snapshots=None,
+        validator: ResultValidator | None = None,
+        inflight: SingleFlight | None = None,
+        similar=None,
+    ):
+        self.api_key = (api_key or "").strip() or None
+        self.cache = cache
+        self.snapshots = snapshots
+        self._validator = validator
+        self.inflight = inflight or SingleFlight()
+        self.similar = similar  # SimilarityCache over `cache`, optional
+        self._matches: OrderedDict[str, object] = OrderedDict()  # cache key → match (or None) from lookup()
+        self._matches_lock = threading.Lock()
+        self._client = None
+
+    # -------------------------
+    # Shared resources (created on first use)
+    # -------------------------
+    @property
+    def validator(self) -> ResultValidator:
+        if self._validator is None:
+            from process_library import TOOL_LIBRARY  # lazily loaded from the library pack
+
+            self._validator = ResultValidator(TOOL_LIBRARY)
+        return self._validator
+
+    @property
+    def client(self):
+        if self._client is None:
+            from llm_client import get_client
+
+            self._client = get_client(self.api_key)
+        return self._client
+
+    # -------------------------
+    # Pipeline
+    # -------------------------
+    def lookup(self, fields: dict) -> GenerationResult | None:
+        """Precomputed snapshot or cached result for these inputs (or a near-identical request)."""
+        key = make_cache_key(fields, PROMPT_VERSION)
+        for source, store in (("snapshot", self.snapshots), ("cache", self.cache)):
+            cached = store.get(key) if store is not None else None
+            if cached is not None:
+                inc("workflow_cache_hits_total", source="result_cache" if source == "cache" else source)
+                inc("workflow_requests_total", outcome="cached")
+                return GenerationResult(cached, source)
+        if self.similar is not None:
+            match = self.similar.match(fields)
+            if match is not None and match.reusable:
+                self.similar.record("reused")
+                inc("workflow_similar_total", outcome="reused")
+                inc("workflow_cache_hits_total", source="similar")
+                inc("workflow_requests_total", outcome="cached")
+                return GenerationResult(match.data, "similar")
+            # Not reusable: kept so the generate() that follows can seed from it without matching again.
+            with self._matches_lock:
+                self._matches[key] = match
+                self._matches.move_to_end(key)
+                while len(self._matches) > MAX_PENDING_MATCHES:
+                    self._matches.popitem(last=False)
+        return None
+
+    def similar_match(self, fields: dict, key: str):
+        """The similarity match for these inputs: the one lookup() found, else a fresh one."""
+        with self._matches_lock:
+            if key in self._matches:
+                return self._matches.pop(key)
+        return self.similar.match(fields)
+
+    def _contract(self, client, fields: dict, data: dict) -> tuple[dict, dict]:
+        from llm_client import regenerate_sections
+
+        def regenerate(partial: dict, sections: list[str]) -> dict:
+            inc("workflow_repairs_total", kind="llm_sections")
+            with span("repair_sections"):
+                return regenerate_sections(client, fields, partial, sections)
+
+        with span("contract"):
+            return enforce_contract(data, fields, self.validator, regenerate)
+
+    def call_and_parse(
+        self, fields: dict, stream: bool = True, pipelined: bool = False, parser=None,
+        on_steps: StepsCallback | None = None, compact: bool = False,
+    ) -> tuple[dict, str | None, dict]:
+        """One LLM generation → (contract-checked result, raw text, remaining contract errors).
+
+        Truncation: local repair first, full LLM repair only if unusable. Sections that
+        still break the output contract are regenerated on their own. `compact` asks for
+        the compact wire format (wire_format.py) and decodes it; pipelined requests
+        always use the full schema.
+        """
+        from llm_client import call_openai_streaming, call_openai_with_retry, try_repair_json
+
+        client = self.client
+        compact = compact and not pipelined
+        if compact:
+            from wire_format import (
+                COMPACT_SIZING, CompactStreamParser, build_compact_messages, decode_compact, repair_compact,
+            )
+        on_delta = None
+        if stream:
+            if compact:
+                # Decoded steps go into the shared parser's lists, where followers read them.
+                parser = CompactStreamParser(into=parser)
+            elif parser is None:
+                from json_stream import StepStreamParser
+
+                parser = StepStreamParser()
+
+            # Progressive view: report each step as soon as its JSON object closes.
+            def on_delta(delta: str):
+                for key, _ in parser.feed(delta):
+                    if on_steps is not None:
+                        on_steps(key, parser.steps[key])
+
+        raw = None
+        if pipelined:
+            from pipeline import generate_pipelined
+
+            # Steps only (streamed), then the enrichment sections as parallel smaller requests.
+            data = generate_pipelined(client, fields, on_delta)
+        else:
+            with span("prompt_build"):
+                messages = build_compact_messages(fields) if compact else build_messages(fields)
+            # Sizes max_tokens (see token_budget.py).
+            sizing = {"n_steps": len(fields["steps"])}
+            if compact:
+                sizing["sections"] = COMPACT_SIZING
+            if on_delta is not None:
+                raw = call_openai_streaming(client, messages, on_delta, max_retries=3, **sizing)
+            else:
+                resp = call_openai_with_retry(client, messages, max_retries=3, **sizing)
+                raw = resp.choices[0].message.content or ""
+
+            def decode(obj):
+                return decode_compact(obj, fields) if compact else obj
+
+            # First parse attempt
+            try:
+                with span("parse"):
+                    data = decode(parse_json_safely(raw))
+            except Exception:
+                # If truncated, close it locally first; only fall back to the
+                # (full-latency) LLM repair when the local result is unusable.
+                inc("workflow_repairs_total", kind="local")
+                with span("repair_local"):
+                    data = repair_compact(raw, fields) if compact else repair_truncated_json(raw, RESULT_DEFAULTS)
+                if not is_usable_result(data):
+                    raw = try_repair_json(client, raw, sizing["n_steps"])
+                    data = decode(parse_json_safely(raw))
+
+        data, errors = self._contract(client, fields, data)
+        return data, raw, errors
+
+    def delta_and_parse(
+        self, fields: dict, seed: dict, on_steps: StepsCallback | None = None,
+    ) -> tuple[dict, str | None, dict] | None:
+        """Regenerate only the step sections for `fields`, keeping a similar result's enrichment.
+
+        None when the reply is unusable (the caller falls back to a full generation).
+        """
+        from llm_client import regenerate_sections
+
+        client = self.client
+        with span("delta"):
+            try:
+                patch = regenerate_sections(client, fields, seed, list(STEP_SECTIONS))
+            except ValueError:  # unparseable reply
+                return None
+        if not isinstance(patch, dict) or not all(isinstance(patch.get(k), list) for k in STEP_SECTIONS):
+            return None
+        data = dict(seed, **{k: patch[k] for k in STEP_SECTIONS})
+        if on_steps is not None:
+            for key in STEP_SECTIONS:
+                on_steps(key, data[key])
+        data, errors = self._contract(client, fields, data)
+        return data, None, errors
+
+    def generate(
+        self,
+        fields: dict,
+        stream: bool = True,
+        pipelined: bool = False,
+        on_steps: StepsCallback | None = None,
+        speculation=None,
+        use_cache: bool = True,
+        preview: dict | None = None,
+        compact: bool = False,
+    ) -> GenerationResult:
+        """Full Generate flow for canonical request fields (see prompt_builder.request_fields).
+
+        Provider rate limits / outages (see degradable) degrade to the local optimizer's
+        answer with a notice; anything else propagates.
+        """
+        if use_cache:
+            hit = self.lookup(fields)
+            if hit is not None:
+                return hit
+
+        # Rule-based answer (< 1 ms): kept if the LLM is unavailable.
+        preview = preview or optimize_locally(fields)
+        if not self.api_key:
+            inc("workflow_requests_total", outcome="local")
+            return GenerationResult(preview, "local", "Missing OPENAI_API_KEY — showing the rule-based result.")
+
+        from openai import APIError, RateLimitError
+
+        try:
+            # Background job for these exact inputs: wait for it (finished or still
+            # streaming) instead of issuing a second call.
+            cache_key = make_cache_key(fields, PROMPT_VERSION)
+            if speculation is not None:
+                follow(speculation.parser, speculation.done, on_steps)
+                data = speculation.result()
+                if data is not None:
+                    # The background job only applied local fixes: regenerate what still fails.
+                    data, errors = self._contract(self.client, fields, data)
+                    if self.cache is not None:
+                        self.cache.set(cache_key, data)
+                    inc("workflow_cache_hits_total", source="speculation")
+                    inc("workflow_requests_total", outcome="llm")
+                    return GenerationResult(data, "speculation", contract_errors=errors)
+
+            # Identical request already running elsewhere: share its result.
+            flight, leader = self.inflight.join(cache_key)
+            if leader:
+                try:
+                    # Similar stored result: a steps-only delta request instead of the full one.
+                    seeded = None
+                    match = self.similar_match(fields, cache_key) if self.similar is not None else None
+                    if match is not None:
+                        seeded = self.delta_and_parse(fields, match.data, on_steps)
+                    if self.similar is not None:
+                        outcome = "seeded" if seeded is not None else "miss"
+                        self.similar.record(outcome)
+                        inc("workflow_similar_total", outcome=outcome)
+                    data, raw, errors = seeded or self.call_and_parse(
+                        fields, stream, pipelined, flight.parser, on_steps, compact
+                    )
+                except BaseException as e:
+                    # Followers get the provider error as-is (so they degrade the same way);
+                    # an interrupted caller just tells them the shared call didn't finish.
+                    shared = e if isinstance(e, Exception) else RuntimeError("shared request was interrupted")
+                    self.inflight.finish(flight, error=shared)
+                    raise
+                self.inflight.finish(flight, result=data)
+                if self.cache is not None and isinstance(data, dict):
+                    self.cache.set(cache_key, data)
+                    if self.similar is not None:
+                        self.similar.add(fields, cache_key)
+                inc("workflow_requests_total", outcome="llm")
+                return GenerationResult(data, "llm", raw=raw, contract_errors=errors)
+
+            inc("workflow_cache_hits_total", source="coalesced")
+            follow(flight.parser, flight.done, on_steps)
+            data = flight.result()
+            inc("workflow_requests_total", outcome="llm")
+            return GenerationResult(data, "coalesced")
+
+        except RateLimitError:
+            inc("workflow_requests_total", outcome="rate_limited")
+            return GenerationResult(
+                preview, "local", "Rate limit/quota hit — showing the rule-based result. Try again shortly."
+            )
+        except APIError as e:
+            if not degradable(e):
+                raise  # the caller reports it (and counts the error)
+            # Provider outage / timeout / connection failure: degrade to the local answer.
+            inc("workflow_requests_total", outcome="degraded")
+            return GenerationResult(
+                preview, "local", f"AI service unavailable ({type(e).__name__}) — showing the rule-based result."
+            )
+
+
+def fields_from_dict(payload: dict, max_steps: int = MAX_INPUT_STEPS) -> dict:
+    """Canonical request fields from a loose dict (UI control names or request_fields names)."""
+    steps = payload.get("steps")
+    if isinstance(steps, list):
+        steps = "\n".join(str(s) for s in steps if s is not None)
+    # Text and list input get the same cleaning and cap as the UI's text box.
+    steps = clean_lines(steps, max_steps) if isinstance(steps, str) else []
+    return request_fields(
+        payload.get("functional_domain", ""),
+        payload.get("process_workflow", ""),
+        payload.get("sub_process", ""),
+        payload.get("time_horizon", ""),
+        payload.get("industry", ""),
+        payload.get("maturity", ""),
+        payload.get("constraints") or [],
+        payload.get("notes") or "",
+        steps,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Run one optimization from JSON request fields on stdin.")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--pipelined", action="store_true")
+    parser.add_argument("--compact", action="store_true", help="compact wire format (fewer output tokens)")
+    args = parser.parse_args(argv)
+
+    fields = fields_from_dict(json.load(sys.stdin))
+    configure_logging()
+    from similarity_cache import SimilarityCache
+    from snapshot_pack import SnapshotPack
+
+    cache = None if args.no_cache else ResultCache()
+    engine = Engine(
+        os.environ.get("OPENAI_API_KEY"),
+        cache=cache,
+        snapshots=None if args.no_cache else SnapshotPack.load(),
+        similar=None if cache is None else SimilarityCache(cache),
+    )
+    result = engine.generate(fields, stream=not args.no_stream, pipelined=args.pipelined, compact=args.compact)
+    if result.notice:
+        print(result.notice, file=sys.stderr)
+    print(json.dumps(result.data, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+# =========================
+# AI Workflow Optimizer — Local OpenAI-compatible stand-in server (benchmarks only)
+#
+# Serves POST /v1/chat/completions (plain and SSE streaming) with results that
+# have the real output schema: recorded ones from a batch_sweep JSONL when the
+# request matches, otherwise synthetic ones from the local optimizer. Knobs
+# inject latency, output pacing, truncation, 429s and hung requests so the
+# retry / repair / backoff paths can be exercised with no network.
+#
+#   python fake_openai.py --port 8765 --latency-ms 600 --tokens-per-sec 120 \
+#       --truncate-rate 0.05 --rate-429 0.02 --timeout-rate 0.01
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=sk-fake streamlit run app.py
+#
+# GET /stats returns request counters plus the server's CPU time and memory.
+# =========================
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from json_utils import repair_truncated_json
+from local_optimizer import optimize_locally
+from prompt_builder import PROMPT_VERSION, RESULT_DEFAULTS, request_fields
+from result_cache import make_cache_key
+from wire_format import COMPACT_SCHEMA_BLOCK, encode_compact
+
+KEYS_MARKER = "Return ONLY a JSON object with exactly these keys: "
+STEPS_MARKER = "User CURRENT workflow steps (one per line):"
+CONTEXT_LABELS = {
+    "Functional Domain": "functional_domain",
+    "Process Workflow": "process_workflow",
+    "Sub Process": "sub_process",
+    "Time horizon": "time_horizon",
+    "Industry": "industry",
+    "Today maturity": "maturity",
+    "Constraints": "constraints",
+    "User notes": "notes",
+}
+
+
+def fields_from_prompt(text: str) -> dict:
+    """Recover request fields from build_context_block() output."""
+    values = {}
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        label, sep, value = line.partition(": ")
+        if sep and label in CONTEXT_LABELS:
+            values[CONTEXT_LABELS[label]] = value.strip()
+        if line.strip() == STEPS_MARKER:
+            steps = []
+            for step in lines[i + 1:]:
+                if not step.strip():
+                    break
+                steps.append(step.strip())
+            values["steps"] = steps
+            break
+    constraints = values.get("constraints", "None")
+    notes = values.get("notes", "None")
+    return request_fields(
+        values.get("functional_domain", ""), values.get("process_workflow", ""), values.get("sub_process", ""),
+        values.get("time_horizon", ""), values.get("industry", ""), values.get("maturity", ""),
+        [] if constraints == "None" else constraints.split(", "),
+        "" if notes == "None" else notes,
+        values.get("steps", []),
+    )
+
+def load_recorded(path: str) -> dict[str, dict]:
+    """cache_key → result from a batch_sweep.py JSONL."""
+    recorded = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            rec = json.loads(line)
+            if rec.get("cache_key") and isinstance(rec.get("result"), dict):
+                recorded[rec["cache_key"]] = rec["result"]
+    return recorded
+
+
+class FakeOpenAI:
+    """Response generation + fault injection, independent of the HTTP plumbing."""
+
+    def __init__(self, args, recorded: dict[str, dict] | None = None):
+        self.args = args
+        self.recorded = recorded or {}
+        self.rng = random.Random(args.seed)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "stream": 0, "truncated": 0, "rate_limited": 0,
+                       "timeouts": 0, "recorded": 0, "synthetic": 0, "length_capped": 0}
+        self.started = time.time()
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def roll(self, rate: float) -> bool:
+        with self._lock:
+            return self.rng.random() < rate
+
+    def latency(self) -> float:
+        with self._lock:
+            ms = self.rng.gauss(self.args.latency_ms, self.args.jitter_ms)
+        return max(0.0, ms) / 1000.0
+
+    def content_for(self, messages: list[dict]) -> str:
+        user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        if "PARTIAL_JSON_START" in user:
+            partial = user.split("PARTIAL_JSON_START:", 1)[1].rsplit("PARTIAL_JSON_END", 1)[0].strip()
+            return json.dumps(repair_truncated_json(partial, RESULT_DEFAULTS), ensure_ascii=False)
+
+        fields = fields_from_prompt(user)
+        result = self.recorded.get(make_cache_key(fields, PROMPT_VERSION))
+        if result is not None:
+            self.count("recorded")
+        else:
+            self.count("synthetic")
+            result = optimize_locally(fields)
+        if KEYS_MARKER in user:
+            keys = [k.strip() for k in user.split(KEYS_MARKER, 1)[1].splitlines()[0].split(",")]
+            result = {k: result.get(k, RESULT_DEFAULTS.get(k)) for k in keys}
+        elif any(COMPACT_SCHEMA_BLOCK in (m.get("content") or "") for m in messages if m.get("role") == "system"):
+            result = encode_compact(result)
+        return json.dumps(result, ensure_ascii=False)
+
+    def usage(self, messages: list[dict], completion: str) -> dict:
+        prompt = sum(len(m.get("content") or "") for m in messages) // 4
+        done = max(1, len(completion) // 4)
+        return {"prompt_tokens": prompt, "completion_tokens": done, "total_tokens": prompt + done,
+                "prompt_tokens_details": {"cached_tokens": 0}}
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # keep benchmark output clean
+        pass
+
+    @property
+    def fake(self) -> FakeOpenAI:
+        return self.server.fake
+
+    def _json(self, status: int, body: dict, headers: dict | None = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/stats":
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        rss_kb = None
+        try:
+            with open("/proc/self/statm") as fh:
+                rss_kb = int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+        except (OSError, ValueError):
+            pass
+        with self.fake._lock:
+            counts = dict(self.fake.counts)
+        self._json(200, {
+            **counts,
+            "uptime_s": round(time.time() - self.fake.started, 3),
+            "cpu_user_s": usage.ru_utime,
+            "cpu_system_s": usage.ru_stime,
+            "max_rss_kb": usage.ru_maxrss if sys.platform != "darwin" else usage.ru_maxrss // 1024,
+            "rss_kb": rss_kb,
+            "threads": threading.active_count(),
+        })
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        fake, args = self.fake, self.fake.args
+        fake.count("requests")
+
+        if fake.roll(args.rate_429):
+            fake.count("rate_limited")
+            self._json(429, {"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_error",
+                                       "code": "rate_limit_exceeded"}},
+                       {"retry-after-ms": str(args.retry_after_ms)})
+            return
+        if fake.roll(args.timeout_rate):
+            fake.count("timeouts")
+            time.sleep(args.hang_seconds)  # longer than the client's read timeout
+            self.close_connection = True
+            return
+
+        time.sleep(fake.latency())
+        messages = body.get("messages") or []
+        content = fake.content_for(messages)
+        finish = "stop"
+        if fake.roll(args.truncate_rate):
+            fake.count("truncated")
+            content = content[:int(len(content) * fake.rng.uniform(0.4, 0.9))]
+            finish = "length"
+        limit = body.get("max_tokens")
+        if limit and len(content) // 4 > limit:
+            # Same cut-off a real model applies when the output budget runs out.
+            fake.count("length_capped")
+            content = content[:limit * 4]
+            finish = "length"
+        usage = fake.usage(messages, content)
+        model = body.get("model", "fake")
+
+        if not body.get("stream"):
+            fake.count("ok")
+            self._json(200, {
+                "id": "chatcmpl-" + uuid.uuid4().hex[:12], "object": "chat.completion",
+                "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": finish,
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            })
+            return
+
+        fake.count("stream")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        cid = "chatcmpl-" + uuid.uuid4().hex[:12]
+
+        def event(choices, extra=None):
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, **(extra or {})}
+            self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+        step = max(1, args.chunk_chars)
+        pace = (step / 4) / args.tokens_per_sec if args.tokens_per_sec > 0 else 0.0
+        try:
+            for i in range(0, len(content), step):
+                event([{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}])
+                if pace:
+                    time.sleep(pace)
+            event([{"index": 0, "delta": {}, "finish_reason": finish}])
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event([], {"usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client abandoned the stream (e.g. superseded speculation)
+
+
+def add_server_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="mean time to first byte")
+    parser.add_argument("--jitter-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=150.0, help="streaming pace (0 = unpaced)")
+    parser.add_argument("--chunk-chars", type=int, default=16)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after-ms", type=int, default=1000)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=95.0)
+    parser.add_argument("--recorded", help="batch_sweep.py JSONL to replay when a request matches")
+    parser.add_argument("--seed", type=int, default=None)
+
+def serve(args, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.fake = FakeOpenAI(args, load_recorded(args.recorded) if args.recorded else None)
+    return server
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_args(parser)
+    args = parser.parse_args(argv)
+    server = serve(args, args.host, args.port)
+    print(f"fake OpenAI on http://{args.host}:{server.server_address[1]}/v1", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
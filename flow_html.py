@@ -0,0 +1,72 @@
+# =========================
+# AI Workflow Optimizer — Flow diagram HTML (pure string assembly, no Streamlit)
+# =========================
+
+from prompt_builder import normalize_actor
+
+MAX_FLOW_STEPS = 12
+
+ICON = {
+    "HUMAN": "👤",
+    "ERP": "🧾",
+    "AI": "🤖",
+    "AI+HUMAN": "🤖👤",
+    "AI+ERP": "🤖🧾",
+    "AI+ERP+HUMAN": "🤖🧾👤"
+}
+
+def chip_class(actor: str) -> str:
+    a = (actor or "").upper().replace(" ", "")
+    if "+" in a:
+        return "chip chip-mixed"
+    if a == "AI":
+        return "chip chip-ai"
+    if a == "ERP":
+        return "chip chip-erp"
+    return "chip chip-human"
+
+def shorten_label(label: str) -> str:
+    if not label:
+        return "Step"
+    words = label.strip().split()
+    return " ".join(words[:3]) if len(words) > 3 else " ".join(words)
+
+def page_starts(n_steps: int, page_size: int = MAX_FLOW_STEPS) -> list[int]:
+    """First index of each page of a flow (one page for short flows)."""
+    return list(range(0, max(n_steps, 1), page_size))
+
+def flow_html(steps: list, highlight_future: bool = False, start: int = 0) -> str:
+    """The vertical flow markup for one page: up to MAX_FLOW_STEPS steps from `start`."""
+    blocks = []
+    capped = steps[start:start + MAX_FLOW_STEPS]
+    for i, s in enumerate(capped):
+        sid = (s.get("id") or "").strip()
+        label = shorten_label((s.get("label") or "").strip())
+        actor = normalize_actor(s.get("actor") or "HUMAN")
+        intent = (s.get("intent") or "").strip()
+        icon = ICON.get(actor, "👤")
+
+        ai_step = ("AI" in actor)
+        human_upshift = (intent in ("Decision", "Relationship"))
+
+        step_classes = ["step"]
+        if highlight_future and ai_step:
+            step_classes.append("ai-highlight")
+        if highlight_future and human_upshift:
+            step_classes.append("human-upshift")
+
+        id_html = f'<span class="idpill">{sid}</span>' if sid else ""
+        tag_html = f'<span class="tag">{intent}</span>' if intent else ""
+
+        blocks.append(f"""
+          <div class="{' '.join(step_classes)}">
+            <div class="step-row">
+              <div class="step-label">{id_html}{tag_html}{label}</div>
+              <div class="{chip_class(actor)}">{icon} {actor}</div>
+            </div>
+          </div>
+        """)
+        if i != len(capped) - 1:
+            blocks.append('<div class="arrow-down">↓</div>')
+
+    return f'<div class="flow-vertical">{"".join(blocks)}</div>'
@@ -0,0 +1,91 @@
+# =========================
+# AI Workflow Optimizer — Incremental JSON parsing for streamed completions
+# =========================
+
+import json
+
+
+class StepStreamParser:
+    """Incremental scanner that emits step objects as soon as they close.
+
+    Feed it completion deltas with `feed()`. Every time an object inside one of
+    the watched top-level arrays (today_steps / future_steps by default) is
+    complete, it is decoded and returned as `(array_key, step_dict)`.
+    The scanner keeps the same string/escape state as `extract_json_object`,
+    so braces inside labels never confuse it. Work per character is O(1);
+    the full text is kept in `text` for the final parse. `item="["` watches
+    array items instead (the compact wire format, see wire_format.py).
+    """
+
+    def __init__(self, watch: tuple[str, ...] = ("today_steps", "future_steps"), item: str = "{"):
+        self.watch = set(watch)
+        self._open, self._close = item, "}" if item == "{" else "]"
+        self.text = ""
+        self.steps: dict[str, list[dict]] = {k: [] for k in watch}
+        self._pos = 0
+        self._stack: list[str] = []        # "{" or "[" per open container
+        self._in_str = False
+        self._escape = False
+        self._str_start = -1
+        self._last_str = None              # last completed string at top level
+        self._key = None                   # current top-level key
+        self._array_key = None             # watched key of the open top-level array
+        self._obj_start = -1               # start index of the step object being read
+
+    def feed(self, chunk: str) -> list[tuple[str, dict]]:
+        if not chunk:
+            return []
+        self.text += chunk
+        out = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+                    if len(self._stack) == 1:
+                        self._last_str = text[self._str_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_str = True
+                self._str_start = i
+            elif ch == ":" and len(self._stack) == 1:
+                self._key = self._last_str
+            elif ch == "," and len(self._stack) == 1:
+                self._key = None
+            elif ch in "{[":
+                self._stack.append(ch)
+                depth = len(self._stack)
+                if depth == 2 and ch == "[" and self._key in self.watch:
+                    self._array_key = self._key
+                elif depth == 3 and ch == self._open and self._array_key:
+                    self._obj_start = i
+            elif ch in "}]":
+                depth = len(self._stack)
+                if depth == 3 and ch == self._close and self._array_key and self._obj_start >= 0:
+                    try:
+                        obj = json.loads(text[self._obj_start:i + 1])
+                    except json.JSONDecodeError:
+                        obj = None
+                    emitted = self._emit(self._array_key, obj)
+                    if emitted is not None:
+                        out.append(emitted)
+                    self._obj_start = -1
+                elif depth == 2 and ch == "]":
+                    self._array_key = None
+                if self._stack:
+                    self._stack.pop()
+        self._pos = len(text)
+        return out
+
+    def _emit(self, key: str, obj) -> tuple[str, dict] | None:
+        """Store one completed item; returns the (key, step) reported by feed()."""
+        if not isinstance(obj, dict):
+            return None
+        self.steps[key].append(obj)
+        return key, obj
@@ -0,0 +1,132 @@
+# =========================
+# AI Workflow Optimizer — JSON helpers (extraction, parsing, local truncation repair)
+# =========================
+
+import json
+
+
+def extract_json_object(text: str) -> str | None:
+    """Extract the first complete top-level JSON object from a string."""
+    if not text:
+        return None
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth, in_str, escape = 0, False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_str:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_str = False
+        else:
+            if ch == '"':
+                in_str = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start:i+1]
+    return None
+
+def parse_json_safely(raw: str) -> dict:
+    raw = (raw or "").strip()
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        extracted = extract_json_object(raw)
+        if extracted:
+            return json.loads(extracted)
+        raise
+
+
+def _last_safe_cut(text: str, start: int, max_depth: int | None = None) -> tuple[int, str] | None:
+    """Scan a (possibly truncated) object and return (cut_index, open_stack).
+
+    Uses the same string/escape state as extract_json_object, plus a container
+    stack. A "safe cut" is a position where everything before it is complete
+    and closing the open containers yields valid JSON. Cuts are only recorded
+    while every open container below the root is an array, so a half-written
+    element (e.g. a step object missing its maps_to) is dropped whole instead
+    of being closed with missing fields. `max_depth` also rejects cuts below
+    that container depth (the root object is depth 1), for formats whose
+    elements are themselves arrays.
+    """
+    stack: list[str] = []
+    after_colon = False   # root object only: are we reading a value?
+    in_str, escape = False, False
+    safe = None
+
+    def arrays_only() -> bool:
+        return all(c == "[" for c in stack[1:]) and (max_depth is None or len(stack) <= max_depth)
+
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_str:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_str = False
+                if len(stack) == 1:
+                    if after_colon:
+                        safe = (i + 1, "".join(stack))
+                elif arrays_only():
+                    safe = (i + 1, "".join(stack))
+            continue
+
+        if ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append(ch)
+            if len(stack) == 1 or arrays_only():
+                safe = (i + 1, "".join(stack))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return (i + 1, "")
+            if len(stack) == 1 or arrays_only():
+                safe = (i + 1, "".join(stack))
+        elif ch == ":" and len(stack) == 1:
+            after_colon = True
+        elif ch == ",":
+            if len(stack) == 1:
+                if after_colon:
+                    safe = (i, "".join(stack))
+                after_colon = False
+            elif arrays_only():
+                safe = (i, "".join(stack))
+    return safe
+
+def repair_truncated_json(raw: str, defaults: dict | None = None, max_depth: int | None = None) -> dict | None:
+    """Close a truncated JSON object locally (no LLM call).
+
+    Cuts back to the last complete element, closes open arrays/objects and
+    fills missing top-level keys from `defaults`. Returns None when nothing
+    usable can be recovered.
+    """
+    text = raw or ""
+    start = text.find("{")
+    if start == -1:
+        return None
+    cut = _last_safe_cut(text, start, max_depth)
+    if cut is None:
+        return None
+    end, open_stack = cut
+    closers = "".join("}" if c == "{" else "]" for c in reversed(open_stack))
+    try:
+        data = json.loads(text[start:end] + closers)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    for key, value in (defaults or {}).items():
+        if key not in data:
+            data[key] = json.loads(json.dumps(value))  # fresh copy of the default
+    return data
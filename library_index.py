@@ -0,0 +1,122 @@
+# =========================
+# AI Workflow Optimizer — Process library index
+# (flat lookup table + tokenized inverted index, built once and read-only)
+# =========================
+
+import heapq
+import re
+from types import MappingProxyType
+from typing import NamedTuple
+
+
+class LibraryEntry(NamedTuple):
+    domain: str
+    workflow: str
+    sub_process: str
+    workflow_goal: str
+    sub_process_goal: str
+    default_steps: tuple[str, ...]
+
+
+# Field weights for ranking: a hit in the sub-process name beats a hit in a step label.
+WEIGHT_SUB_PROCESS = 4
+WEIGHT_WORKFLOW = 2
+WEIGHT_GOAL = 1
+WEIGHT_STEP = 1
+
+MIN_PREFIX = 2
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class LibraryIndex:
+    """Immutable index over Functional Domain → Process Workflow → Sub Process.
+
+    - `lookup` maps (domain, workflow, sub_process) to a LibraryEntry in O(1).
+    - `postings` maps a token to {entry key: weight}; `prefixes` does the same
+      for every token prefix (≥ 2 chars) so search-as-you-type works without
+      scanning the vocabulary. Query cost depends on the query and its
+      matches, not on the size of the library.
+    """
+
+    def __init__(self, domains: dict):
+        lookup = {}
+        first = {}
+        postings: dict[str, dict[tuple, int]] = {}
+
+        def add(text: str, key: tuple, weight: int):
+            for tok in tokenize(text):
+                slot = postings.setdefault(tok, {})
+                if slot.get(key, 0) < weight:
+                    slot[key] = weight
+
+        for domain, workflows in domains.items():
+            for workflow, wf in workflows.items():
+                sub_processes = wf.get("sub_processes") or {}
+                for sub_process, sp in sub_processes.items():
+                    key = (domain, workflow, sub_process)
+                    entry = LibraryEntry(
+                        domain=domain,
+                        workflow=workflow,
+                        sub_process=sub_process,
+                        workflow_goal=wf.get("goal", "") or "",
+                        sub_process_goal=sp.get("goal", "") or "",
+                        default_steps=tuple(sp.get("default_steps", []) or []),
+                    )
+                    lookup[key] = entry
+                    first.setdefault((domain, workflow), entry)
+                    add(sub_process, key, WEIGHT_SUB_PROCESS)
+                    add(workflow, key, WEIGHT_WORKFLOW)
+                    add(domain, key, WEIGHT_WORKFLOW)
+                    add(entry.workflow_goal, key, WEIGHT_GOAL)
+                    add(entry.sub_process_goal, key, WEIGHT_GOAL)
+                    for step in entry.default_steps:
+                        add(step, key, WEIGHT_STEP)
+
+        prefixes: dict[str, dict[tuple, int]] = {}
+        for tok, slot in postings.items():
+            for n in range(MIN_PREFIX, len(tok) + 1):
+                pslot = prefixes.setdefault(tok[:n], {})
+                for key, weight in slot.items():
+                    if pslot.get(key, 0) < weight:
+                        pslot[key] = weight
+
+        self.lookup = MappingProxyType(lookup)
+        self._first = MappingProxyType(first)
+        self.postings = MappingProxyType({t: MappingProxyType(s) for t, s in postings.items()})
+        self.prefixes = MappingProxyType({t: MappingProxyType(s) for t, s in prefixes.items()})
+
+    def __len__(self) -> int:
+        return len(self.lookup)
+
+    def get(self, domain: str, workflow: str, sub_process: str | None = None) -> LibraryEntry | None:
+        """Exact entry, else the workflow's first sub-process (same fallback as get_default_steps)."""
+        entry = self.lookup.get((domain, workflow, sub_process)) if sub_process else None
+        return entry or self._first.get((domain, workflow))
+
+    def default_steps(self, domain: str, workflow: str, sub_process: str | None = None) -> list[str]:
+        entry = self.get(domain, workflow, sub_process)
+        return list(entry.default_steps) if entry else []
+
+    def search(self, query: str, limit: int = 10) -> list[LibraryEntry]:
+        """AND-match every query token (last token as a prefix) and rank by summed field weights."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        slots = [self.postings.get(tok) for tok in tokens[:-1]]
+        last = tokens[-1]
+        slots.append(self.prefixes.get(last) if len(last) >= MIN_PREFIX else self.postings.get(last))
+        if any(not s for s in slots):
+            return []
+
+        slots.sort(key=len)  # intersect starting from the rarest token
+        scores = dict(slots[0])
+        for slot in slots[1:]:
+            scores = {k: w + slot[k] for k, w in scores.items() if k in slot}
+            if not scores:
+                return []
+        best = heapq.nsmallest(limit, scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [self.lookup[k] for k, _ in best]
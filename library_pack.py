@@ -0,0 +1,306 @@
+# =========================
+# AI Workflow Optimizer — Process library pack
+# (the library compiled into a read-only SQLite file, loaded on first access)
+#
+#   python library_pack.py            # (re)build the pack from process_library_source.py
+# =========================
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections.abc import Mapping
+
+from library_index import LibraryEntry, LibraryIndex, MIN_PREFIX, tokenize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(HERE, "process_library_source.py")
+DEFAULT_PACK_PATH = os.environ.get("WORKFLOW_LIBRARY_PACK", os.path.join(HERE, "process_library.sqlite3"))
+
+PACK_FORMAT = "1"
+
+
+def source_sha(path: str = SOURCE_PATH) -> str:
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def build_pack(domains, tool_library: dict, path: str = DEFAULT_PACK_PATH, sha: str = "") -> str:
+    """Compile DOMAINS + TOOL_LIBRARY (+ the search postings) into a pack file; returns its path."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript("""
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE domains (id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL);
+            CREATE TABLE workflows (
+                id INTEGER PRIMARY KEY, domain_id INTEGER NOT NULL, name TEXT NOT NULL, goal TEXT NOT NULL
+            );
+            CREATE TABLE entries (
+                id INTEGER PRIMARY KEY, workflow_id INTEGER NOT NULL,
+                domain TEXT NOT NULL, workflow TEXT NOT NULL, sub_process TEXT NOT NULL,
+                goal TEXT NOT NULL, steps TEXT NOT NULL
+            );
+            CREATE TABLE postings (token TEXT NOT NULL, entry_id INTEGER NOT NULL, weight INTEGER NOT NULL);
+            CREATE TABLE tools (id INTEGER PRIMARY KEY, category TEXT NOT NULL, examples TEXT NOT NULL);
+        """)
+        entry_ids = {}
+        for domain, workflows in domains.items():
+            did = conn.execute("INSERT INTO domains (name) VALUES (?)", (domain,)).lastrowid
+            for workflow, wf in workflows.items():
+                wid = conn.execute(
+                    "INSERT INTO workflows (domain_id, name, goal) VALUES (?, ?, ?)",
+                    (did, workflow, wf.get("goal", "") or ""),
+                ).lastrowid
+                for sub_process, sp in (wf.get("sub_processes") or {}).items():
+                    entry_ids[(domain, workflow, sub_process)] = conn.execute(
+                        "INSERT INTO entries (workflow_id, domain, workflow, sub_process, goal, steps) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (wid, domain, workflow, sub_process, sp.get("goal", "") or "",
+                         json.dumps(sp.get("default_steps", []) or [], ensure_ascii=False)),
+                    ).lastrowid
+
+        index = LibraryIndex(domains)
+        conn.executemany(
+            "INSERT INTO postings (token, entry_id, weight) VALUES (?, ?, ?)",
+            ((tok, entry_ids[key], w) for tok, slot in index.postings.items() for key, w in slot.items()),
+        )
+        conn.executemany(
+            "INSERT INTO tools (category, examples) VALUES (?, ?)",
+            ((cat, json.dumps(tools, ensure_ascii=False)) for cat, tools in tool_library.items()),
+        )
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ("format", PACK_FORMAT), ("source_sha", sha), ("entries", str(len(entry_ids))),
+        ])
+        conn.executescript("""
+            CREATE INDEX idx_workflows_domain ON workflows(domain_id);
+            CREATE UNIQUE INDEX idx_entries_key ON entries(domain, workflow, sub_process);
+            CREATE INDEX idx_entries_workflow ON entries(workflow_id);
+            CREATE INDEX idx_postings_token ON postings(token, entry_id);
+        """)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return path
+
+
+def build_from_source(path: str = DEFAULT_PACK_PATH) -> str:
+    import process_library_source as src
+
+    return build_pack(src.DOMAINS, src.TOOL_LIBRARY, path, sha=source_sha())
+
+
+def _pack_is_current(path: str) -> bool:
+    if not os.path.exists(path):
+        return False
+    if not os.path.exists(SOURCE_PATH):
+        return True  # deployed pack without the authoring source: trust it
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return meta.get("format") == PACK_FORMAT and meta.get("source_sha") == source_sha()
+
+
+class LibraryPack:
+    """Read-only accessor over a pack file.
+
+    Nothing is loaded up front: each query opens (per thread) a read-only
+    connection and fetches only the rows it needs, so import time and memory
+    stay flat however many templates the pack holds. Exposes the same
+    get / default_steps / search interface as LibraryIndex.
+    """
+
+    def __init__(self, path: str = DEFAULT_PACK_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._build_lock = threading.Lock()
+        self._ready = False
+
+    def _conn(self) -> sqlite3.Connection:
+        if not self._ready:
+            with self._build_lock:
+                if not self._ready:
+                    if not _pack_is_current(self.path):
+                        build_from_source(self.path)
+                    self._ready = True
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    # ---- hierarchy ----
+    def domain_names(self) -> list[str]:
+        return [r[0] for r in self._conn().execute("SELECT name FROM domains ORDER BY id")]
+
+    def workflows(self, domain: str) -> list[tuple[int, str, str]]:
+        return self._conn().execute(
+            "SELECT w.id, w.name, w.goal FROM workflows w JOIN domains d ON d.id = w.domain_id "
+            "WHERE d.name = ? ORDER BY w.id",
+            (domain,),
+        ).fetchall()
+
+    def sub_process_names(self, workflow_id: int) -> list[str]:
+        return [r[0] for r in self._conn().execute(
+            "SELECT sub_process FROM entries WHERE workflow_id = ? ORDER BY id", (workflow_id,)
+        )]
+
+    def workflow_goal(self, domain: str, workflow: str) -> str:
+        row = self._conn().execute(
+            "SELECT w.goal FROM workflows w JOIN domains d ON d.id = w.domain_id WHERE d.name = ? AND w.name = ?",
+            (domain, workflow),
+        ).fetchone()
+        return row[0] if row else ""
+
+    def tool_library(self) -> dict:
+        return {cat: json.loads(ex) for cat, ex in self._conn().execute(
+            "SELECT category, examples FROM tools ORDER BY id"
+        )}
+
+    # ---- entries (LibraryIndex-compatible) ----
+    _ENTRY_COLS = "e.domain, e.workflow, e.sub_process, w.goal, e.goal, e.steps"
+
+    def _entry(self, row) -> LibraryEntry:
+        return LibraryEntry(row[0], row[1], row[2], row[3], row[4], tuple(json.loads(row[5])))
+
+    def lookup_entry(self, domain: str, workflow: str, sub_process: str) -> LibraryEntry | None:
+        row = self._conn().execute(
+            f"SELECT {self._ENTRY_COLS} FROM entries e JOIN workflows w ON w.id = e.workflow_id "
+            "WHERE e.domain = ? AND e.workflow = ? AND e.sub_process = ?",
+            (domain, workflow, sub_process),
+        ).fetchone()
+        return self._entry(row) if row else None
+
+    def get(self, domain: str, workflow: str, sub_process: str | None = None) -> LibraryEntry | None:
+        """Exact entry, else the workflow's first sub-process (same fallback as get_default_steps)."""
+        if sub_process:
+            entry = self.lookup_entry(domain, workflow, sub_process)
+            if entry:
+                return entry
+        row = self._conn().execute(
+            f"SELECT {self._ENTRY_COLS} FROM entries e JOIN workflows w ON w.id = e.workflow_id "
+            "WHERE e.domain = ? AND e.workflow = ? ORDER BY e.id LIMIT 1",
+            (domain, workflow),
+        ).fetchone()
+        return self._entry(row) if row else None
+
+    def default_steps(self, domain: str, workflow: str, sub_process: str | None = None) -> list[str]:
+        entry = self.get(domain, workflow, sub_process)
+        return list(entry.default_steps) if entry else []
+
+    def search(self, query: str, limit: int = 10) -> list[LibraryEntry]:
+        """Same semantics as LibraryIndex.search, answered from the postings table (B-tree range scans)."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        parts, params = [], []
+        for i, tok in enumerate(tokens):
+            if i == len(tokens) - 1 and len(tok) >= MIN_PREFIX:
+                parts.append(
+                    "SELECT entry_id, MAX(weight) AS w FROM postings WHERE token >= ? AND token < ? GROUP BY entry_id"
+                )
+                params += [tok, tok + "\uffff"]
+            else:
+                parts.append("SELECT entry_id, MAX(weight) AS w FROM postings WHERE token = ? GROUP BY entry_id")
+                params.append(tok)
+        sql = (
+            f"SELECT {self._ENTRY_COLS}, m.score FROM ("
+            f"SELECT entry_id, SUM(w) AS score FROM ({' UNION ALL '.join(parts)}) "
+            "GROUP BY entry_id HAVING COUNT(*) = ?"
+            ") m JOIN entries e ON e.id = m.entry_id JOIN workflows w ON w.id = e.workflow_id "
+            "ORDER BY m.score DESC, e.domain, e.workflow, e.sub_process LIMIT ?"
+        )
+        rows = self._conn().execute(sql, params + [len(tokens), limit]).fetchall()
+        return [self._entry(r) for r in rows]
+
+
+# -------------------------
+# Lazy DOMAINS view: same nested-dict shape the app has always read
+# -------------------------
+class LazySubProcesses(Mapping):
+    """Sub-process names are fetched with the workflow; each sub-process row loads on first access."""
+
+    def __init__(self, pack: LibraryPack, domain: str, workflow: str, workflow_id: int):
+        self._pack = pack
+        self._domain = domain
+        self._workflow = workflow
+        self._workflow_id = workflow_id
+        self._names = None
+        self._loaded: dict[str, dict] = {}
+
+    def _keys(self) -> list[str]:
+        if self._names is None:
+            self._names = self._pack.sub_process_names(self._workflow_id)
+        return self._names
+
+    def __getitem__(self, name: str) -> dict:
+        if name not in self._loaded:
+            entry = self._pack.lookup_entry(self._domain, self._workflow, name)
+            if entry is None:
+                raise KeyError(name)
+            sp = {"default_steps": list(entry.default_steps)}
+            if entry.sub_process_goal:
+                sp["goal"] = entry.sub_process_goal
+            self._loaded[name] = sp
+        return self._loaded[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self._keys()
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+
+class LazyDomains(Mapping):
+    """Domain names load on first iteration; a domain's workflows load on first access."""
+
+    def __init__(self, pack: LibraryPack):
+        self._pack = pack
+        self._names = None
+        self._loaded: dict[str, dict] = {}
+
+    def _keys(self) -> list[str]:
+        if self._names is None:
+            self._names = self._pack.domain_names()
+        return self._names
+
+    def __getitem__(self, domain: str) -> dict:
+        if domain not in self._loaded:
+            rows = self._pack.workflows(domain)
+            if not rows:
+                raise KeyError(domain)
+            self._loaded[domain] = {
+                name: {"goal": goal, "sub_processes": LazySubProcesses(self._pack, domain, name, wid)}
+                for wid, name, goal in rows
+            }
+        return self._loaded[domain]
+
+    def __contains__(self, domain) -> bool:
+        return domain in self._keys()
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+
+if __name__ == "__main__":
+    out = build_from_source(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PACK_PATH)
+    print(f"wrote {out} ({len(LibraryPack(out))} sub-processes)")
@@ -0,0 +1,376 @@
+# =========================
+# AI Workflow Optimizer — LLM calls (sync, streaming, async) behind the shared rate limiter
+# =========================
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from openai import RateLimitError, APIError, APITimeoutError
+
+from json_utils import parse_json_safely
+from metrics import inc, observe_stage, span
+from prompt_builder import STATIC_PREFIX_SHA, build_section_messages
+from rate_limiter import backoff_delay, estimate_tokens, get_rate_limiter, retry_after_seconds
+from token_budget import FULL_SECTIONS, max_tokens_for, observe, repair_max_tokens
+
+log = logging.getLogger("workflow_optimizer.llm")
+
+MODEL = "gpt-4.1-mini"
+
+# Pool tuning: keep enough warm keep-alive connections for concurrent sessions,
+# and hold them long enough that a user's next click reuses one.
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.environ.get("OPENAI_POOL_MAX_CONNECTIONS", "64")),
+    max_keepalive_connections=int(os.environ.get("OPENAI_POOL_MAX_KEEPALIVE", "32")),
+    keepalive_expiry=float(os.environ.get("OPENAI_POOL_KEEPALIVE_EXPIRY", "120")),
+)
+# Long read timeout: a full-result completion (~2000 tokens) can legitimately take a while.
+HTTP_TIMEOUT = httpx.Timeout(
+    connect=5.0, read=float(os.environ.get("OPENAI_READ_TIMEOUT", "90")), write=10.0, pool=10.0
+)
+
+
+# -------------------------
+# Pooled clients (one per API key per process, reused across reruns and sessions)
+# -------------------------
+class ConnectionStats:
+    """Counts HTTP requests vs new TCP connections / TLS handshakes via httpcore trace events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    def _on_event(self, event_name: str) -> None:
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def trace(self, event_name, info):
+        self._on_event(event_name)
+
+    async def trace_async(self, event_name, info):
+        self._on_event(event_name)
+
+    def on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def on_request_async(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace_async
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_requests": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else 0.0,
+            }
+
+
+CONNECTION_STATS = ConnectionStats()
+_CLIENTS: dict[tuple[str, str], object] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def get_client(api_key: str) -> OpenAI:
+    """Shared sync client with a keep-alive pool (retries are ours, so the SDK's are off)."""
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(("sync", api_key))
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                max_retries=0,
+                http_client=httpx.Client(
+                    limits=POOL_LIMITS,
+                    timeout=HTTP_TIMEOUT,
+                    event_hooks={"request": [CONNECTION_STATS.on_request]},
+                ),
+            )
+            _CLIENTS[("sync", api_key)] = client
+        return client
+
+def get_async_client(api_key: str) -> AsyncOpenAI:
+    """Async counterpart of get_client; bound to the event loop that first uses it."""
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(("async", api_key))
+        if client is None or client.is_closed():
+            client = AsyncOpenAI(
+                api_key=api_key,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=POOL_LIMITS,
+                    timeout=HTTP_TIMEOUT,
+                    event_hooks={"request": [CONNECTION_STATS.on_request_async]},
+                ),
+            )
+            _CLIENTS[("async", api_key)] = client
+        return client
+
+def connection_stats() -> dict:
+    return CONNECTION_STATS.snapshot()
+
+
+# -------------------------
+# Token accounting (prompt / cached prompt / completion, from resp.usage)
+# -------------------------
+_USAGE_LOCK = threading.Lock()
+_USAGE_TOTALS = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+def record_usage(usage) -> dict | None:
+    """Log one response's token counts and add them to the process totals."""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    row = {
+        "prompt_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "cached_tokens": int(getattr(details, "cached_tokens", 0) or 0),
+        "completion_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
+    }
+    with _USAGE_LOCK:
+        _USAGE_TOTALS["requests"] += 1
+        for k, v in row.items():
+            _USAGE_TOTALS[k] += v
+    for k, v in row.items():
+        inc("workflow_tokens_total", v, kind=k.removesuffix("_tokens"))
+    log.info(
+        "llm usage prompt=%d cached=%d completion=%d prefix=%s",
+        row["prompt_tokens"], row["cached_tokens"], row["completion_tokens"], STATIC_PREFIX_SHA,
+    )
+    return row
+
+def usage_totals() -> dict:
+    """Process-wide token totals plus the share of prompt tokens served from the provider cache."""
+    with _USAGE_LOCK:
+        totals = dict(_USAGE_TOTALS)
+    totals["cached_prompt_ratio"] = (
+        round(totals["cached_tokens"] / totals["prompt_tokens"], 3) if totals["prompt_tokens"] else 0.0
+    )
+    return totals
+
+def _settle(limiter, reserved: int, usage, sizing: tuple, max_tokens: int, finish: str | None) -> None:
+    """Account one response: token totals, limiter refund, and a max_tokens calibration sample."""
+    record_usage(usage)
+    total = getattr(usage, "total_tokens", None)
+    if total is not None:
+        limiter.refund(reserved - int(total))
+    if finish == "length":
+        inc("workflow_truncated_total", sections=str(len(sizing[1])))
+    observe(*sizing, usage, max_tokens, finish)
+
+def _release(limiter, reserved: int, max_tokens: int, text: str = "") -> None:
+    """Refund an attempt that ended without usage: all of it if no output came back,
+    otherwise the completion budget it didn't use."""
+    limiter.refund(max_tokens - len(text) // 4 if text else reserved)
+
+def _finish_reason(resp) -> str | None:
+    choices = getattr(resp, "choices", None) or []
+    return getattr(choices[0], "finish_reason", None) if choices else None
+
+def _retry_wait(limiter, err, attempt: int) -> float:
+    """Seconds this caller should sleep before its next attempt.
+
+    A 429 carrying Retry-After pauses the shared limiter for everyone and this
+    caller waits out the header plus jitter, so retries don't all land at the
+    instant the pause ends; otherwise fall back to jittered backoff.
+    """
+    retry_after = retry_after_seconds(err) if isinstance(err, RateLimitError) else None
+    if retry_after is not None:
+        limiter.pause(retry_after)
+    return backoff_delay(attempt, retry_after)
+
+
+def call_openai_with_retry(
+    client, messages, max_retries: int = 3, max_tokens: int | None = None,
+    n_steps: int | None = None, sections=FULL_SECTIONS,
+):
+    """Blocking completion. max_tokens defaults to the calibrated budget for (n_steps, sections)."""
+    if max_tokens is None:
+        max_tokens = max_tokens_for(n_steps, sections)
+    limiter = get_rate_limiter()
+    reserved = estimate_tokens(messages, max_tokens)
+    last_err = None
+    for attempt in range(max_retries):
+        with span("queue"):
+            limiter.acquire(reserved)
+        try:
+            with span("completion", mode="sync"):
+                resp = client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    temperature=0.10,
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_object"},
+                )
+            _settle(limiter, reserved, getattr(resp, "usage", None), (n_steps, sections), max_tokens,
+                    _finish_reason(resp))
+            return resp
+        except (RateLimitError, APITimeoutError, APIError) as e:
+            last_err = e
+            _release(limiter, reserved, max_tokens)
+            wait = _retry_wait(limiter, e, attempt)
+            if attempt == max_retries - 1:
+                break  # out of attempts: raise now rather than after one more backoff
+            inc("workflow_llm_retries_total", error=type(e).__name__)
+            with span("retry_sleep"):
+                time.sleep(wait)
+    raise last_err
+
+def call_openai_streaming(
+    client, messages, on_delta, max_retries: int = 3, max_tokens: int | None = None,
+    n_steps: int | None = None, sections=FULL_SECTIONS,
+) -> str:
+    """Stream the completion, passing each text delta to on_delta; returns the full text.
+
+    Retries only happen before the first token arrives — once output has been
+    shown we never restart the stream underneath the user. If on_delta raises
+    (the caller abandoned the call), the stream is closed and the unused part of
+    the reservation refunded before the exception propagates.
+    """
+    if max_tokens is None:
+        max_tokens = max_tokens_for(n_steps, sections)
+    limiter = get_rate_limiter()
+    reserved = estimate_tokens(messages, max_tokens)
+    last_err = None
+    for attempt in range(max_retries):
+        parts = []
+        finish = None
+        stream = None
+        settled = False
+        with span("queue"):
+            limiter.acquire(reserved)
+        t0 = time.perf_counter()
+        try:
+            stream = client.chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=0.10,
+                max_tokens=max_tokens,
+                response_format={"type": "json_object"},
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    _settle(limiter, reserved, chunk.usage, (n_steps, sections), max_tokens, finish)
+                    settled = True
+                if not chunk.choices:
+                    continue
+                finish = chunk.choices[0].finish_reason or finish
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    if not parts:
+                        observe_stage("ttft", time.perf_counter() - t0)
+                    parts.append(delta)
+                    on_delta(delta)
+            observe_stage("completion", time.perf_counter() - t0, mode="stream", outcome="ok")
+            return "".join(parts)
+        except (RateLimitError, APITimeoutError, APIError) as e:
+            inc("workflow_errors_total", stage="completion", type=type(e).__name__)
+            if not settled:
+                _release(limiter, reserved, max_tokens, "".join(parts))
+            if parts:
+                raise
+            last_err = e
+            wait = _retry_wait(limiter, e, attempt)
+            if attempt == max_retries - 1:
+                break
+            inc("workflow_llm_retries_total", error=type(e).__name__)
+            with span("retry_sleep"):
+                time.sleep(wait)
+        except Exception:
+            # Abandoned by the caller: stop reading and return the completion budget not used.
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            if not settled:
+                _release(limiter, reserved, max_tokens, "".join(parts))
+            raise
+    raise last_err
+
+async def call_async_with_retry(
+    client, messages, max_retries: int = 3, max_tokens: int | None = None,
+    n_steps: int | None = None, sections=FULL_SECTIONS,
+):
+    """Async variant for batch workers; returns (response, attempts).
+
+    The limiter's file locking and I/O run in a worker thread, off the event loop.
+    """
+    if max_tokens is None:
+        max_tokens = max_tokens_for(n_steps, sections)
+    limiter = get_rate_limiter()
+    reserved = estimate_tokens(messages, max_tokens)
+    last_err = None
+    for attempt in range(max_retries):
+        with span("queue"):
+            await limiter.acquire_async(reserved)
+        try:
+            with span("completion", mode="async"):
+                resp = await client.chat.completions.create(
+                    model=MODEL,
+                    messages=messages,
+                    temperature=0.10,
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_object"},
+                )
+            await asyncio.to_thread(
+                _settle, limiter, reserved, getattr(resp, "usage", None), (n_steps, sections), max_tokens,
+                _finish_reason(resp),
+            )
+            return resp, attempt + 1
+        except (RateLimitError, APITimeoutError, APIError) as e:
+            last_err = e
+            await asyncio.to_thread(_release, limiter, reserved, max_tokens)
+            wait = await asyncio.to_thread(_retry_wait, limiter, e, attempt)
+            if attempt == max_retries - 1:
+                break
+            inc("workflow_llm_retries_total", error=type(e).__name__)
+            with span("retry_sleep"):
+                await asyncio.sleep(wait)
+    raise last_err
+
+def try_repair_json(client, raw_partial: str, n_steps: int | None = None) -> str:
+    """If model output gets truncated, ask it to output the complete valid JSON object."""
+    repair_prompt = f"""
+You returned an incomplete/truncated JSON object. Return ONLY one complete valid JSON object.
+
+Rules:
+- Output must be a single JSON object (no markdown, no extra commentary).
+- Preserve the same schema and keys.
+- Complete any open arrays/objects and missing fields.
+- Ensure JSON is valid.
+
+PARTIAL_JSON_START:
+{raw_partial}
+PARTIAL_JSON_END
+""".strip()
+
+    messages = [
+        {"role": "system", "content": "Return ONLY one valid JSON object. No markdown."},
+        {"role": "user", "content": repair_prompt},
+    ]
+    inc("workflow_repairs_total", kind="llm_full")
+    with span("repair_llm"):
+        # The repaired object is a whole result, and the original budget just ran out.
+        resp = call_openai_with_retry(client, messages, max_retries=2, max_tokens=repair_max_tokens(n_steps),
+                                      n_steps=n_steps)
+    return resp.choices[0].message.content or ""
+
+def regenerate_sections(client, fields: dict, data: dict, sections: list[str]) -> dict:
+    """Ask for just the given sections of a result; returns the parsed JSON object."""
+    messages = build_section_messages(fields, data, sections)
+    resp = call_openai_with_retry(client, messages, max_retries=2, n_steps=len(fields.get("steps") or []),
+                                  sections=sections)
+    return parse_json_safely(resp.choices[0].message.content or "")
@@ -0,0 +1,197 @@
+# =========================
+# AI Workflow Optimizer — Offline load driver
+#
+# Simulates N concurrent app sessions running the Generate flow through the
+# app's Engine (single-flight → LLM call, streamed or not → parse → local/LLM
+# repair → contract check, degrading to the local answer on provider errors)
+# against the fake_openai.py stand-in, and reports throughput, latency and
+# time-to-first-step percentiles, outcome and repair counts and the server's
+# CPU / memory.
+#
+#   python load_driver.py --sessions 30 --requests 5 --stream \
+#       --server-args "--latency-ms 800 --rate-429 0.05 --truncate-rate 0.1"
+#   python load_driver.py --base-url http://127.0.0.1:8765/v1 --sessions 10
+#
+# Runs in its own cache dir with a generous rate limit unless OPENAI_RPM /
+# OPENAI_TPM / WORKFLOW_CACHE_DIR are already set.
+# =========================
+
+import argparse
+import json
+import os
+import random
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "n": len(values),
+        "mean": round(statistics.fmean(values), 4) if values else None,
+        **{f"p{p}": round(percentile(values, p), 4) if values else None for p in (50, 95, 99)},
+        "max": round(max(values), 4) if values else None,
+    }
+
+def spawn_server(server_args: str) -> tuple[subprocess.Popen, str]:
+    """Start fake_openai.py on a free port; returns (process, base_url)."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_openai.py")
+    proc = subprocess.Popen(
+        [sys.executable, script, "--port", "0", *shlex.split(server_args)],
+        stderr=subprocess.PIPE, text=True,
+    )
+    line = proc.stderr.readline()
+    if "http://" not in line:
+        proc.kill()
+        raise RuntimeError(f"fake server failed to start: {line.strip()}")
+    return proc, line.strip().split(" on ", 1)[1]
+
+def server_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(base_url.rsplit("/v1", 1)[0] + "/stats", timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def outcome_of(result) -> str:
+    """Report bucket for an Engine GenerationResult."""
+    if result.source == "local":
+        return "rate_limited" if (result.notice or "").startswith("Rate limit") else "degraded"
+    if result.contract_errors:
+        return "contract_errors"
+    return "ok" if result.source in ("llm", "speculation") else result.source
+
+def run_session(session: int, jobs: list[dict], args, engine, results: list, lock: threading.Lock) -> None:
+    from openai import APIError
+
+    rng = random.Random(args.seed + session if args.seed is not None else None)
+    for _ in range(args.requests):
+        if args.think_time > 0:
+            time.sleep(rng.expovariate(1 / args.think_time))
+        fields = rng.choice(jobs)
+        row = {"session": session, "outcome": "ok", "ttft_s": None}
+        t0 = time.perf_counter()
+
+        # Streamed runs: time until the first step is shown, as in the app.
+        def on_steps(key, steps, row=row):
+            if row["ttft_s"] is None:
+                row["ttft_s"] = time.perf_counter() - t0
+
+        try:
+            row["outcome"] = outcome_of(engine.generate(fields, stream=args.stream, on_steps=on_steps))
+        except APIError as e:
+            row["outcome"] = type(e).__name__
+        except Exception as e:
+            row["outcome"] = "error:" + type(e).__name__
+        row["latency_s"] = time.perf_counter() - t0
+        with lock:
+            results.append(row)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate concurrent Generate sessions against a fake server.")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=3, help="Generate clicks per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between clicks")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--base-url", help="use a running server instead of spawning fake_openai.py")
+    parser.add_argument("--server-args", default="", help="arguments for the spawned fake_openai.py")
+    parser.add_argument("--read-timeout", type=float, default=10.0, help="client read timeout (s)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    # Isolate the shared limiter state and relax the quota before llm_client is imported.
+    os.environ.setdefault("WORKFLOW_CACHE_DIR", tempfile.mkdtemp(prefix="wf-load-"))
+    os.environ.setdefault("OPENAI_RPM", "100000")
+    os.environ.setdefault("OPENAI_TPM", "1000000000")
+    os.environ.setdefault("OPENAI_READ_TIMEOUT", str(args.read_timeout))
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    # One span line per stage per request would bury the report; opt in with WORKFLOW_LOG_LEVEL=INFO.
+    os.environ.setdefault("WORKFLOW_LOG_LEVEL", "WARNING")
+
+    proc = None
+    base_url = args.base_url
+    if not base_url:
+        proc, base_url = spawn_server(args.server_args)
+    os.environ["OPENAI_BASE_URL"] = base_url
+
+    try:
+        from batch_sweep import expand_grid
+        from engine import Engine
+        from metrics import REGISTRY, configure_logging
+
+        configure_logging()
+        jobs = expand_grid()
+        # One engine for every session, like the app's: shared validator and in-flight table.
+        # No result cache, so every click that isn't coalesced reaches the server.
+        engine = Engine(os.environ["OPENAI_API_KEY"])
+        repairs_before = REGISTRY.snapshot()["counters"].get("workflow_repairs_total", {})
+        before = server_stats(base_url)
+        results: list[dict] = []
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(target=run_session, args=(i, jobs, args, engine, results, lock), daemon=True)
+            for i in range(args.sessions)
+        ]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        after = server_stats(base_url)
+        repairs = {
+            kind: value - repairs_before.get(kind, 0)
+            for kind, value in REGISTRY.snapshot()["counters"].get("workflow_repairs_total", {}).items()
+            if value != repairs_before.get(kind, 0)
+        }
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=5)
+
+    outcomes: dict[str, int] = {}
+    for r in results:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+    cpu = (after["cpu_user_s"] + after["cpu_system_s"]) - (before["cpu_user_s"] + before["cpu_system_s"])
+    report = {
+        "sessions": args.sessions,
+        "requests": len(results),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(results) / wall, 3) if wall else None,
+        "latency_s": summarize([r["latency_s"] for r in results]),
+        "ttft_s": summarize([r["ttft_s"] for r in results if r["ttft_s"] is not None]),
+        "outcomes": outcomes,
+        "repairs": repairs,
+        "server": {
+            "requests": after["requests"] - before["requests"],
+            "rate_limited": after["rate_limited"] - before["rate_limited"],
+            "truncated": after["truncated"] - before["truncated"],
+            "timeouts": after["timeouts"] - before["timeouts"],
+            "cpu_s": round(cpu, 3),
+            "cpu_util": round(cpu / wall, 3) if wall else None,
+            "rss_kb": after.get("rss_kb"),
+            "max_rss_kb": after.get("max_rss_kb"),
+        },
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>15}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
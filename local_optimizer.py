@@ -0,0 +1,307 @@
+# =========================
+# AI Workflow Optimizer — Deterministic local optimizer
+# (rule-based, no network: instant preview + degraded-mode answer)
+#
+# Produces the same JSON schema the renderer reads (today_steps, future_steps
+# with maps_to, human_shift, deltas, glossary, tool_suggestions, notes) from
+# the input steps alone, using keyword rules for intent / actor / automation
+# potential and keyword→category matching against TOOL_LIBRARY.
+# =========================
+
+import re
+
+from process_library import TIME_HORIZONS, MATURITY_LEVELS
+from prompt_builder import normalize_actor
+
+MIN_STEPS = 6
+MAX_STEPS = 12
+# Generic closing steps appended to flows shorter than MIN_STEPS (the schema needs 6–12 per side).
+PAD_STEPS = (
+    "Review exceptions", "Notify stakeholders", "Record outcome in ERP", "Track status",
+    "Confirm completion", "Close request",
+)
+
+
+def _rx(*words: str) -> re.Pattern:
+    return re.compile(r"\b(?:" + "|".join(words) + r")", re.IGNORECASE)
+
+# Intent rules, checked in order (first match wins; default Admin).
+INTENT_RULES = [
+    ("Control", _rx("approv", "review", "check", "validat", "audit", "complian", "sign-off", "reconcil",
+                    "verif", "calibrat", "risk", "control", "legal", "cab\\b", "test")),
+    ("Decision", _rx("decision", "decide", "select", "award", "evaluat", "prioriti", "assess", "shortlist",
+                     "rating", "strategy", "plan", "scope", "budget", "forecast", "diagnos", "triage")),
+    ("Relationship", _rx("communicat", "conversation", "interview", "negotiat", "outreach", "onboarding",
+                         "feedback", "support", "stakeholder", "meeting", "check-in", "customer",
+                         "handover", "dispute", "escalat", "updates")),
+]
+
+# Steps that a system of record typically executes today.
+ERP_RULE = _rx("erp", "hris", "system", "posting", "post\\b", "upload", "record", "entry", "payment",
+               "receipt", "deploy", "publish", "close-out", "repository", "po\\b", "invoice", "journal",
+               "account update", "ledger", "release")
+
+# Admin work with high automation potential (extraction, entry, matching, routing, scheduling).
+AUTOMATABLE_RULE = _rx("capture", "intake", "entry", "upload", "update", "matching", "match", "schedul",
+                       "triage", "tracking", "posting", "data", "invoice", "receipt", "setup", "search",
+                       "draft", "monitor", "report", "distribut", "assignment", "detection", "request")
+
+TOOL_KEYWORDS = {
+    "IDP / OCR (Document processing)": _rx("invoice", "document", "resume", "contract", "receipt", "capture",
+                                           "scan", "form", "background", "redline", "clause", "evidence"),
+    "RPA": _rx("update", "entry", "posting", "upload", "data", "reconcil", "matching", "match", "setup"),
+    "Workflow / BPM": _rx("approv", "request", "intake", "routing", "change", "incident", "ticket",
+                          "assignment", "escalat", "sign-off", "workflow", "cab\\b"),
+    "ERP / Finance": _rx("invoice", "payment", "journal", "close", "budget", "po\\b", "accrual", "ledger",
+                         "payable", "receivable", "cash", "goods", "reconcil", "financial"),
+    "CRM / Sales": _rx("lead", "opportunit", "customer", "pipeline", "quote", "sales", "renewal", "upsell",
+                       "proposal", "checkout"),
+    "HRIS / Talent": _rx("hire", "hiring", "onboarding", "employee", "performance", "promotion", "transfer",
+                         "offer", "candidate", "payroll", "hris", "interview", "probation", "rating"),
+    "Analytics / BI": _rx("report", "monitor", "performance", "analys", "forecast", "variance", "review",
+                          "aging", "optimization", "learnings"),
+    "Knowledge / Search": _rx("policy", "search", "knowledge", "research", "requirement", "clarification",
+                              "brief", "template", "diagnos", "profile"),
+    "Integration / iPaaS": _rx("integrat", "sync", "handover", "master data", "vendor", "supplier setup",
+                               "deployment", "release", "fulfillment"),
+    "Contact Center / CX": _rx("support", "outreach", "customer update", "communicat", "inquir", "dispute",
+                               "customer"),
+}
+
+TOOL_USE = {
+    "IDP / OCR (Document processing)": "Extract fields from incoming documents instead of re-keying them",
+    "RPA": "Automate repetitive system updates and data transfers between screens",
+    "Workflow / BPM": "Route requests and approvals with SLAs, audit trail and escalation",
+    "ERP / Finance": "Use native ERP automation (matching, posting rules, workflow) as the system of record",
+    "CRM / Sales": "Keep customer and pipeline data in one place and trigger next-best actions",
+    "HRIS / Talent": "Drive the employee/candidate record and self-service from the HR system",
+    "Analytics / BI": "Monitor cycle time, exceptions and outcomes with shared dashboards",
+    "Knowledge / Search": "Give people AI-assisted search over policies, templates and past cases",
+    "Integration / iPaaS": "Connect systems so data flows without manual hand-offs",
+    "Contact Center / CX": "Handle outreach and inquiries with assisted agents and self-service",
+}
+
+GLOSSARY = {
+    "Touchless processing": "A step completed end-to-end by systems without manual intervention.",
+    "Human-in-the-loop": "AI proposes or prepares; a person reviews and decides before it takes effect.",
+    "Control checkpoint": "A deliberate review/approval step that provides assurance over the process.",
+    "Exception handling": "Routing only the cases that fail rules or confidence thresholds to people.",
+    "Straight-through rate": "Share of cases that complete without any manual touch.",
+    "Segregation of duties (SoD)": "Splitting key tasks across people so no one person controls a whole transaction.",
+    "IDP": "Intelligent document processing: extracting structured data from documents with OCR + ML.",
+    "RPA": "Robotic process automation: software bots that repeat rule-based system interactions.",
+    "BPM": "Business process management: orchestrating tasks, approvals and SLAs in a workflow engine.",
+    "iPaaS": "Integration platform as a service: managed connectors that sync data between systems.",
+    "System of record": "The authoritative system (e.g. ERP, HRIS, CRM) holding the official data.",
+    "Cycle time": "Elapsed time from the start of a process to its completion.",
+}
+GLOSSARY_FOR_TOOL = {
+    "IDP / OCR (Document processing)": "IDP",
+    "RPA": "RPA",
+    "Workflow / BPM": "BPM",
+    "Integration / iPaaS": "iPaaS",
+    "ERP / Finance": "System of record",
+    "HRIS / Talent": "System of record",
+    "CRM / Sales": "System of record",
+}
+
+
+_CONNECTORS = {"&", "/", "-", "–", "and", "or", "to", "of", "for", "the", "a"}
+
+def _short(label: str) -> str:
+    """1–3 word label without a dangling connector ("Job approval &" → "Job approval")."""
+    words = (label or "").strip().split()[:3]
+    while len(words) > 1 and words[-1].lower() in _CONNECTORS:
+        words.pop()
+    return " ".join(words) if words else "Step"
+
+def classify_intent(label: str) -> str:
+    for intent, rule in INTENT_RULES:
+        if rule.search(label):
+            return intent
+    return "Admin"
+
+def _group_steps(steps: list[str]) -> list[list[str]]:
+    """Fold more than MAX_STEPS inputs into MAX_STEPS contiguous groups (order preserved)."""
+    n = len(steps)
+    if n <= MAX_STEPS:
+        return [[s] for s in steps]
+    groups = []
+    for g in range(MAX_STEPS):
+        groups.append(steps[g * n // MAX_STEPS:(g + 1) * n // MAX_STEPS])
+    return groups
+
+def _horizon_level(time_horizon: str) -> int:
+    return TIME_HORIZONS.index(time_horizon) if time_horizon in TIME_HORIZONS else 0
+
+def _maturity_level(maturity: str) -> int:
+    return MATURITY_LEVELS.index(maturity) if maturity in MATURITY_LEVELS else 1
+
+
+def build_today_steps(steps: list[str]) -> list[dict]:
+    """One today step per input step (grouped above MAX_STEPS, padded with PAD_STEPS below MIN_STEPS)."""
+    groups = _group_steps(steps)
+    groups += [[s] for s in PAD_STEPS[:max(0, MIN_STEPS - len(groups))]]
+    today = []
+    for i, group in enumerate(groups, start=1):
+        label = group[0]
+        text = " ".join(group)
+        intent = classify_intent(text)
+        actor = "ERP" if (ERP_RULE.search(text) and intent == "Admin") else "HUMAN"
+        today.append({"id": f"T{i}", "label": _short(label), "actor": actor, "intent": intent, "_text": text})
+    return today
+
+def build_future_steps(today: list[dict], horizon: int, maturity: int) -> list[dict]:
+    """Map today steps to future steps: merge runs of automatable admin work, assist the rest."""
+    max_merge = 2 + horizon  # later horizons consolidate more aggressively
+    merges_left = max(0, len(today) - 6)  # never consolidate below the schema's 6 future steps
+    automated_actor = "AI+ERP+HUMAN" if horizon == 0 and maturity == 0 else "AI+ERP"
+    future = []
+    run: list[dict] = []
+
+    def flush_run():
+        if not run:
+            return
+        label = run[0]["label"] if len(run) == 1 else f"Auto {_short(run[0]['label']).split()[0].lower()}"
+        future.append({
+            "label": _short(label if len(run) == 1 else label.capitalize()),
+            "actor": automated_actor,
+            "intent": "Admin",
+            "maps_to": [t["id"] for t in run],
+        })
+        run.clear()
+
+    for t in today:
+        automatable = t["intent"] == "Admin" and (AUTOMATABLE_RULE.search(t["_text"]) or t["actor"] == "ERP")
+        if automatable:
+            if run and merges_left <= 0:
+                flush_run()
+            if run:
+                merges_left -= 1
+            run.append(t)
+            if len(run) >= max_merge:
+                flush_run()
+            continue
+        flush_run()
+        if t["intent"] in ("Control", "Decision"):
+            actor = "AI+HUMAN"
+        elif t["intent"] == "Relationship":
+            actor = "HUMAN"
+        else:
+            actor = "AI+HUMAN"
+        future.append({"label": t["label"], "actor": actor, "intent": t["intent"], "maps_to": [t["id"]]})
+    flush_run()
+
+    future = future[:MAX_STEPS]
+    if not any(f["intent"] == "Control" for f in future):
+        anchor = today[-1]["id"] if today else "T1"
+        checkpoint = {"label": "Control checkpoint", "actor": "AI+HUMAN", "intent": "Control", "maps_to": [anchor]}
+        future.insert(max(0, len(future) - 1), checkpoint)
+        if len(future) > MAX_STEPS:
+            # No room for one more step: the checkpoint takes over the last step's today steps.
+            last = future.pop()
+            checkpoint["maps_to"] = list(dict.fromkeys(checkpoint["maps_to"] + last["maps_to"]))
+    # Every today step must stay mapped by some future step.
+    mapped = {m for f in future for m in f["maps_to"]}
+    for t in today:
+        if t["id"] not in mapped and future:
+            future[-1]["maps_to"].append(t["id"])
+    for i, f in enumerate(future, start=1):
+        f["id"] = f"F{i}"
+        f["actor"] = normalize_actor(f["actor"])
+    return [{"id": f["id"], "label": f["label"], "actor": f["actor"], "intent": f["intent"],
+             "maps_to": f["maps_to"]} for f in future]
+
+def suggest_tools(today: list[dict], tool_library: dict, maturity: int, constraints: list[str]) -> list[dict]:
+    scored = []
+    for order, (category, rule) in enumerate(TOOL_KEYWORDS.items()):
+        if category not in tool_library:
+            continue
+        hits = [t for t in today if rule.search(t["_text"])]
+        if hits:
+            scored.append((-len(hits), order, category, hits))
+    scored.sort()
+    if len(scored) < 4:  # always return exactly 4: pad with broadly useful categories
+        for category in ("Workflow / BPM", "Analytics / BI", "Knowledge / Search", "RPA"):
+            if category in tool_library and all(category != s[2] for s in scored):
+                scored.append((0, 99, category, []))
+    fit = "Start with a pilot on the highest-volume path." if maturity == 0 else "Extend existing platforms before adding new ones."
+    if constraints:
+        fit += " Check fit against: " + "; ".join(c.split(" (")[0] for c in constraints[:2]) + "."
+    out = []
+    for _, _, category, hits in scored[:4]:
+        where = ", ".join(f"{t['id']} {t['label']}" for t in hits[:3])
+        use = TOOL_USE.get(category, "Apply where it removes manual work")
+        out.append({
+            "tool_category": category,
+            "example_tools": list(tool_library[category][:3]),
+            "use_in_workflow": f"{use} ({where})." if where else f"{use}.",
+            "fit_notes": fit,
+        })
+    return out
+
+def build_glossary(tools: list[dict], constraints: list[str]) -> list[dict]:
+    terms = ["Human-in-the-loop", "Control checkpoint", "Touchless processing"]
+    for t in tools:
+        term = GLOSSARY_FOR_TOOL.get(t["tool_category"])
+        if term and term not in terms:
+            terms.append(term)
+    if any("SoD" in c for c in constraints):
+        terms.append("Segregation of duties (SoD)")
+    for term in ("Exception handling", "Straight-through rate", "Cycle time"):
+        terms.append(term)
+    seen = list(dict.fromkeys(terms))[:6]
+    return [{"term": t, "definition": GLOSSARY[t]} for t in seen]
+
+
+def optimize_locally(fields: dict, tool_library: dict | None = None) -> dict:
+    """Rule-based result in the LLM output schema. Pure, deterministic, no I/O beyond TOOL_LIBRARY."""
+    if tool_library is None:
+        from process_library import TOOL_LIBRARY as tool_library
+
+    horizon = _horizon_level(fields.get("time_horizon", ""))
+    maturity = _maturity_level(fields.get("maturity", ""))
+    constraints = list(fields.get("constraints") or [])
+
+    steps = list(fields.get("steps") or [])
+    today = build_today_steps(steps)
+    future = build_future_steps(today, horizon, maturity)
+    tools = suggest_tools(today, tool_library, maturity, constraints)
+
+    automated = [f for f in future if f["actor"] in ("AI+ERP", "AI+ERP+HUMAN", "AI", "ERP")]
+    absorbed = sum(len(f["maps_to"]) for f in automated)
+    manual_today = sum(1 for t in today if t["actor"] == "HUMAN")
+    manual_future = sum(1 for f in future if f["actor"] == "HUMAN")
+    human_focus = [f["label"] for f in future if f["intent"] in ("Decision", "Relationship")][:3]
+
+    for t in today:
+        t.pop("_text", None)
+
+    return {
+        "functional_domain": fields.get("functional_domain", ""),
+        "process_workflow": fields.get("process_workflow", ""),
+        "sub_process": fields.get("sub_process", ""),
+        "time_horizon": fields.get("time_horizon", ""),
+        "today_steps": today,
+        "future_steps": future,
+        "human_shift": [
+            "Less time on data entry, chasing and re-keying; more on judgement calls.",
+            "People review AI-prepared work at control points instead of preparing it.",
+            ("Human effort concentrates on: " + ", ".join(human_focus) + ".") if human_focus
+            else "Human effort concentrates on exceptions and stakeholder conversations.",
+        ],
+        "deltas": [
+            f"{len(today)} → {len(future)} steps.",
+            f"{absorbed} of {len(today)} today steps become system-led (touchless or exception-only).",
+            f"Purely manual steps: {manual_today} → {manual_future}.",
+            f"{sum(1 for f in future if f['intent'] == 'Control')} explicit control checkpoint(s) retained.",
+        ],
+        "glossary": build_glossary(tools, constraints),
+        "tool_suggestions": tools,
+        "notes": [
+            "Rule-based preview generated locally from your steps (no AI call)." if len(steps) >= MIN_STEPS
+            else f"Rule-based preview (no AI call); generic closing steps were added to reach {MIN_STEPS} steps.",
+            "Automation potential is inferred from step wording; validate with process owners.",
+            "Outputs are indicative and high-level, not professional advice.",
+        ],
+    }
@@ -0,0 +1,203 @@
+# =========================
+# AI Workflow Optimizer — Stage timings and counters
+#
+# In-process registry of counters and latency histograms for the Generate
+# path (prompt build, queueing, retry sleeps, time to first token, completion,
+# parse, repairs, contract checks, render). Every span is also logged as one
+# JSON line on the "workflow_optimizer.metrics" logger; the entry points call
+# configure_logging() so those lines reach stderr (WORKFLOW_LOG_LEVEL).
+#
+# Export: render_prometheus() returns the Prometheus text format; the app
+# writes it to WORKFLOW_METRICS_FILE (default .cache/metrics.prom) after each
+# request, for a node_exporter textfile collector or any scraper that can
+# read a file. One file per process — point each replica at its own path.
+# =========================
+
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger("workflow_optimizer.metrics")
+
+DEFAULT_METRICS_FILE = os.environ.get(
+    "WORKFLOW_METRICS_FILE",
+    os.path.join(
+        os.environ.get(
+            "WORKFLOW_CACHE_DIR",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+        ),
+        "metrics.prom",
+    ),
+)
+
+# Seconds; spans range from sub-millisecond parses to minute-long completions.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+HELP = {
+    "workflow_stage_seconds": "Duration of a Generate-path stage.",
+    "workflow_requests_total": "Generate requests by outcome.",
+    "workflow_cache_hits_total": "Requests answered without a new LLM call, by source.",
+    "workflow_llm_retries_total": "LLM call retries by error type.",
+    "workflow_repairs_total": "Result repairs by kind.",
+    "workflow_errors_total": "Errors by stage and exception type.",
+    "workflow_tokens_total": "Tokens reported by the provider, by kind.",
+    "workflow_segments_total": "Segment requests issued for long workflows.",
+    "workflow_truncated_total": "Completions cut off at max_tokens, by number of requested sections.",
+    "workflow_similar_total": "Exact-cache misses by near-duplicate outcome (reused, seeded, miss).",
+}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class Registry:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        # name → label key → [bucket counts..., +Inf count, sum]
+        self._histograms: dict[str, dict[tuple, list[float]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            row = series.get(key)
+            if row is None:
+                row = series[key] = [0.0] * (len(self.buckets) + 2)
+            row[bisect.bisect_left(self.buckets, value)] += 1
+            row[-1] += value
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_fmt_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, row in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, row):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_fmt_labels(key, (('le', f'{bound:g}'),))} {cumulative:g}")
+                    cumulative += row[len(self.buckets)]
+                    lines.append(f"{name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {cumulative:g}")
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {row[-1]:.6f}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {cumulative:g}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Counters and per-series (count, sum) as plain JSON-able data."""
+        with self._lock:
+            return {
+                "counters": {
+                    name: {",".join(f"{k}={v}" for k, v in key): value for key, value in series.items()}
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: {
+                        ",".join(f"{k}={v}" for k, v in key): {
+                            "count": sum(row[:-1]), "sum": round(row[-1], 6),
+                        }
+                        for key, row in series.items()
+                    }
+                    for name, series in self._histograms.items()
+                },
+            }
+
+
+REGISTRY = Registry()
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    REGISTRY.inc(name, value, **labels)
+
+def observe_stage(stage: str, seconds: float, **labels) -> None:
+    """Record a stage duration measured elsewhere (e.g. time to first token)."""
+    REGISTRY.observe("workflow_stage_seconds", seconds, stage=stage, **labels)
+    log.info(json.dumps({"event": "span", "stage": stage, "seconds": round(seconds, 6), **labels}))
+
+@contextmanager
+def span(stage: str, **labels):
+    """Time a block as `stage`; an exception is counted in workflow_errors_total and re-raised."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        inc("workflow_errors_total", stage=stage, type=type(e).__name__)
+        observe_stage(stage, time.perf_counter() - t0, outcome="error", **labels)
+        raise
+    observe_stage(stage, time.perf_counter() - t0, outcome="ok", **labels)
+
+# -------------------------
+# Log output
+# -------------------------
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per record; a message that already is one (a span) is merged in."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        try:
+            body = json.loads(message)
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            body = {"msg": message}
+        line = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name, **body}
+        if record.exc_info:
+            line["exc"] = self.formatException(record.exc_info)
+        return json.dumps(line, ensure_ascii=False)
+
+def configure_logging(level: str | None = None, stream=None) -> None:
+    """Write the workflow_optimizer.* logs (spans, LLM usage) to stderr as JSON lines.
+
+    Called by the entry points; WORKFLOW_LOG_LEVEL sets the level (default INFO,
+    WARNING drops the per-span lines). Safe to call on every Streamlit rerun.
+    """
+    logger = logging.getLogger("workflow_optimizer")
+    name = (level or os.environ.get("WORKFLOW_LOG_LEVEL") or "INFO").upper()
+    logger.setLevel(name if isinstance(logging.getLevelName(name), int) else logging.INFO)
+    if not any(isinstance(h.formatter, JsonLineFormatter) for h in logger.handlers):
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JsonLineFormatter())
+        logger.addHandler(handler)
+        logger.propagate = False
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
+
+def write_metrics_file(path: str = DEFAULT_METRICS_FILE) -> None:
+    """Atomically replace the scrape file with the current registry."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(render_prometheus())
+        os.replace(tmp, path)
+    except OSError:
+        log.warning("could not write metrics file %s", path)
@@ -0,0 +1,60 @@
+# =========================
+# AI Workflow Optimizer — Pipelined generation
+#
+# Instead of one ~2000-token completion, ask for the step lists first (small
+# enough to stream and render quickly), then request the enrichment sections
+# concurrently, each seeded with the steps. Wall time ≈ steps + the slowest
+# enrichment branch, rather than the whole output generated serially.
+# =========================
+
+from concurrent.futures import ThreadPoolExecutor
+
+from json_utils import parse_json_safely, repair_truncated_json
+from llm_client import call_openai_streaming, call_openai_with_retry, regenerate_sections
+from prompt_builder import RESULT_DEFAULTS, build_section_messages
+from schema_validator import STEP_SECTIONS, TEXT_SECTIONS
+
+STEP_PHASE = list(TEXT_SECTIONS + STEP_SECTIONS)
+# Grouped so the branches are roughly the same length.
+ENRICHMENT_GROUPS = (
+    ("human_shift", "deltas", "notes"),
+    ("glossary",),
+    ("tool_suggestions",),
+)
+
+
+def generate_steps(client, fields: dict, on_delta=None) -> dict:
+    """Phase 1: echoed fields + today/future steps with maps_to (streamed when on_delta is given)."""
+    messages = build_section_messages(fields, {}, STEP_PHASE)
+    sizing = {"n_steps": len(fields["steps"]), "sections": STEP_PHASE}
+    if on_delta is not None:
+        raw = call_openai_streaming(client, messages, on_delta, max_retries=3, **sizing)
+    else:
+        resp = call_openai_with_retry(client, messages, max_retries=3, **sizing)
+        raw = resp.choices[0].message.content or ""
+    try:
+        data = parse_json_safely(raw)
+    except Exception:
+        data = repair_truncated_json(raw, {k: RESULT_DEFAULTS[k] for k in STEP_PHASE})
+    return data if isinstance(data, dict) else {}
+
+
+def enrich(client, fields: dict, steps: dict, groups=ENRICHMENT_GROUPS) -> dict:
+    """Phase 2: one concurrent request per group; a failed branch just leaves its sections empty."""
+    result = {**RESULT_DEFAULTS, **{k: steps.get(k, RESULT_DEFAULTS[k]) for k in STEP_PHASE}}
+    with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix="enrich") as pool:
+        futures = [pool.submit(regenerate_sections, client, fields, steps, list(g)) for g in groups]
+        for group, fut in zip(groups, futures):
+            try:
+                patch = fut.result()
+            except Exception:
+                continue
+            if isinstance(patch, dict):
+                result.update({k: patch[k] for k in group if k in patch})
+    return result
+
+
+def generate_pipelined(client, fields: dict, on_delta=None) -> dict:
+    """Steps first, then enrichment in parallel; the caller runs enforce_contract on the result."""
+    steps = generate_steps(client, fields, on_delta)
+    return enrich(client, fields, steps)
@@ -0,0 +1,225 @@
+# =========================
+# AI Workflow Optimizer — Prompt + output contract
+# (shared by the Streamlit app and headless entry points)
+# =========================
+
+import hashlib
+import json
+
+from process_library import TOOL_LIBRARY, get_goals
+
+# Bump whenever the prompt text or output schema changes (invalidates cached results).
+PROMPT_VERSION = "2026.2"
+
+SYSTEM_MESSAGE = "Return ONLY one valid JSON object. No markdown. No extra keys."
+
+# -------------------------
+# Static prompt prefix
+# Built once at import and never formatted per request, so every call starts
+# with the same bytes (system message = rules + tool library + schema) and the
+# provider's prompt cache can reuse it. Per-request context goes last, in the
+# user message. Any edit here must bump PROMPT_VERSION.
+# -------------------------
+RULES_BLOCK = """
+Return ONLY one valid JSON object (no markdown, no extra text).
+
+You are an evidence-minded operating model + process analyst.
+Transform the user's CURRENT workflow into an optimized workflow for the selected time horizon.
+
+Rules:
+- Use the user's input steps as baseline.
+- You may reorder, merge, rename, or add up to 2 missing control steps.
+- Keep step labels short: 1–2 words (max 3).
+- Include at least one explicit Control checkpoint.
+- Prefer "assist/augment" over "replace".
+
+Actors:
+- today_steps actor: HUMAN or ERP only
+- future_steps actor: HUMAN, ERP, AI, AI+HUMAN, AI+ERP, AI+ERP+HUMAN
+
+Intent: Admin / Control / Decision / Relationship
+- Today should skew more Admin.
+- Future should increase Decision + Relationship for HUMAN-owned steps.
+
+Mapping requirement:
+- Every future step MUST include maps_to: array of TODAY step ids it replaces/absorbs.
+
+Tools:
+Use ONLY the provided TOOL_LIBRARY. Do NOT invent tools.
+Return exactly 4 tool suggestions.
+
+Terminology:
+Provide a glossary of 6 terms used.
+""".strip()
+
+TOOL_LIBRARY_BLOCK = "TOOL_LIBRARY (JSON):\n" + json.dumps(TOOL_LIBRARY, ensure_ascii=False)
+
+SCHEMA_BLOCK = """
+JSON schema (exact keys):
+functional_domain (string)
+process_workflow (string)
+sub_process (string)
+time_horizon (string)
+today_steps (array of 6–12 objects):
+  id ("T1".."T12"), label, actor ("HUMAN"|"ERP"), intent
+future_steps (array of 6–12 objects):
+  id ("F1".."F12"), label, actor, intent, maps_to (array of today ids)
+human_shift (array of 3 strings)
+deltas (array of 4 strings)
+glossary (array of 6 objects: term, definition)
+tool_suggestions (array of 4 objects: tool_category, example_tools (1–3), use_in_workflow, fit_notes)
+notes (array of 3 strings)
+""".strip()
+
+# Schema lines per top-level key (a key line plus its indented detail lines),
+# used to ask for individual sections in a follow-up request.
+SECTION_SCHEMA: dict[str, str] = {}
+for _line in SCHEMA_BLOCK.splitlines()[1:]:
+    if not _line.startswith(" "):
+        _section = _line.split(" ", 1)[0]
+        SECTION_SCHEMA[_section] = _line
+    else:
+        SECTION_SCHEMA[_section] += "\n" + _line
+del _line, _section
+
+STATIC_SYSTEM_PROMPT = "\n\n".join([SYSTEM_MESSAGE, RULES_BLOCK, TOOL_LIBRARY_BLOCK, SCHEMA_BLOCK])
+STATIC_PREFIX_SHA = hashlib.sha256(STATIC_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+
+# Actor values allowed in the output (today_steps use only HUMAN / ERP).
+ACTORS = ("HUMAN", "ERP", "AI", "AI+HUMAN", "AI+ERP", "AI+ERP+HUMAN")
+INTENTS = ("Admin", "Control", "Decision", "Relationship")
+
+# Top-level keys of the output schema, with the value used when a truncated
+# response is repaired locally and a section never arrived.
+RESULT_DEFAULTS = {
+    "functional_domain": "",
+    "process_workflow": "",
+    "sub_process": "",
+    "time_horizon": "",
+    "today_steps": [],
+    "future_steps": [],
+    "human_shift": [],
+    "deltas": [],
+    "glossary": [],
+    "tool_suggestions": [],
+    "notes": [],
+}
+
+
+MAX_INPUT_STEPS = 18    # one request
+MAX_LONG_STEPS = 150    # long-workflow mode (segmented, see segmented.py)
+
+def clean_lines(text: str, max_lines: int = MAX_INPUT_STEPS) -> list[str]:
+    lines = []
+    for raw in (text or "").splitlines():
+        s = raw.strip()
+        if not s:
+            continue
+        s = s.replace("•", "-").strip()
+        if len(s) > 140:
+            s = s[:140]
+        lines.append(s)
+    return lines[:max_lines]
+
+def normalize_actor(actor: str) -> str:
+    a = (actor or "HUMAN").upper().replace(" ", "")
+    if a in ("HUMAN", "PERSON"):
+        return "HUMAN"
+    if a in ("ERP", "SYSTEM"):
+        return "ERP"
+    if a in ("AI", "LLM"):
+        return "AI"
+    if "+" in a:
+        parts = [p for p in a.split("+") if p]
+        allowed = [p for p in parts if p in ("AI", "ERP", "HUMAN")]
+        if len(allowed) >= 2:
+            order = {"AI": 0, "ERP": 1, "HUMAN": 2}
+            allowed = sorted(set(allowed), key=lambda x: order.get(x, 99))
+            a2 = "+".join(allowed)
+            return a2 if a2 in ACTORS else "AI+ERP+HUMAN"
+    return "HUMAN"
+
+def request_fields(
+    functional_domain: str,
+    process_workflow: str,
+    sub_process: str,
+    time_horizon: str,
+    industry: str,
+    maturity: str,
+    constraints: list[str] | None,
+    notes: str | None,
+    steps: list[str],
+) -> dict:
+    """Canonical request inputs: what the prompt is built from and what the cache key hashes."""
+    return {
+        "functional_domain": functional_domain,
+        "process_workflow": process_workflow,
+        "sub_process": sub_process,
+        "time_horizon": time_horizon,
+        "industry": industry,
+        "maturity": maturity,
+        "constraints": sorted(constraints or []),
+        "notes": (notes or "").strip(),
+        "steps": list(steps),
+    }
+
+def build_context_block(fields: dict) -> str:
+    """Per-request part of the prompt — always placed after the static prefix."""
+    workflow_goal, sub_process_goal = get_goals(
+        fields["functional_domain"], fields["process_workflow"], fields["sub_process"]
+    )
+    return f"""
+Context:
+Functional Domain: {fields['functional_domain']}
+Process Workflow: {fields['process_workflow']}
+Sub Process: {fields['sub_process']}
+Time horizon: {fields['time_horizon']}
+Workflow goal: {workflow_goal}
+Sub-process goal: {sub_process_goal if sub_process_goal else "None"}
+Industry: {fields['industry']}
+Today maturity: {fields['maturity']}
+Constraints: {", ".join(fields['constraints']) if fields['constraints'] else "None"}
+User notes: {fields['notes'] or "None"}
+
+User CURRENT workflow steps (one per line):
+{chr(10).join(fields['steps'])}
+""".strip()
+
+def build_messages(fields: dict) -> list[dict]:
+    return [
+        {"role": "system", "content": STATIC_SYSTEM_PROMPT},
+        {"role": "user", "content": build_context_block(fields)}
+    ]
+
+def is_usable_result(data) -> bool:
+    """Minimal schema check for a locally repaired result: both flows must be renderable."""
+    if not isinstance(data, dict):
+        return False
+    today = data.get("today_steps")
+    future = data.get("future_steps")
+    if not isinstance(today, list) or not isinstance(future, list):
+        return False
+    if len(today) < 4 or len(future) < 4:
+        return False
+    return all(isinstance(s, dict) and s.get("id") and s.get("label") for s in today + future)
+
+def build_section_messages(fields: dict, data: dict, sections: list[str]) -> list[dict]:
+    """Follow-up request for only `sections`, with the rest of the result as fixed context."""
+    keep = {k: v for k, v in data.items() if k in RESULT_DEFAULTS and k not in sections}
+    system = [SYSTEM_MESSAGE, RULES_BLOCK]
+    if "tool_suggestions" in sections:
+        system.append(TOOL_LIBRARY_BLOCK)
+    system.append("JSON schema (exact keys):\n" + "\n".join(SECTION_SCHEMA[k] for k in sections))
+    parts = [build_context_block(fields)]
+    if keep:
+        parts.append(
+            "Already generated (keep consistent, do not repeat):\n"
+            + json.dumps(keep, ensure_ascii=False, separators=(",", ":"))
+        )
+    parts.append("Return ONLY a JSON object with exactly these keys: " + ", ".join(sections))
+    user = "\n\n".join(parts)
+    return [
+        {"role": "system", "content": "\n\n".join(system)},
+        {"role": "user", "content": user},
+    ]
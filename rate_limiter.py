@@ -0,0 +1,185 @@
+# =========================
+# AI Workflow Optimizer — Shared rate limiter
+# (token buckets for requests/min + tokens/min, shared across processes via a locked state file)
+# =========================
+
+import asyncio
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to a process-local limiter
+    fcntl = None
+
+
+DEFAULT_STATE_PATH = os.path.join(
+    os.environ.get(
+        "WORKFLOW_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+    ),
+    "ratelimit.json",
+)
+
+
+def retry_after_seconds(err) -> float | None:
+    """Server-requested wait from a provider error (Retry-After / retry-after-ms), if any."""
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return max(0.0, float(ms) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, retry_after: float | None = None, base: float = 1.0, cap: float = 30.0) -> float:
+    """Honour Retry-After when given (plus a little jitter); otherwise full-jitter exponential backoff."""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, 0.25 * max(retry_after, 1.0))
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def _wake_jitter(wait: float) -> float:
+    """Spread waiters over up to a quarter of the wait, so a shared pause doesn't end in a burst."""
+    return random.uniform(0, max(0.05, 0.25 * wait))
+
+def estimate_tokens(messages, max_tokens: int) -> int:
+    """Cheap upper-bound reservation: ~4 chars per prompt token + the completion budget."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + max_tokens
+
+
+class RateLimiter:
+    """Two token buckets (requests and tokens per minute) plus a shared pause.
+
+    State lives in a small JSON file guarded by flock, so every Streamlit
+    session, batch worker and process on the host draws from the same quota.
+    When the provider answers 429 with Retry-After, `pause()` blocks everyone
+    until then instead of each caller discovering the limit on its own.
+    """
+
+    def __init__(self, rpm: float, tpm: float, state_path: str | None = None):
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.state_path = state_path or DEFAULT_STATE_PATH
+        self._local_lock = threading.Lock()
+        self._local_state = None
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+
+    def _fresh_state(self, now: float) -> dict:
+        return {"requests": self.rpm, "tokens": self.tpm, "updated": now, "paused_until": 0.0}
+
+    def _update(self, fn):
+        """Run fn(state, now) -> result under the cross-process lock and persist state."""
+        now = time.time()
+        with self._local_lock:
+            if fcntl is None:
+                if self._local_state is None:
+                    self._local_state = self._fresh_state(now)
+                return fn(self._local_state, now)
+            with open(self.state_path, "a+", encoding="utf-8") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    fh.seek(0)
+                    try:
+                        state = json.loads(fh.read() or "null") or self._fresh_state(now)
+                    except json.JSONDecodeError:
+                        state = self._fresh_state(now)
+                    result = fn(state, now)
+                    fh.seek(0)
+                    fh.truncate()
+                    fh.write(json.dumps(state))
+                    fh.flush()
+                    return result
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _refill(self, state: dict, now: float) -> None:
+        elapsed = max(0.0, now - state.get("updated", now))
+        state["requests"] = min(self.rpm, state.get("requests", self.rpm) + elapsed * self.rpm / 60.0)
+        state["tokens"] = min(self.tpm, state.get("tokens", self.tpm) + elapsed * self.tpm / 60.0)
+        state["updated"] = now
+
+    def try_acquire(self, tokens: int) -> float:
+        """Reserve one request + `tokens`; returns 0 on success, else seconds to wait before retrying."""
+        tokens = min(float(tokens), self.tpm)
+
+        def fn(state, now):
+            self._refill(state, now)
+            paused = state.get("paused_until", 0.0) - now
+            if paused > 0:
+                return paused
+            if state["requests"] >= 1 and state["tokens"] >= tokens:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                return 0.0
+            need_req = max(0.0, 1 - state["requests"]) * 60.0 / self.rpm
+            need_tok = max(0.0, tokens - state["tokens"]) * 60.0 / self.tpm
+            return max(need_req, need_tok)
+
+        return self._update(fn)
+
+    def acquire(self, tokens: int) -> None:
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait + _wake_jitter(wait))
+
+    async def acquire_async(self, tokens: int) -> None:
+        """acquire() for event-loop callers: the flock and state file I/O run in a worker thread."""
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait + _wake_jitter(wait))
+
+    def refund(self, tokens: int) -> None:
+        """Give back the unused part of a reservation once the real usage is known."""
+        if tokens <= 0:
+            return
+
+        def fn(state, now):
+            self._refill(state, now)
+            state["tokens"] = min(self.tpm, state["tokens"] + tokens)
+
+        self._update(fn)
+
+    def pause(self, seconds: float) -> None:
+        """Block all callers (every process) for `seconds`, e.g. after a 429 with Retry-After."""
+        def fn(state, now):
+            state["paused_until"] = max(state.get("paused_until", 0.0), now + seconds)
+
+        self._update(fn)
+
+
+_LIMITER = None
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter configured from OPENAI_RPM / OPENAI_TPM (defaults sized for gpt-4.1-mini tier 1)."""
+    global _LIMITER
+    if _LIMITER is None:
+        _LIMITER = RateLimiter(
+            rpm=float(os.environ.get("OPENAI_RPM", "500")),
+            tpm=float(os.environ.get("OPENAI_TPM", "200000")),
+        )
+    return _LIMITER
@@ -0,0 +1,150 @@
+# =========================
+# AI Workflow Optimizer — Result cache
+# (in-memory LRU in front of a shared on-disk SQLite store)
+# =========================
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "WORKFLOW_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+
+
+def make_cache_key(fields: dict, prompt_version: str) -> str:
+    """Canonical SHA-256 over the request inputs + prompt version."""
+    payload = {"prompt_version": prompt_version, "fields": fields}
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Two-level cache for parsed results.
+
+    Level 1 is a per-process LRU dict (fast path, no I/O).
+    Level 2 is a SQLite file shared by every session and process on the host.
+    Both levels honour the same TTL; the disk level is capped by entry count
+    and evicts least-recently-used rows first.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 5000,
+    ):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "results.sqlite3")
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._mem: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and (now - created_at) > self.ttl_seconds
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                created_at, value = item
+                if not self._expired(created_at, now):
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._mem[key]
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                self._evict_disk(conn, now)
+        except sqlite3.Error:
+            # Disk level is best-effort; the in-memory level still serves this process.
+            pass
+
+    def _remember(self, key: str, created_at: float, value: dict) -> None:
+        self._mem[key] = (created_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_memory_entries:
+            self._mem.popitem(last=False)
+
+    def _evict_disk(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds > 0:
+            conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
@@ -0,0 +1,228 @@
+# =========================
+# AI Workflow Optimizer — Output contract validator
+#
+# The checks for every top-level section are compiled once (regexes, enum
+# sets, per-section closures) and run in a single pass. Errors are grouped by
+# section so callers can regenerate only the sections that failed.
+# =========================
+
+import re
+from collections.abc import Callable
+
+from prompt_builder import ACTORS, INTENTS, RESULT_DEFAULTS, normalize_actor
+
+TODAY_ID_RE = re.compile(r"T(?:[1-9]|1[0-2])")
+FUTURE_ID_RE = re.compile(r"F(?:[1-9]|1[0-2])")
+TODAY_ACTORS = frozenset(("HUMAN", "ERP"))
+FUTURE_ACTORS = frozenset(ACTORS)
+INTENT_SET = frozenset(INTENTS)
+
+# Sections whose content depends on both step lists (regenerated together with them).
+STEP_SECTIONS = ("today_steps", "future_steps")
+TEXT_SECTIONS = ("functional_domain", "process_workflow", "sub_process", "time_horizon")
+
+Check = Callable[[object, dict], list[str]]
+
+
+def _nonempty_str(x) -> bool:
+    return isinstance(x, str) and bool(x.strip())
+
+def _one_of(x, allowed) -> bool:
+    """Membership that treats non-strings (lists, objects from a bad reply) as not allowed."""
+    return isinstance(x, str) and x in allowed
+
+def _string_list(count: int) -> Check:
+    def check(value, data):
+        if not isinstance(value, list):
+            return ["must be an array"]
+        errors = [] if len(value) == count else [f"expected {count} items, got {len(value)}"]
+        if not all(_nonempty_str(v) for v in value):
+            errors.append("items must be non-empty strings")
+        return errors
+    return check
+
+def _steps(id_re: re.Pattern, actors: frozenset, prefix: str, with_maps_to: bool) -> Check:
+    def check(value, data):
+        if not isinstance(value, list):
+            return ["must be an array"]
+        errors = []
+        if not 6 <= len(value) <= 12:
+            errors.append(f"expected 6–12 steps, got {len(value)}")
+        today_ids = {
+            s.get("id") for s in data.get("today_steps") or []
+            if isinstance(s, dict) and isinstance(s.get("id"), str)
+        } if with_maps_to else set()
+        seen = set()
+        for i, step in enumerate(value):
+            where = f"{prefix}[{i}]"
+            if not isinstance(step, dict):
+                errors.append(f"{where} must be an object")
+                continue
+            sid = step.get("id")
+            if not isinstance(sid, str) or not id_re.fullmatch(sid):
+                errors.append(f"{where}.id {sid!r} does not match {id_re.pattern}")
+            elif sid in seen:
+                errors.append(f"{where}.id {sid!r} is duplicated")
+            else:
+                seen.add(sid)
+            if not _nonempty_str(step.get("label")):
+                errors.append(f"{where}.label is missing")
+            if not _one_of(step.get("actor"), actors):
+                errors.append(f"{where}.actor {step.get('actor')!r} is not allowed")
+            if not _one_of(step.get("intent"), INTENT_SET):
+                errors.append(f"{where}.intent {step.get('intent')!r} is not allowed")
+            if with_maps_to:
+                maps_to = step.get("maps_to")
+                if not isinstance(maps_to, list):
+                    errors.append(f"{where}.maps_to must be an array")
+                else:
+                    dangling = [m for m in maps_to if not _one_of(m, today_ids)]
+                    if dangling:
+                        errors.append(f"{where}.maps_to references unknown today ids {dangling}")
+        return errors
+    return check
+
+def _glossary(value, data):
+    if not isinstance(value, list):
+        return ["must be an array"]
+    errors = [] if len(value) == 6 else [f"expected 6 terms, got {len(value)}"]
+    if not all(isinstance(g, dict) and _nonempty_str(g.get("term")) and _nonempty_str(g.get("definition"))
+               for g in value):
+        errors.append("items need a term and a definition")
+    return errors
+
+def _tools(tool_library: dict) -> Check:
+    def check(value, data):
+        if not isinstance(value, list):
+            return ["must be an array"]
+        errors = [] if len(value) == 4 else [f"expected 4 tool suggestions, got {len(value)}"]
+        for i, t in enumerate(value):
+            where = f"tool_suggestions[{i}]"
+            if not isinstance(t, dict):
+                errors.append(f"{where} must be an object")
+                continue
+            if tool_library and not _one_of(t.get("tool_category"), tool_library):
+                errors.append(f"{where}.tool_category {t.get('tool_category')!r} is not in TOOL_LIBRARY")
+            tools = t.get("example_tools")
+            if not isinstance(tools, list) or not 1 <= len(tools) <= 3:
+                errors.append(f"{where}.example_tools must list 1–3 tools")
+            if not _nonempty_str(t.get("use_in_workflow")):
+                errors.append(f"{where}.use_in_workflow is missing")
+        return errors
+    return check
+
+def _text(value, data):
+    return [] if _nonempty_str(value) else ["must be a non-empty string"]
+
+
+class ResultValidator:
+    """Compiled output-contract checks; validate() returns {section: [errors]} (empty when valid)."""
+
+    def __init__(self, tool_library: dict | None = None):
+        checks: dict[str, Check] = {key: _text for key in TEXT_SECTIONS}
+        checks.update(
+            today_steps=_steps(TODAY_ID_RE, TODAY_ACTORS, "today_steps", with_maps_to=False),
+            future_steps=_steps(FUTURE_ID_RE, FUTURE_ACTORS, "future_steps", with_maps_to=True),
+            human_shift=_string_list(3),
+            deltas=_string_list(4),
+            glossary=_glossary,
+            tool_suggestions=_tools(tool_library or {}),
+            notes=_string_list(3),
+        )
+        assert set(checks) == set(RESULT_DEFAULTS)
+        self._checks = tuple(checks.items())
+
+    def validate(self, data) -> dict[str, list[str]]:
+        if not isinstance(data, dict):
+            return {"$": ["result must be a JSON object"]}
+        errors = {}
+        for key, check in self._checks:
+            if key not in data:
+                errors[key] = ["missing"]
+                continue
+            problems = check(data[key], data)
+            if problems:
+                errors[key] = problems
+        return errors
+
+
+def sections_to_regenerate(errors: dict[str, list[str]]) -> list[str]:
+    """Sections worth a follow-up request (echoed text fields are filled from the request instead).
+
+    future_steps.maps_to depends on today ids, so a bad today_steps pulls future_steps in too.
+    """
+    sections = [k for k in errors if k in RESULT_DEFAULTS and k not in TEXT_SECTIONS]
+    if "today_steps" in sections and "future_steps" not in sections:
+        sections.append("future_steps")
+    return [k for k in RESULT_DEFAULTS if k in sections]
+
+
+def _coerce_steps(data: dict) -> None:
+    """Local fixes that need no model call: actor spelling and dangling maps_to references."""
+    today = [s for s in data.get("today_steps") or [] if isinstance(s, dict)]
+    future = [s for s in data.get("future_steps") or [] if isinstance(s, dict)]
+    today_ids = {s.get("id") for s in today if isinstance(s.get("id"), str)}
+    # Non-string actors are left as they are: they stay violations and get regenerated.
+    if isinstance(data.get("today_steps"), list):
+        data["today_steps"] = [dict(s) for s in today]
+        for step in data["today_steps"]:
+            if isinstance(step.get("actor"), str) or step.get("actor") is None:
+                actor = normalize_actor(step.get("actor"))
+                step["actor"] = actor if actor in TODAY_ACTORS else ("ERP" if "ERP" in actor else "HUMAN")
+    if isinstance(data.get("future_steps"), list):
+        data["future_steps"] = [dict(s) for s in future]
+        for step in data["future_steps"]:
+            if isinstance(step.get("actor"), str) or step.get("actor") is None:
+                step["actor"] = normalize_actor(step.get("actor"))
+            if isinstance(step.get("maps_to"), list):
+                step["maps_to"] = [m for m in step["maps_to"] if _one_of(m, today_ids)]
+
+
+def enforce_contract(
+    data: dict,
+    fields: dict,
+    validator: ResultValidator,
+    regenerate: Callable[[dict, list[str]], dict] | None = None,
+) -> tuple[dict, dict[str, list[str]]]:
+    """Validate, fill echoed text fields locally, and patch failed sections via `regenerate`.
+
+    `regenerate(data, sections)` returns a dict with (some of) those sections; each
+    patched section is kept only if it validates better than what it replaces
+    (today/future steps are judged as one unit). Returns (result, remaining errors).
+    """
+    errors = validator.validate(data)
+    if "$" in errors:
+        return data, errors
+    data = dict(data)
+    for key in TEXT_SECTIONS:
+        if key in errors:
+            data[key] = fields.get(key, "")
+    if "today_steps" in errors or "future_steps" in errors:
+        _coerce_steps(data)
+    errors = validator.validate(data)
+
+    sections = sections_to_regenerate(errors)
+    if not sections or regenerate is None:
+        return data, errors
+    try:
+        patch = regenerate(data, sections)
+    except Exception:
+        return data, errors
+    if not isinstance(patch, dict):
+        return data, errors
+
+    candidate = dict(data)
+    candidate.update({k: patch[k] for k in sections if k in patch})
+    new_errors = validator.validate(candidate)
+
+    def score(errs, keys):
+        return sum(len(errs.get(k, [])) for k in keys)
+
+    units = [[k] for k in sections if k not in STEP_SECTIONS]
+    if any(k in STEP_SECTIONS for k in sections):
+        units.append(list(STEP_SECTIONS))
+    for keys in units:
+        if all(k in patch for k in keys if k in sections) and score(new_errors, keys) < score(errors, keys):
+            for k in keys:
+                data[k] = candidate[k]
+    return data, validator.validate(data)
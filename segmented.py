@@ -0,0 +1,273 @@
+# =========================
+# AI Workflow Optimizer — Long workflows (40–150 steps)
+#
+# One request covers at most 12 steps (the output contract), so long flows are
+# split into coherent segments of 6–12 steps — cut preferably after a control /
+# decision step or before an intake step, near an even split — and each segment
+# is optimized as its own request, all in parallel. The segment results are
+# stitched back into one result: T/F ids renumbered globally, maps_to rewritten
+# to the new ids, and the enrichment sections merged without duplicates.
+#
+# Each segment goes through Engine.generate, so it gets the cache, single-flight
+# and local fallback of a normal request; editing one part of a long flow only
+# regenerates the segments that changed. Latency follows the slowest segment.
+# =========================
+
+import json
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from engine import Engine, GenerationResult, StepsCallback
+from local_optimizer import MAX_STEPS, classify_intent, optimize_locally
+from metrics import configure_logging, inc, span
+from prompt_builder import PROMPT_VERSION
+from result_cache import make_cache_key
+from schema_validator import STEP_SECTIONS, TEXT_SECTIONS
+
+MIN_SEGMENT_STEPS = 6
+MAX_SEGMENT_STEPS = MAX_STEPS
+MAX_WORKERS = 8
+
+# Enrichment sections merged across segments: section → dedupe key.
+MERGED_SECTIONS = {
+    "human_shift": lambda x: str(x).strip().lower(),
+    "deltas": lambda x: str(x).strip().lower(),
+    "notes": lambda x: str(x).strip().lower(),
+    "glossary": lambda x: str(x.get("term", "")).strip().lower() if isinstance(x, dict) else str(x),
+    "tool_suggestions": lambda x: str(x.get("tool_category", "")).strip() if isinstance(x, dict) else str(x),
+}
+
+
+# -------------------------
+# Split
+# -------------------------
+def _boundary_bonus(steps: list[str], cut: int) -> float:
+    """How natural it is to end a segment before steps[cut]."""
+    bonus = 0.0
+    if classify_intent(steps[cut - 1]) in ("Control", "Decision"):
+        bonus += 1.5  # approvals / reviews / decisions close a phase
+    if any(w in steps[cut].lower() for w in ("receive", "intake", "request", "capture", "initiat", "collect")):
+        bonus += 1.0  # ... and intake opens the next one
+    return bonus
+
+def split_segments(steps: list[str]) -> list[list[str]]:
+    """Contiguous segments of MIN_SEGMENT_STEPS..MAX_SEGMENT_STEPS steps (one segment if it fits)."""
+    n = len(steps)
+    if n <= MAX_SEGMENT_STEPS:
+        return [list(steps)]
+    count = math.ceil(n / MAX_SEGMENT_STEPS)
+    cuts, start = [], 0
+    for i in range(1, count):
+        left = count - i  # segments still to place after this cut
+        lo = max(start + MIN_SEGMENT_STEPS, n - left * MAX_SEGMENT_STEPS)
+        hi = min(start + MAX_SEGMENT_STEPS, n - left * MIN_SEGMENT_STEPS)
+        ideal = i * n / count
+        cut = max(range(lo, hi + 1), key=lambda c: _boundary_bonus(steps, c) - abs(c - ideal))
+        cuts.append(cut)
+        start = cut
+    bounds = [0, *cuts, n]
+    return [list(steps[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+def segment_fields(fields: dict, segments: list[list[str]]) -> list[dict]:
+    """Per-segment request fields; the notes tell the model where the segment sits."""
+    out = []
+    for i, seg in enumerate(segments):
+        context = [f"Segment {i + 1} of {len(segments)} of a longer workflow."]
+        if i > 0:
+            context.append(f"Comes after: {segments[i - 1][-1]}.")
+        if i < len(segments) - 1:
+            context.append(f"Continues with: {segments[i + 1][0]}.")
+        notes = " ".join(filter(None, [fields.get("notes", ""), " ".join(context)]))
+        out.append(dict(fields, notes=notes, steps=seg))
+    return out
+
+
+# -------------------------
+# Stitch
+# -------------------------
+def _renumber(results: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Concatenate today/future steps with global T/F ids and maps_to rewritten to match."""
+    today, future = [], []
+    for data in results:
+        id_map = {}
+        for step in data.get("today_steps") or []:
+            if not isinstance(step, dict):
+                continue
+            new_id = f"T{len(today) + 1}"
+            id_map[str(step.get("id", "")).strip()] = new_id
+            today.append(dict(step, id=new_id))
+        for step in data.get("future_steps") or []:
+            if not isinstance(step, dict):
+                continue
+            maps = step.get("maps_to") if isinstance(step.get("maps_to"), list) else []
+            future.append(dict(
+                step,
+                id=f"F{len(future) + 1}",
+                maps_to=[id_map[m] for m in (str(x).strip() for x in maps) if m in id_map],
+            ))
+    return today, future
+
+def _merge(section: str, results: list[dict]) -> list:
+    """Round-robin across segments (so the first entries cover the whole flow), deduplicated."""
+    key = MERGED_SECTIONS[section]
+    lists = [r.get(section) if isinstance(r.get(section), list) else [] for r in results]
+    merged, seen = [], {}
+    for rank in range(max((len(x) for x in lists), default=0)):
+        for items in lists:
+            if rank >= len(items):
+                continue
+            item = items[rank]
+            k = key(item)
+            if k in seen:
+                if section == "tool_suggestions" and isinstance(item, dict):
+                    # Same category from another segment: keep one card, pool its example tools.
+                    tools = seen[k].setdefault("example_tools", [])
+                    for t in item.get("example_tools") or []:
+                        if t not in tools and len(tools) < 3:
+                            tools.append(t)
+                continue
+            item = dict(item, example_tools=list(item.get("example_tools") or [])) if isinstance(item, dict) else item
+            seen[k] = item
+            merged.append(item)
+    return merged
+
+def stitch(fields: dict, results: list[dict]) -> dict:
+    """One result in the normal schema from per-segment results (in segment order)."""
+    today, future = _renumber(results)
+    data = {key: fields.get(key, "") for key in TEXT_SECTIONS}
+    data.update(today_steps=today, future_steps=future)
+    for section in MERGED_SECTIONS:
+        data[section] = _merge(section, results)
+    return data
+
+def preview_segmented(fields: dict) -> dict:
+    """Rule-based answer for a long flow, segmented the same way as the LLM path."""
+    parts = segment_fields(fields, split_segments(fields["steps"]))
+    return stitch(fields, [optimize_locally(p) for p in parts])
+
+
+# -------------------------
+# Generate
+# -------------------------
+def segmented_cache_key(fields: dict) -> str:
+    """Cache key of a stitched result, kept apart from the single-call result for the same inputs."""
+    return make_cache_key(dict(fields, mode="segmented"), PROMPT_VERSION)
+
+def generate_segmented(
+    engine: Engine,
+    fields: dict,
+    stream: bool = True,
+    pipelined: bool = False,
+    on_steps: StepsCallback | None = None,
+    use_cache: bool = True,
+    max_workers: int = MAX_WORKERS,
+    compact: bool = False,
+) -> GenerationResult:
+    """Engine.generate for a long flow: segments in parallel, stitched into one result.
+
+    on_steps is called from the calling thread only (so UI code may use it), with
+    the stitched steps of all segments so far.
+    """
+    if use_cache:
+        # A single-call result for the same steps may answer a long-mode request, not the reverse.
+        hit = engine.lookup(fields)
+        if hit is not None:
+            return hit
+        stitched = engine.cache.get(segmented_cache_key(fields)) if engine.cache is not None else None
+        if stitched is not None:
+            inc("workflow_cache_hits_total", source="result_cache")
+            inc("workflow_requests_total", outcome="cached")
+            return GenerationResult(stitched, "cache")
+
+    parts = segment_fields(fields, split_segments(fields["steps"]))
+    inc("workflow_segments_total", len(parts))
+    lock = threading.Lock()
+    partial = [{key: [] for key in STEP_SECTIONS} for _ in parts]
+    changed = threading.Event()
+
+    def run(i: int) -> GenerationResult:
+        def collect(section: str, steps: list[dict]):
+            with lock:
+                partial[i][section] = list(steps)
+            changed.set()
+
+        return engine.generate(
+            parts[i], stream=stream, pipelined=pipelined,
+            on_steps=collect if on_steps is not None else None, use_cache=use_cache,
+            compact=compact,
+        )
+
+    with span("segmented", segments=str(len(parts))):
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(parts)), thread_name_prefix="segment") as pool:
+            futures = [pool.submit(run, i) for i in range(len(parts))]
+            while True:
+                done, pending = wait(futures, timeout=0.2)
+                if on_steps is not None and changed.is_set():
+                    changed.clear()
+                    with lock:
+                        today, future = _renumber([dict(p) for p in partial])
+                    on_steps("today_steps", today)
+                    on_steps("future_steps", future)
+                if not pending:
+                    break
+            results = [f.result() for f in futures]
+
+    data = stitch(fields, [r.data for r in results])
+    errors = {
+        f"segment {i + 1}/{section}": errs
+        for i, r in enumerate(results) for section, errs in (r.contract_errors or {}).items()
+    }
+    notices = list(dict.fromkeys(r.notice for r in results if r.notice))
+    if any(r.source == "local" for r in results):
+        source = "local"
+    elif any(r.from_llm for r in results):
+        source = "llm"
+    else:
+        source = "cache"
+    if source == "llm" and engine.cache is not None:
+        engine.cache.set(segmented_cache_key(fields), data)
+    return GenerationResult(
+        data, source, " ".join(notices) or None, contract_errors=errors,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+    import os
+
+    from engine import fields_from_dict
+    from prompt_builder import MAX_LONG_STEPS
+    from result_cache import ResultCache
+
+    parser = argparse.ArgumentParser(description="Optimize a long workflow (JSON request fields on stdin).")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--pipelined", action="store_true")
+    parser.add_argument("--compact", action="store_true", help="compact wire format (fewer output tokens)")
+    parser.add_argument("--split-only", action="store_true", help="print the segments and exit")
+    args = parser.parse_args(argv)
+
+    fields = fields_from_dict(json.load(sys.stdin), max_steps=MAX_LONG_STEPS)
+    if args.split_only:
+        for i, seg in enumerate(split_segments(fields["steps"]), 1):
+            print(f"--- segment {i} ({len(seg)} steps)")
+            print("\n".join(seg))
+        return 0
+
+    configure_logging()
+    engine = Engine(os.environ.get("OPENAI_API_KEY"), cache=None if args.no_cache else ResultCache())
+    t0 = time.perf_counter()
+    result = generate_segmented(engine, fields, stream=not args.no_stream, pipelined=args.pipelined,
+                                use_cache=not args.no_cache, compact=args.compact)
+    print(f"{len(fields['steps'])} steps in {time.perf_counter() - t0:.2f}s ({result.source})", file=sys.stderr)
+    if result.notice:
+        print(result.notice, file=sys.stderr)
+    print(json.dumps(result.data, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+# =========================
+# AI Workflow Optimizer — Async HTTP service
+#
+# Programmatic access to the same engine the Streamlit page uses, on a single
+# asyncio event loop (stdlib only, HTTP/1.1 keep-alive):
+#
+#   POST /v1/optimize   same inputs as the UI controls → same JSON schema
+#                       {"stream": true} → NDJSON: one {"event": "step"} line per
+#                       step as it arrives, then {"event": "result"}
+#                       {"segmented": true} → up to 150 steps, optimized in parallel
+#                       segments (streams send only the stitched result)
+#                       {"compact": true} → the model answers in the compact wire
+#                       format (fewer output tokens); the response schema is unchanged
+#   GET  /healthz       liveness + in-flight / queue depth
+#   GET  /metrics       Prometheus text (stage timings, counters, service gauges)
+#
+# LLM work runs on a bounded thread pool (--max-inflight); up to --max-queue
+# requests wait for a slot, beyond that the service answers 429 with the
+# queue depth and Retry-After. Snapshot/cache hits never wait for a slot.
+#
+#   OPENAI_API_KEY=... python service.py --port 8080 --max-inflight 32 --max-queue 256
+# =========================
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from engine import Engine, fields_from_dict
+from metrics import configure_logging, inc, render_prometheus
+from process_library import (
+    CONSTRAINT_OPTIONS, DOMAINS, INDUSTRIES, MATURITY_LEVELS, TIME_HORIZONS, get_default_steps,
+)
+from prompt_builder import MAX_INPUT_STEPS, MAX_LONG_STEPS, clean_lines
+from result_cache import ResultCache
+from segmented import MAX_SEGMENT_STEPS, generate_segmented
+from similarity_cache import SimilarityCache
+from snapshot_pack import SnapshotPack
+
+MAX_BODY_BYTES = 64 * 1024
+IDLE_TIMEOUT = 30.0
+MIN_STEPS = 4
+
+
+class Overloaded(Exception):
+    def __init__(self, queue_depth: int):
+        super().__init__(f"queue full ({queue_depth} waiting)")
+        self.queue_depth = queue_depth
+
+
+class Admission:
+    """At most `max_inflight` LLM jobs at once, at most `max_queue` waiting for a slot."""
+
+    def __init__(self, max_inflight: int, max_queue: int):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.inflight = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_inflight)
+
+    async def __aenter__(self):
+        if self.inflight >= self.max_inflight and self.waiting >= self.max_queue:
+            raise Overloaded(self.waiting)
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.inflight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.inflight -= 1
+        self._slots.release()
+
+
+def validate_request(payload) -> tuple[dict | None, list[str]]:
+    """Request fields from a JSON body, or the list of problems (UI constraints apply)."""
+    if not isinstance(payload, dict):
+        return None, ["body must be a JSON object"]
+    errors = []
+    domain = payload.get("functional_domain")
+    workflow = payload.get("process_workflow")
+    sub_process = payload.get("sub_process")
+    # Type first: an unhashable value (e.g. {}) would raise in the lookups below.
+    for key in ("functional_domain", "process_workflow", "sub_process"):
+        if payload.get(key) is not None and not isinstance(payload[key], str):
+            errors.append(f"{key}: must be a string")
+    if errors:
+        pass
+    elif domain not in DOMAINS:
+        errors.append("functional_domain: unknown domain")
+    elif workflow not in DOMAINS[domain]:
+        errors.append("process_workflow: unknown workflow for this domain")
+    elif sub_process not in (DOMAINS[domain][workflow].get("sub_processes") or {}):
+        errors.append("sub_process: unknown sub-process for this workflow")
+
+    payload = dict(payload)
+    payload.setdefault("time_horizon", TIME_HORIZONS[0])
+    payload.setdefault("industry", INDUSTRIES[0])
+    payload.setdefault("maturity", MATURITY_LEVELS[1])
+    for key, allowed in (("time_horizon", TIME_HORIZONS), ("industry", INDUSTRIES), ("maturity", MATURITY_LEVELS)):
+        if payload[key] not in allowed:
+            errors.append(f"{key}: must be one of {list(allowed)}")
+    constraints = payload.get("constraints") or []
+    if not isinstance(constraints, list) or any(c not in CONSTRAINT_OPTIONS for c in constraints):
+        errors.append(f"constraints: must be a subset of {list(CONSTRAINT_OPTIONS)}")
+    steps = payload.get("steps")
+    if steps is not None and not isinstance(steps, str) and not (
+        isinstance(steps, list) and all(isinstance(s, str) for s in steps)
+    ):
+        errors.append("steps: must be a list of strings or one step per line")
+    if not isinstance(payload.get("notes") or "", str):
+        errors.append("notes: must be a string")
+    if errors:
+        return None, errors
+
+    if steps is None:
+        steps = get_default_steps(domain, workflow, sub_process)  # the template, as the UI prefills it
+    if isinstance(steps, list):
+        steps = "\n".join(steps)
+    if len(clean_lines(steps)) < MIN_STEPS:
+        return None, [f"steps: provide at least {MIN_STEPS} workflow steps"]
+    payload["steps"] = steps
+    payload["notes"] = payload.get("notes") or ""
+    return fields_from_dict(payload, MAX_LONG_STEPS if payload.get("segmented") else MAX_INPUT_STEPS), []
+
+
+class Service:
+    def __init__(self, engine: Engine, max_inflight: int = 32, max_queue: int = 256):
+        self.engine = engine
+        self.admission = Admission(max_inflight, max_queue)
+        # LLM jobs hold a thread for their whole duration; cache lookups get their own small pool.
+        self.llm_pool = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="llm")
+        self.io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lookup")
+        self.started = time.time()
+        self.connections = 0
+
+    # -------------------------
+    # HTTP plumbing
+    # -------------------------
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send_json(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # The body's end is unknown, so the connection can't be reused either.
+                    await self.send_json(writer, 400, {"error": "invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self.send_json(writer, 413, {"error": "request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                keep_alive = await self.route(method, target.split("?", 1)[0], body, writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def send(self, writer, status: int, body: bytes, content_type: str,
+                   keep_alive: bool = True, headers: dict | None = None) -> None:
+        head = [
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            *(f"{k}: {v}" for k, v in (headers or {}).items()),
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def send_json(self, writer, status: int, payload: dict, keep_alive: bool = True,
+                        headers: dict | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await self.send(writer, status, body, "application/json; charset=utf-8", keep_alive, headers)
+
+    # -------------------------
+    # Routes
+    # -------------------------
+    async def route(self, method: str, path: str, body: bytes, writer, keep_alive: bool) -> bool:
+        if path == "/healthz" and method == "GET":
+            await self.send_json(writer, 200, self.health(), keep_alive)
+        elif path == "/metrics" and method == "GET":
+            await self.send(writer, 200, self.metrics_text().encode("utf-8"),
+                            "text/plain; version=0.0.4; charset=utf-8", keep_alive)
+        elif path == "/v1/optimize" and method == "POST":
+            return await self.optimize(body, writer, keep_alive)
+        elif path in ("/healthz", "/metrics", "/v1/optimize"):
+            await self.send_json(writer, 405, {"error": "method not allowed"}, keep_alive)
+        else:
+            await self.send_json(writer, 404, {"error": "not found"}, keep_alive)
+        return keep_alive
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started, 1),
+            "llm_configured": bool(self.engine.api_key),
+            "inflight": self.admission.inflight,
+            "queue_depth": self.admission.waiting,
+            "max_inflight": self.admission.max_inflight,
+            "max_queue": self.admission.max_queue,
+            "connections": self.connections,
+            "similar": self.engine.similar.stats() if self.engine.similar is not None else None,
+        }
+
+    def metrics_text(self) -> str:
+        gauges = [
+            ("workflow_service_inflight", "LLM jobs currently running.", self.admission.inflight),
+            ("workflow_service_queue_depth", "Requests waiting for an LLM slot.", self.admission.waiting),
+            ("workflow_service_connections", "Open client connections.", self.connections),
+        ]
+        lines = []
+        for name, help_text, value in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return render_prometheus() + "\n".join(lines) + "\n"
+
+    async def optimize(self, body: bytes, writer, keep_alive: bool) -> bool:
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            await self.send_json(writer, 400, {"error": "body is not valid JSON"}, keep_alive)
+            return keep_alive
+        fields, errors = validate_request(payload)
+        if errors:
+            await self.send_json(writer, 400, {"error": "invalid request", "details": errors}, keep_alive)
+            return keep_alive
+        stream = bool(payload.get("stream"))
+        pipelined = bool(payload.get("pipelined"))
+        compact = bool(payload.get("compact"))
+        loop = asyncio.get_running_loop()
+
+        hit = await loop.run_in_executor(self.io_pool, self.engine.lookup, fields)
+        if hit is not None:
+            return await self.respond(writer, keep_alive, stream, hit)
+
+        try:
+            async with self.admission:
+                if payload.get("segmented") and len(fields["steps"]) > MAX_SEGMENT_STEPS:
+                    # The segments run on their own pool; this slot covers the whole request.
+                    result = await loop.run_in_executor(
+                        self.llm_pool, lambda: generate_segmented(self.engine, fields, stream=False,
+                                                                  pipelined=pipelined, compact=compact)
+                    )
+                    return await self.respond(writer, keep_alive, stream, result)
+                if not stream:
+                    result = await loop.run_in_executor(
+                        self.llm_pool, lambda: self.engine.generate(fields, stream=False, pipelined=pipelined,
+                                                                    use_cache=False, compact=compact)
+                    )
+                    return await self.respond(writer, keep_alive, False, result)
+                return await self.stream_generate(writer, fields, pipelined, compact)
+        except Overloaded as e:
+            inc("workflow_requests_total", outcome="rejected")
+            await self.send_json(
+                writer, 429, {"error": "overloaded", "queue_depth": e.queue_depth},
+                keep_alive, headers={"Retry-After": "2"},
+            )
+            return keep_alive
+        except Exception as e:
+            inc("workflow_requests_total", outcome="error")
+            inc("workflow_errors_total", stage="service", type=type(e).__name__)
+            await self.send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive)
+            return keep_alive
+
+    async def respond(self, writer, keep_alive: bool, stream: bool, result) -> bool:
+        if not stream:
+            headers = {"X-Result-Source": result.source}
+            if result.notice:
+                headers["X-Result-Notice"] = result.notice.encode("ascii", "replace").decode("ascii")
+            await self.send_json(writer, 200, result.data, keep_alive, headers)
+            return keep_alive
+        await self.start_ndjson(writer)
+        await self.write_event(writer, self.result_event(result))
+        await self.end_chunks(writer)
+        return False
+
+    @staticmethod
+    def result_event(result) -> dict:
+        return {"event": "result", "source": result.source, "notice": result.notice, "data": result.data}
+
+    async def stream_generate(self, writer, fields: dict, pipelined: bool, compact: bool = False) -> bool:
+        """NDJSON over chunked encoding: step events as the engine reports them, then the result."""
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        sent = {"today_steps": 0, "future_steps": 0}
+
+        def on_steps(section: str, steps: list[dict]):
+            # Worker thread → event loop; only the steps not sent yet.
+            new = steps[sent[section]:]
+            sent[section] = len(steps)
+            for step in new:
+                loop.call_soon_threadsafe(events.put_nowait, {"event": "step", "section": section, "step": step})
+
+        job = loop.run_in_executor(
+            self.llm_pool,
+            lambda: self.engine.generate(
+                fields, stream=True, pipelined=pipelined, on_steps=on_steps, use_cache=False, compact=compact,
+            ),
+        )
+        await self.start_ndjson(writer)
+        while True:
+            getter = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({getter, job}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                await self.write_event(writer, getter.result())
+                continue
+            getter.cancel()
+            break
+        while not events.empty():
+            await self.write_event(writer, events.get_nowait())
+        try:
+            result = job.result()
+            await self.write_event(writer, self.result_event(result))
+        except Exception as e:
+            inc("workflow_errors_total", stage="service", type=type(e).__name__)
+            await self.write_event(writer, {"event": "error", "error": f"{type(e).__name__}: {e}"})
+        await self.end_chunks(writer)
+        return False
+
+    async def start_ndjson(self, writer) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        await writer.drain()
+
+    async def write_event(self, writer, event: dict) -> None:
+        data = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        await writer.drain()
+
+    async def end_chunks(self, writer) -> None:
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(host: str, port: int, service: Service) -> None:
+    server = await asyncio.start_server(service.handle_connection, host, port, backlog=1024)
+    addrs = ", ".join(str(s.getsockname()) for s in server.sockets)
+    print(f"workflow optimizer service on {addrs}", file=sys.stderr, flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Async HTTP service for the workflow optimizer.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-inflight", type=int, default=int(os.environ.get("WORKFLOW_MAX_INFLIGHT", "32")))
+    parser.add_argument("--max-queue", type=int, default=int(os.environ.get("WORKFLOW_MAX_QUEUE", "256")))
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--no-similar", action="store_true", help="exact-match cache only")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    cache = None if args.no_cache else ResultCache()
+    engine = Engine(
+        os.environ.get("OPENAI_API_KEY"),
+        cache=cache,
+        snapshots=None if args.no_cache else SnapshotPack.load(),
+        similar=None if cache is None or args.no_similar else SimilarityCache(cache),
+    )
+    service = Service(engine, args.max_inflight, args.max_queue)
+    try:
+        asyncio.run(serve(args.host, args.port, service))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
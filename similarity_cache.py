@@ -0,0 +1,344 @@
+# =========================
+# AI Workflow Optimizer — Near-duplicate result lookup
+#
+# The exact-match cache misses when a user re-cases a step, changes bullets or
+# punctuation, reorders words or edits one label. This index finds a stored
+# result for a *similar* request:
+#
+#   - the context fields (domain, workflow, sub-process, horizon, industry,
+#     maturity, constraints) and prompt version must match exactly — they are
+#     the block key;
+#   - the steps + notes are normalized (case, punctuation, list markers, word
+#     order within a step) and shingled into a feature set: step identities,
+#     words, and adjacent-step pairs (so step order still counts);
+#   - MinHash + LSH banding picks candidates in the block, exact Jaccard on the
+#     feature sets decides.
+#
+# At or above REUSE_THRESHOLD the stored result is returned as-is; at or above
+# SEED_THRESHOLD it seeds a delta request (only the step sections are
+# regenerated, the enrichment sections are kept). Results themselves live in
+# the ResultCache; this index only maps feature sets to cache keys, persisted
+# in a table next to the results.
+#
+#   python similarity_cache.py stats
+#   python similarity_cache.py bench --entries 2000
+# =========================
+
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from prompt_builder import PROMPT_VERSION
+from result_cache import ResultCache
+
+REUSE_THRESHOLD = float(os.environ.get("WORKFLOW_SIMILAR_REUSE", "0.9"))
+SEED_THRESHOLD = float(os.environ.get("WORKFLOW_SIMILAR_SEED", "0.6"))
+
+NUM_PERM = 16
+BAND_ROWS = 2  # 8 bands of 2 rows: ~97% recall at Jaccard 0.6
+MASK = (1 << 61) - 1
+
+_rng = random.Random(20240601)
+PERMUTATIONS = [(_rng.randrange(1, MASK) | 1, _rng.randrange(MASK)) for _ in range(NUM_PERM)]
+
+BLOCK_FIELDS = ("functional_domain", "process_workflow", "sub_process", "time_horizon", "industry", "maturity")
+STOPWORDS = frozenset({"a", "an", "the", "and", "or", "to", "of", "for", "in", "on", "with", "by", "via", "per"})
+
+_LIST_MARKER = re.compile(r"^(?:(?:[-*•·>]+|\(?\d+[.):]|\(?[a-z][.)]|step\s*\d+\s*[:.)-]?)\s*)+", re.IGNORECASE)
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+# -------------------------
+# Normalization + features
+# -------------------------
+def step_words(step: str) -> list[str]:
+    """Lower-cased content words of one step, list markers and punctuation removed."""
+    s = _LIST_MARKER.sub("", step.strip().lower())
+    return [w for w in _NON_WORD.sub(" ", s).split() if w not in STOPWORDS]
+
+def block_key(fields: dict) -> str:
+    parts = [PROMPT_VERSION] + [str(fields.get(k, "")).strip().lower() for k in BLOCK_FIELDS]
+    parts.append(",".join(sorted(fields.get("constraints") or [])))
+    return "\x1f".join(parts)
+
+def features(fields: dict) -> frozenset[int]:
+    """Shingle set for the steps + notes (insensitive to case, punctuation and in-step word order)."""
+    out = set()
+    prev = None
+    for step in fields.get("steps") or []:
+        words = step_words(step)
+        if not words:
+            continue
+        ident = " ".join(sorted(set(words)))
+        out.add(hash(("s", ident)))
+        if prev is not None:
+            out.add(hash(("p", prev, ident)))
+        out.update(hash(("w", w)) for w in words)
+        prev = ident
+    out.update(hash(("n", w)) for w in step_words(fields.get("notes") or ""))
+    return frozenset(out)
+
+def minhash(feats: frozenset[int]) -> tuple[int, ...]:
+    hashes = [h & MASK for h in feats] or [0]
+    return tuple(min((a * h + b) & MASK for h in hashes) for a, b in PERMUTATIONS)
+
+def bands(signature: tuple[int, ...]) -> list[tuple]:
+    return [(i, signature[i:i + BAND_ROWS]) for i in range(0, NUM_PERM, BAND_ROWS)]
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class Match(NamedTuple):
+    key: str
+    similarity: float
+    data: dict
+
+    @property
+    def reusable(self) -> bool:
+        return self.similarity >= REUSE_THRESHOLD
+
+
+class _Entry(NamedTuple):
+    key: str
+    block: str
+    feats: frozenset
+    bands: list
+
+
+# -------------------------
+# Index
+# -------------------------
+class SimilarityCache:
+    """In-memory LSH index over stored requests; results are read from `cache`."""
+
+    def __init__(
+        self,
+        cache: ResultCache,
+        seed_threshold: float = SEED_THRESHOLD,
+        max_entries: int = 5000,
+        persist: bool = True,
+    ):
+        self.cache = cache
+        self.seed_threshold = seed_threshold
+        self.max_entries = max_entries
+        self.path = cache.path if persist else None
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._buckets: dict[tuple, set[str]] = {}
+        self.counts = {"reused": 0, "seeded": 0, "miss": 0}
+
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS similar (
+                            key TEXT PRIMARY KEY,
+                            fields TEXT NOT NULL,
+                            created_at REAL NOT NULL
+                        )
+                    """)
+                    rows = conn.execute(
+                        "SELECT key, fields FROM similar ORDER BY created_at DESC LIMIT ?", (max_entries,)
+                    ).fetchall()
+            except sqlite3.Error:
+                rows = []
+            for key, blob in reversed(rows):
+                self._index(key, json.loads(blob))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _index(self, key: str, fields: dict) -> None:
+        feats = features(fields)
+        block = block_key(fields)
+        entry = _Entry(key, block, feats, [(block, b) for b in bands(minhash(feats))])
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            for b in entry.bands:
+                self._buckets.setdefault(b, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))  # oldest first
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for b in entry.bands:
+            bucket = self._buckets.get(b)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[b]
+
+    def add(self, fields: dict, key: str) -> None:
+        """Remember that `key` in the result cache answers `fields`."""
+        self._index(key, fields)
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO similar (key, fields, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(fields, ensure_ascii=False), time.time()),
+                    )
+                    conn.execute(
+                        "DELETE FROM similar WHERE key NOT IN "
+                        "(SELECT key FROM similar ORDER BY created_at DESC LIMIT ?)",
+                        (self.max_entries,),
+                    )
+            except sqlite3.Error:
+                pass  # best-effort, like the result cache's disk level
+
+    def nearest(self, fields: dict) -> tuple[str, float] | None:
+        """(cache key, Jaccard similarity) of the closest indexed request in the same block."""
+        feats = features(fields)
+        block = block_key(fields)
+        with self._lock:
+            candidates = set()
+            for b in bands(minhash(feats)):
+                candidates |= self._buckets.get((block, b), set())
+            best = None
+            for key in candidates:
+                score = jaccard(feats, self._entries[key].feats)
+                if best is None or score > best[1]:
+                    best = (key, score)
+        return best
+
+    def match(self, fields: dict) -> Match | None:
+        """Closest stored result at or above the seed threshold (reusable if above REUSE_THRESHOLD)."""
+        best = self.nearest(fields)
+        if best is None or best[1] < self.seed_threshold:
+            return None
+        data = self.cache.get(best[0])
+        if data is None:
+            with self._lock:
+                self._drop(best[0])  # expired or evicted from the result cache
+            return None
+        return Match(best[0], best[1], data)
+
+    def record(self, outcome: str) -> None:
+        """Count a request that missed the exact cache: reused | seeded | miss."""
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+            entries, buckets = len(self._entries), len(self._buckets)
+        total = sum(counts.values())
+        return {
+            **counts,
+            "entries": entries,
+            "buckets": buckets,
+            "hit_rate": round((counts["reused"] + counts["seeded"]) / total, 4) if total else 0.0,
+        }
+
+
+# -------------------------
+# CLI
+# -------------------------
+def _perturb(steps: list[str], rng: random.Random) -> list[str]:
+    """The edits users make between regenerations."""
+    steps = list(steps)
+    i = rng.randrange(len(steps))
+    edit = rng.choice(("case", "bullets", "punct", "order", "label"))
+    if edit == "case":
+        steps = [s.upper() if rng.random() < 0.5 else s.lower() for s in steps]
+    elif edit == "bullets":
+        steps = [f"{n + 1}. {s}" for n, s in enumerate(steps)]
+    elif edit == "punct":
+        steps[i] = steps[i].rstrip(".") + "."
+    elif edit == "order":
+        steps[i] = " ".join(reversed(steps[i].split()))
+    else:
+        steps[i] = steps[i] + " manually"
+    return steps
+
+def bench(entries: int, probes: int, seed: int = 7) -> dict:
+    """Index library templates (× context variants), then probe with user-style edits."""
+    import tempfile
+
+    from process_library import DOMAINS, INDUSTRIES, MATURITY_LEVELS, TIME_HORIZONS, get_default_steps
+    from prompt_builder import request_fields
+    from result_cache import make_cache_key
+
+    rng = random.Random(seed)
+    templates = [
+        (d, w, sp, get_default_steps(d, w, sp))
+        for d, workflows in DOMAINS.items() for w, v in workflows.items() for sp in (v.get("sub_processes") or {})
+    ]
+    templates = [t for t in templates if len(t[3]) >= 4]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResultCache(os.path.join(tmp, "results.sqlite3"))
+        index = SimilarityCache(cache, persist=False, max_entries=entries)
+        stored = {}
+        for n in range(entries):
+            d, w, sp, steps = templates[n % len(templates)]
+            fields = request_fields(d, w, sp, rng.choice(TIME_HORIZONS), rng.choice(INDUSTRIES),
+                                    rng.choice(MATURITY_LEVELS), [], "", steps)
+            key = make_cache_key(fields, PROMPT_VERSION)  # identical requests share an entry
+            cache.set(key, {"today_steps": [], "n": n})
+            index.add(fields, key)
+            stored[key] = fields
+        stored = [(f, k) for k, f in stored.items()]
+
+        times, found, exact = [], 0, 0
+        for _ in range(probes):
+            fields, key = rng.choice(stored)
+            probe = dict(fields, steps=_perturb(fields["steps"], rng))
+            t0 = time.perf_counter()
+            best = index.nearest(probe)
+            times.append(time.perf_counter() - t0)
+            if best is not None and best[1] >= index.seed_threshold:
+                found += 1
+                exact += best[0] == key
+    times.sort()
+    return {
+        "entries": len(index),
+        "probes": probes,
+        "found": round(found / probes, 4),
+        "right_entry": round(exact / max(found, 1), 4),
+        "p50_ms": round(times[len(times) // 2] * 1000, 4),
+        "p99_ms": round(times[int(len(times) * 0.99)] * 1000, 4),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Near-duplicate result index.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="entries in the on-disk index")
+    b = sub.add_parser("bench", help="lookup latency and recall on perturbed library templates")
+    b.add_argument("--entries", type=int, default=2000)
+    b.add_argument("--probes", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "stats":
+        print(json.dumps(SimilarityCache(ResultCache()).stats(), indent=2))
+    else:
+        print(json.dumps(bench(args.entries, args.probes), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
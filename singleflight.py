@@ -0,0 +1,63 @@
+# =========================
+# AI Workflow Optimizer — Process-wide request coalescing ("single flight")
+#
+# Identical requests (same canonical cache key) that arrive while one is
+# already in flight don't issue their own LLM call: the first caller becomes
+# the leader, everyone else waits on the leader's future and receives the same
+# parsed result (or the same exception).
+# =========================
+
+import threading
+from concurrent.futures import Future
+
+from json_stream import StepStreamParser
+
+
+class Flight:
+    """One in-flight request: its future plus the steps streamed so far (for followers' live view)."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.future: Future = Future()
+        self.parser = StepStreamParser()
+        self.followers = 0
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: float | None = None):
+        return self.future.result(timeout=timeout)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[str, Flight] = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def join(self, key: str) -> tuple[Flight, bool]:
+        """Return (flight, is_leader). The leader must call finish() exactly once."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.stats["followers"] += 1
+                return flight, False
+            flight = Flight(key)
+            self._flights[key] = flight
+            self.stats["leaders"] += 1
+            return flight, True
+
+    def finish(self, flight: Flight, result=None, error: BaseException | None = None) -> None:
+        """Publish the leader's outcome and retire the key so later requests start fresh."""
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        if error is not None:
+            flight.future.set_exception(error)
+        else:
+            flight.future.set_result(result)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
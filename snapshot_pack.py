@@ -0,0 +1,192 @@
+# =========================
+# AI Workflow Optimizer — Precomputed snapshot pack
+#
+# Results for every library template (sub-process × time horizon × maturity,
+# default industry, no constraints/notes) in one compressed, indexed file that
+# the app loads at startup and serves without any network call.
+#
+#   OPENAI_API_KEY=... python snapshot_pack.py build --out snapshots.wfsnap
+#   python snapshot_pack.py build --from sweep.jsonl --out snapshots.wfsnap
+#   python snapshot_pack.py stats snapshots.wfsnap
+#
+# File layout (all integers big-endian):
+#   MAGIC (8 bytes) | index length (4 bytes) | zlib(JSON index) | zlib blobs...
+# The index maps cache key → [offset, length] into the blob area, plus header
+# metadata (format, prompt_version, built_at). Keys are make_cache_key() over
+# the request fields, so they already cover the template text and the prompt
+# version: editing a template or bumping PROMPT_VERSION makes its entries
+# unreachable, and `stats` reports them as stale.
+# =========================
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+from process_library import INDUSTRIES, MATURITY_LEVELS
+from prompt_builder import PROMPT_VERSION
+from result_cache import make_cache_key
+
+MAGIC = b"WFSNAP1\n"
+DEFAULT_SNAPSHOT_PATH = os.environ.get(
+    "WORKFLOW_SNAPSHOT_PACK",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots.wfsnap"),
+)
+
+
+def write_snapshot(results: dict[str, dict], path: str, prompt_version: str = PROMPT_VERSION) -> str:
+    """Write {cache_key: result} as a snapshot file (atomically)."""
+    blobs, entries, offset = [], {}, 0
+    for key in sorted(results):
+        blob = zlib.compress(
+            json.dumps(results[key], ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9
+        )
+        entries[key] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+    index = zlib.compress(json.dumps({
+        "format": 1,
+        "prompt_version": prompt_version,
+        "built_at": int(time.time()),
+        "entries": entries,
+    }, separators=(",", ":")).encode("utf-8"), 9)
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)) or ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(MAGIC)
+        fh.write(struct.pack(">I", len(index)))
+        fh.write(index)
+        for blob in blobs:
+            fh.write(blob)
+    os.replace(tmp, path)
+    return path
+
+
+class SnapshotPack:
+    """Loaded snapshot: the index is decoded at load time, entries are inflated on demand."""
+
+    def __init__(self, data: bytes = b""):
+        self.meta: dict = {}
+        self._entries: dict[str, list[int]] = {}
+        self._data = data
+        self._base = 0
+        self.hits = 0
+        if data:
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError("not a workflow snapshot pack")
+            (index_len,) = struct.unpack(">I", data[len(MAGIC):len(MAGIC) + 4])
+            start = len(MAGIC) + 4
+            header = json.loads(zlib.decompress(data[start:start + index_len]))
+            self._entries = header.pop("entries")
+            self.meta = header
+            self._base = start + index_len
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_SNAPSHOT_PATH) -> "SnapshotPack":
+        """Empty pack when the file is missing or unreadable (the app then just falls through)."""
+        try:
+            with open(path, "rb") as fh:
+                return cls(fh.read())
+        except (OSError, ValueError, zlib.error, json.JSONDecodeError, struct.error):
+            return cls()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def keys(self):
+        return self._entries.keys()
+
+    def get(self, key: str) -> dict | None:
+        """The stored result, or None when absent or its blob is damaged (the caller falls through)."""
+        loc = self._entries.get(key)
+        if loc is None:
+            return None
+        offset, length = loc
+        start = self._base + offset
+        try:
+            data = json.loads(zlib.decompress(self._data[start:start + length]))
+        except (zlib.error, ValueError):  # ValueError covers JSONDecodeError and bad UTF-8
+            return None
+        if not isinstance(data, dict):
+            return None
+        self.hits += 1
+        return data
+
+
+def template_grid() -> list[dict]:
+    """Every library template × horizon × maturity with the default industry and empty extras."""
+    from batch_sweep import expand_grid
+
+    return expand_grid(industries=[INDUSTRIES[0]], maturities=MATURITY_LEVELS)
+
+
+def results_from_jsonl(path: str) -> dict[str, dict]:
+    """Collect successful, contract-clean sweep records (batch_sweep.py output) in the current grid."""
+    wanted = {make_cache_key(f, PROMPT_VERSION) for f in template_grid()}
+    results = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            rec = json.loads(line)
+            key = rec.get("cache_key")
+            if rec.get("contract_errors"):
+                continue
+            if key in wanted and rec.get("status") in ("ok", "repaired", "cached") and isinstance(rec.get("result"), dict):
+                results[key] = rec["result"]
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or inspect the precomputed snapshot pack.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="generate results for every template and write the pack")
+    b.add_argument("--out", default=DEFAULT_SNAPSHOT_PATH)
+    b.add_argument("--from", dest="source", help="pack an existing batch_sweep JSONL instead of calling the LLM")
+    b.add_argument("--concurrency", type=int, default=8)
+    s = sub.add_parser("stats", help="report coverage and stale entries")
+    s.add_argument("path", nargs="?", default=DEFAULT_SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "stats":
+        pack = SnapshotPack.load(args.path)
+        wanted = {make_cache_key(f, PROMPT_VERSION) for f in template_grid()}
+        live = sum(1 for k in pack.keys() if k in wanted)
+        print(json.dumps({
+            **pack.meta,
+            "entries": len(pack),
+            "current": live,
+            "stale": len(pack) - live,
+            "missing": len(wanted) - live,
+            "bytes": os.path.getsize(args.path) if os.path.exists(args.path) else 0,
+        }, indent=2))
+        return 0
+
+    source = args.source
+    if not source:
+        if not os.environ.get("OPENAI_API_KEY", "").strip():
+            print("Missing OPENAI_API_KEY in the environment (or pass --from sweep.jsonl).", file=sys.stderr)
+            return 2
+        from batch_sweep import run_sweep
+        from metrics import configure_logging
+
+        configure_logging()
+        fd, source = tempfile.mkstemp(suffix=".jsonl")
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            counts = asyncio.run(run_sweep(template_grid(), out, args.concurrency))
+        print(f"sweep: {counts}", file=sys.stderr)
+
+    results = results_from_jsonl(source)
+    write_snapshot(results, args.out)
+    print(f"wrote {args.out}: {len(results)} entries ({os.path.getsize(args.out)} bytes)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# =========================
+# AI Workflow Optimizer — Speculative background generation
+#
+# While the user is still on the form, the input panel hands every complete
+# set of inputs to the Speculator. A worker waits until the inputs have been
+# stable for SETTLE_SECONDS, then streams a generation in the background.
+# New inputs from the same session supersede the pending/in-flight job (the
+# stream is closed at the next delta and its unused reservation refunded).
+# Generate takes over a finished result or a stream that is already running;
+# a job still queued or settling is cancelled and Generate calls directly.
+# Results get the local contract fixes before they are cached; sections that
+# still fail are regenerated by the engine when Generate takes the job over.
+#
+# Spend is bounded by a rolling-hour token budget that is charged with each
+# call's worst-case reservation (prompt estimate + the calibrated max_tokens).
+# =========================
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from json_stream import StepStreamParser
+from json_utils import parse_json_safely, repair_truncated_json
+from llm_client import call_openai_streaming
+from prompt_builder import PROMPT_VERSION, RESULT_DEFAULTS, build_messages, is_usable_result
+from rate_limiter import estimate_tokens
+from result_cache import make_cache_key
+from schema_validator import ResultValidator, enforce_contract
+from token_budget import max_tokens_for
+
+SETTLE_SECONDS = float(os.environ.get("SPECULATION_SETTLE_SECONDS", "4"))
+TOKEN_BUDGET_PER_HOUR = int(os.environ.get("SPECULATION_TOKENS_PER_HOUR", "150000"))
+MAX_WORKERS = int(os.environ.get("SPECULATION_WORKERS", "4"))
+
+
+class Superseded(Exception):
+    """Raised inside the stream callback to abandon a speculative call."""
+
+
+class SpendCap:
+    """Rolling one-hour token budget for speculative calls (thread-safe)."""
+
+    def __init__(self, tokens_per_hour: int = TOKEN_BUDGET_PER_HOUR, window: float = 3600.0):
+        self.tokens_per_hour = tokens_per_hour
+        self.window = window
+        self._spent: deque[tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+
+    def _used(self, now: float) -> int:
+        while self._spent and now - self._spent[0][0] > self.window:
+            self._spent.popleft()
+        return sum(t for _, t in self._spent)
+
+    def try_spend(self, tokens: int) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._used(now) + tokens > self.tokens_per_hour:
+                return False
+            self._spent.append((now, tokens))
+            return True
+
+    def remaining(self) -> int:
+        with self._lock:
+            return max(0, self.tokens_per_hour - self._used(time.monotonic()))
+
+
+class Speculation:
+    """One speculative job; `parser` exposes the steps streamed so far."""
+
+    def __init__(self, fields: dict):
+        self.fields = fields
+        self.key = make_cache_key(fields, PROMPT_VERSION)
+        self.cancelled = threading.Event()
+        self.parser = StepStreamParser()
+        self.started = False  # True once the LLM call has been issued
+        self.future = None
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def result(self, timeout: float | None = None) -> dict | None:
+        """Usable result, or None if the job was skipped, superseded, capped or failed."""
+        try:
+            return self.future.result(timeout=timeout)
+        except Exception:
+            return None
+
+
+class Speculator:
+    """Per-session latest-wins speculative generation on a small shared thread pool."""
+
+    def __init__(
+        self, cache=None, spend_cap: SpendCap | None = None, max_workers: int = MAX_WORKERS,
+        validator: ResultValidator | None = None,
+    ):
+        self.cache = cache
+        self.spend_cap = spend_cap or SpendCap()
+        self._validator = validator
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculate")
+        self._jobs: dict[str, Speculation] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            "submitted": 0, "superseded": 0, "capped": 0, "completed": 0, "handed_over": 0, "not_started": 0,
+            "invalid": 0,
+        }
+
+    @property
+    def validator(self) -> ResultValidator:
+        if self._validator is None:
+            from process_library import TOOL_LIBRARY  # lazily loaded from the library pack
+
+            self._validator = ResultValidator(TOOL_LIBRARY)
+        return self._validator
+
+    def submit(self, session_id: str, fields: dict, client) -> Speculation:
+        """Speculate on `fields` for this session; same inputs keep the existing job."""
+        job = Speculation(fields)
+        with self._lock:
+            current = self._jobs.get(session_id)
+            if current is not None and current.key == job.key and not current.cancelled.is_set():
+                return current
+            if current is not None:
+                current.cancel()
+                self.stats["superseded"] += 1
+            self._jobs[session_id] = job
+            self.stats["submitted"] += 1
+        job.future = self._pool.submit(self._run, job, client)
+        return job
+
+    def take(self, session_id: str, fields: dict) -> Speculation | None:
+        """Hand over the session's job if it matches `fields` and has a result or a running call.
+
+        Anything else is cancelled: waiting on a job that is still queued or settling
+        would be slower than calling directly.
+        """
+        key = make_cache_key(fields, PROMPT_VERSION)
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+            if job is None:
+                return None
+            if job.key != key or job.cancelled.is_set() or (job.done() and job.result() is None):
+                job.cancel()
+                return None
+            if not job.done() and not job.started:
+                job.cancel()
+                self.stats["not_started"] += 1
+                return None
+            self.stats["handed_over"] += 1
+            return job
+
+    def cancel(self, session_id: str) -> None:
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+        if job is not None:
+            job.cancel()
+
+    def _run(self, job: Speculation, client) -> dict | None:
+        # Debounce: only inputs that stay unchanged for SETTLE_SECONDS are worth a call.
+        if job.cancelled.wait(SETTLE_SECONDS):
+            return None
+        if self.cache is not None:
+            cached = self.cache.get(job.key)
+            if cached is not None:
+                return cached
+
+        messages = build_messages(job.fields)
+        n_steps = len(job.fields["steps"])
+        if not self.spend_cap.try_spend(estimate_tokens(messages, max_tokens_for(n_steps))):
+            with self._lock:
+                self.stats["capped"] += 1
+            return None
+
+        def on_delta(delta: str):
+            if job.cancelled.is_set():
+                raise Superseded()
+            job.parser.feed(delta)
+
+        job.started = True
+        raw = call_openai_streaming(client, messages, on_delta, max_retries=2, n_steps=n_steps)
+        try:
+            data = parse_json_safely(raw)
+        except Exception:
+            data = repair_truncated_json(raw, RESULT_DEFAULTS)
+        if not is_usable_result(data):
+            return None
+        # Local fixes only (no model calls in the background); a result that still
+        # breaks the contract is not cached.
+        data, errors = enforce_contract(data, job.fields, self.validator)
+        if self.cache is not None and not errors:
+            self.cache.set(job.key, data)
+        with self._lock:
+            self.stats["completed" if not errors else "invalid"] += 1
+        return data
@@ -0,0 +1,62 @@
+import logging
+import os
+import sys
+
+import pytest
+
+# The app is a set of flat top-level modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers import make_fields  # noqa: E402
+
+
+@pytest.fixture
+def fields() -> dict:
+    return make_fields()
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Keep the shared rate limiter state and the max_tokens usage log out of the working tree."""
+    import rate_limiter
+    import token_budget
+
+    monkeypatch.setattr(rate_limiter, "_LIMITER", rate_limiter.RateLimiter(
+        rpm=10_000, tpm=10_000_000, state_path=str(tmp_path / "ratelimit.json"),
+    ))
+    monkeypatch.setattr(token_budget, "BUDGET", token_budget.TokenBudget(None))
+    # entry points under test attach a log handler; keep it from outliving the test
+    logger = logging.getLogger("workflow_optimizer")
+    monkeypatch.setattr(logger, "handlers", [])
+    monkeypatch.setattr(logger, "level", logger.level)
+    monkeypatch.setattr(logger, "propagate", logger.propagate)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """fake_openai.py on a free port, with the pooled clients pointed at it (no pacing or latency)."""
+    import argparse
+    import threading
+
+    import fake_openai as fake
+    import llm_client
+
+    parser = argparse.ArgumentParser()
+    fake.add_server_args(parser)
+    args = parser.parse_args(["--latency-ms", "0", "--jitter-ms", "0", "--tokens-per-sec", "0", "--seed", "1"])
+    server = fake.serve(args, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-fake")
+    monkeypatch.setattr(llm_client, "_CLIENTS", {})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Retries without the jittered sleep between attempts."""
+    import llm_client
+
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt, retry_after=None: 0.0)
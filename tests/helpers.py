@@ -0,0 +1,75 @@
+"""Shared test inputs and an in-process stand-in for the OpenAI client (see fake_openai.py for the HTTP one)."""
+
+import json
+import threading
+from types import SimpleNamespace
+
+from process_library import INDUSTRIES, MATURITY_LEVELS, TIME_HORIZONS
+from prompt_builder import request_fields
+
+STEPS = [
+    "Receive invoice by email", "Key invoice into ERP", "Match invoice to PO",
+    "Approve invoice", "Resolve exceptions with vendor", "Schedule payment", "Archive documents",
+]
+
+
+def make_fields(steps=STEPS, **overrides) -> dict:
+    fields = request_fields(
+        "Finance", "Procure-to-Pay", "Invoice processing", TIME_HORIZONS[0], INDUSTRIES[0], MATURITY_LEVELS[1],
+        [], "", list(steps),
+    )
+    fields.update(overrides)
+    return fields
+
+
+def _chunk(content=None, finish=None, usage=None):
+    choices = [] if content is None and finish is None else [
+        SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish)
+    ]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class FakeStream:
+    """Iterable of completion chunks; `gate` (an Event) holds the stream after the first chunk."""
+
+    def __init__(self, text: str, chunk_size: int = 40, gate: threading.Event | None = None):
+        self.text, self.chunk_size, self.gate = text, chunk_size, gate
+        self.closed = False
+
+    def __iter__(self):
+        for i in range(0, len(self.text), self.chunk_size):
+            if self.closed:
+                return
+            if i and self.gate is not None:
+                self.gate.wait(5)
+            yield _chunk(self.text[i:i + self.chunk_size])
+        yield _chunk(None, "stop")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """client.chat.completions.create(): each call takes the next reply (a dict, a string, or an exception)."""
+
+    def __init__(self, *replies, gate: threading.Event | None = None):
+        self.replies = list(replies)
+        self.calls: list[dict] = []
+        self.streams: list[FakeStream] = []
+        self.gate = gate
+        self.started = threading.Event()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.started.set()
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, Exception):
+            raise reply
+        text = reply if isinstance(reply, str) else json.dumps(reply)
+        if kwargs.get("stream"):
+            stream = FakeStream(text, gate=self.gate)
+            self.streams.append(stream)
+            return stream
+        message = SimpleNamespace(content=text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import metrics  # noqa: E402
+import result_cache  # noqa: E402
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """app.py with no secrets.toml, its caches in tmp_path and no metrics file."""
+    import streamlit as st
+
+    monkeypatch.setattr(result_cache, "DEFAULT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "write_metrics_file", lambda *a, **k: None)
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    assert not at.exception
+    yield at
+    st.cache_resource.clear()
+
+
+def test_generate_without_secrets_falls_back_to_the_local_result(app):
+    app.button[-1].click().run()
+    assert not app.exception
+    assert [w.value for w in app.warning] == ["Missing OPENAI_API_KEY — showing the rule-based result."]
+    assert isinstance(app.session_state.last_result, dict)
+
+
+def _generate(app, steps: list[str] | None = None, long_mode: bool = False):
+    if steps is not None:
+        app.text_area[0].input("\n".join(steps))
+    if long_mode:
+        app.checkbox[0].check()
+    app.button[-1].click().run()
+    assert not app.exception
+    return app
+
+
+def test_inputs_render_without_a_result_section(app):
+    assert app.selectbox(key="sel_domain").value == "HR / People"
+    assert app.text_area[0].value  # the template's default steps
+    assert not any(m.value.startswith("## Workflow view") for m in app.markdown)
+
+
+# AppTest reruns the whole script on every interaction (no fragment-scoped reruns),
+# so these check the state hand-off the fragments rely on rather than rerun scope.
+def test_generated_result_survives_later_input_changes(app):
+    _generate(app)
+    fields = app.session_state.last_fields
+    assert any(m.value.startswith("## Workflow view") for m in app.markdown)
+    app.text_area[1].input("new note").run()  # an input edit, no Generate
+    assert app.session_state.last_fields == fields
+    assert any(m.value.startswith("## Workflow view") for m in app.markdown)
+
+
+def test_too_few_steps_warns_and_stores_nothing(app):
+    _generate(app, ["One", "Two", "Three"])
+    assert [w.value for w in app.warning] == ["Please enter at least 4 workflow steps (one per line)."]
+    assert app.session_state.last_result is None
+
+
+def test_search_pick_sets_the_cascaded_selection(app):
+    app.text_input(key="process_query").input("month-end close").run()
+    app.button[0].click().run()
+    assert app.selectbox(key="sel_domain").value == "Finance"
+    assert app.selectbox(key="sel_sub_process").value == "Month-end close"
+    app.selectbox(key="sel_domain").select("Sales").run()
+    assert app.selectbox(key="sel_sub_process").value == "B2B Sales Cycle"  # child selection reset
+
+
+def test_long_flows_are_paged(app):
+    _generate(app, [f"Step number {i}" for i in range(1, 31)], long_mode=True)
+    result = app.session_state.last_result
+    assert len(result["today_steps"]) > 12
+    pages = app.selectbox(key="page_today")
+    assert pages.value == 0 and pages.options[-1].endswith(f"of {len(result['today_steps'])}")
+    pages.select_index(1).run()
+    assert not app.exception and app.selectbox(key="page_today").value == 12
@@ -0,0 +1,73 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+import batch_sweep
+from batch_sweep import expand_grid, run_sweep
+from llm_client import get_async_client
+from result_cache import ResultCache
+
+pytestmark = pytest.mark.usefixtures("fake_openai")
+
+
+@pytest.fixture
+def jobs():
+    return expand_grid()[:4]
+
+
+def _records(out: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_sweep_writes_one_record_per_job_and_caches(jobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_sweep, "ResultCache", lambda: ResultCache(str(tmp_path / "r.sqlite3")))
+
+    async def twice():
+        first, second = io.StringIO(), io.StringIO()
+        counts = await run_sweep(jobs, first, concurrency=2)
+        # The pooled client stays open for whoever uses it next.
+        assert not get_async_client("sk-fake").is_closed()
+        again = await run_sweep(jobs, second, concurrency=2)
+        return counts, again, first, second
+
+    counts, again, first, second = asyncio.run(twice())
+    assert sum(counts.values()) == len(jobs) and "error" not in counts
+    assert again == {"cached": len(jobs)}
+    assert sorted(r["job_id"] for r in _records(first)) == list(range(len(jobs)))
+
+
+def test_results_with_contract_errors_are_not_cached(jobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_sweep, "ResultCache", lambda: ResultCache(str(tmp_path / "r.sqlite3")))
+    real = batch_sweep.enforce_contract
+
+    def strict(data, fields, validator):
+        data, errors = real(data, fields, validator)
+        return data, dict(errors, notes=["missing"]) if fields is jobs[0] else errors
+
+    monkeypatch.setattr(batch_sweep, "enforce_contract", strict)
+    first, second = io.StringIO(), io.StringIO()
+    asyncio.run(run_sweep(jobs, first, concurrency=2))
+    assert {r["job_id"]: r for r in _records(first)}[0]["contract_errors"]
+    asyncio.run(run_sweep(jobs, second, concurrency=2))
+    statuses = {r["job_id"]: r["status"] for r in _records(second)}
+    assert statuses[0] != "cached"
+    assert all(statuses[i] == "cached" for i in range(1, len(jobs)))
+
+
+def test_one_failing_job_does_not_abort_the_sweep(jobs, monkeypatch):
+    real = batch_sweep.enforce_contract
+
+    def flaky(data, fields, validator):
+        if fields is jobs[1]:
+            raise TypeError("unhashable type: 'list'")
+        return real(data, fields, validator)
+
+    monkeypatch.setattr(batch_sweep, "enforce_contract", flaky)
+    out = io.StringIO()
+    counts = asyncio.run(run_sweep(jobs, out, concurrency=2, use_cache=False))
+    records = {r["job_id"]: r for r in _records(out)}
+    assert len(records) == len(jobs)
+    assert records[1]["status"] == "error" and records[1]["error_type"] == "TypeError"
+    assert counts["error"] == 1
@@ -0,0 +1,30 @@
+from bench_helpers import CASES, build_inputs, compare, summarize
+
+
+def _report(normalized: float, noise: float = 0.0) -> dict:
+    return {"cases": {"case": {"normalized": normalized, "noise": noise}}}
+
+
+def test_summarize_uses_median_and_relative_mad():
+    row = summarize([(1.0, 1.0), (2.0, 1.0), (3.0, 1.0), (100.0, 1.0)])
+    assert row["normalized"] == 2.5
+    assert row["noise"] == 0.4  # MAD 1.0 over median 2.5
+
+
+def test_slowdown_within_threshold_passes():
+    assert compare(_report(1.25), _report(1.0), threshold=0.3) == []
+
+
+def test_slowdown_beyond_threshold_fails():
+    assert compare(_report(1.5), _report(1.0), threshold=0.3) == ["case"]
+
+
+def test_noisy_runs_widen_the_allowance():
+    assert compare(_report(1.5, noise=0.1), _report(1.0), threshold=0.3) == []
+    assert compare(_report(2.0, noise=0.1), _report(1.0), threshold=0.3) == ["case"]
+
+
+def test_every_case_runs_on_its_input():
+    inputs = build_inputs()
+    for fn, key in CASES.values():
+        fn(inputs[key])
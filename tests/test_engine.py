@@ -0,0 +1,109 @@
+import json
+
+import httpx
+import pytest
+from openai import APIConnectionError, APITimeoutError, AuthenticationError, BadRequestError, InternalServerError
+
+from engine import Engine, degradable, fields_from_dict
+from helpers import STEPS, FakeClient, make_fields
+from local_optimizer import optimize_locally
+from prompt_builder import MAX_INPUT_STEPS
+from result_cache import ResultCache
+from similarity_cache import SimilarityCache
+
+pytestmark = pytest.mark.usefixtures("no_backoff")
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _status(cls, code: int):
+    return cls("error", response=httpx.Response(code, request=REQUEST), body=None)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "results.sqlite3"))
+
+
+def _engine(client, **kwargs) -> Engine:
+    engine = Engine("sk-test", **kwargs)
+    engine._client = client
+    return engine
+
+
+@pytest.mark.parametrize("err, expected", [
+    (APIConnectionError(request=REQUEST), True),
+    (APITimeoutError(request=REQUEST), True),
+    (_status(InternalServerError, 503), True),
+    (_status(BadRequestError, 400), False),
+    (_status(AuthenticationError, 401), False),
+])
+def test_degradable(err, expected):
+    assert degradable(err) is expected
+
+
+def test_outage_degrades_to_local(fields):
+    result = _engine(FakeClient(_status(InternalServerError, 500))).generate(fields, stream=False, use_cache=False)
+    assert result.source == "local" and "unavailable" in result.notice
+
+
+def test_request_bug_propagates(fields):
+    with pytest.raises(BadRequestError):
+        _engine(FakeClient(_status(BadRequestError, 400))).generate(fields, stream=False, use_cache=False)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_llm_result_is_contract_checked_and_cached(fields, cache, stream):
+    engine = _engine(FakeClient(optimize_locally(fields)), cache=cache)
+    seen = {}
+    result = engine.generate(fields, stream=stream, on_steps=lambda k, s: seen.update({k: len(s)}))
+    assert result.source == "llm" and result.contract_errors == {}
+    assert engine.generate(fields).source == "cache"
+    if stream:
+        assert seen == {"today_steps": len(result.data["today_steps"]),
+                        "future_steps": len(result.data["future_steps"])}
+
+
+def test_truncated_reply_is_repaired_locally(fields):
+    full = optimize_locally(fields)
+    raw = json.dumps(full)
+    cut = raw[:raw.index('"human_shift"') + 40]
+    engine = _engine(FakeClient(cut, {k: full[k] for k in ("human_shift", "deltas", "glossary",
+                                                            "tool_suggestions", "notes")}))
+    result = engine.generate(fields, stream=False, use_cache=False)
+    assert result.source == "llm" and result.contract_errors == {}
+    assert result.data["today_steps"] == full["today_steps"]
+
+
+def test_compact_mode_decodes_to_the_full_schema(fields):
+    from wire_format import encode_compact
+
+    full = optimize_locally(fields)
+    client = FakeClient(encode_compact(full))
+    result = _engine(client).generate(fields, stream=True, use_cache=False, compact=True)
+    assert result.data["future_steps"] == full["future_steps"]
+    assert "Compact JSON output" in client.calls[0]["messages"][0]["content"]
+
+
+def test_similarity_match_is_computed_once(fields, cache, monkeypatch):
+    similar = SimilarityCache(cache, persist=False)
+    calls = []
+    real = similar.match
+    monkeypatch.setattr(similar, "match", lambda f: calls.append(1) or real(f))
+    engine = _engine(FakeClient(optimize_locally(fields)), cache=cache, similar=similar)
+    assert engine.lookup(fields) is None
+    engine.generate(fields, stream=False, use_cache=False)
+    assert len(calls) == 1
+    calls.clear()
+    engine.generate(make_fields(STEPS[:6]), stream=False)
+    assert len(calls) == 1
+
+
+def test_fields_from_dict_cleans_list_and_text_alike():
+    lines = ["  Receive invoice  ", "", "• Key into ERP", "x" * 200] + [f"Step {i}" for i in range(30)]
+    from_list = fields_from_dict({"steps": lines})
+    from_text = fields_from_dict({"steps": "\n".join(lines)})
+    assert from_list == from_text
+    assert from_list["steps"][:2] == ["Receive invoice", "- Key into ERP"]
+    assert len(from_list["steps"]) == MAX_INPUT_STEPS and len(from_list["steps"][2]) == 140
+    assert fields_from_dict({"steps": 5})["steps"] == []
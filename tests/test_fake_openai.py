@@ -0,0 +1,134 @@
+import argparse
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import fake_openai
+import load_driver
+from fake_openai import FakeOpenAI, add_server_args, fields_from_prompt, serve
+from helpers import make_fields
+from engine import GenerationResult
+from local_optimizer import optimize_locally
+from prompt_builder import PROMPT_VERSION, build_messages, build_section_messages
+from result_cache import make_cache_key
+from wire_format import build_compact_messages, encode_compact
+
+
+def _args(*argv):
+    parser = argparse.ArgumentParser()
+    add_server_args(parser)
+    return parser.parse_args(["--latency-ms", "0", "--jitter-ms", "0", "--tokens-per-sec", "0", "--seed", "1", *argv])
+
+
+@pytest.fixture
+def server_with():
+    servers = []
+
+    def start(*argv):
+        server = serve(_args(*argv), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _post(base: str, body: dict):
+    req = urllib.request.Request(
+        base + "/v1/chat/completions", json.dumps(body).encode(), {"Content-Type": "application/json"},
+    )
+    return urllib.request.urlopen(req, timeout=5)
+
+
+def test_fields_round_trip_through_the_prompt():
+    fields = make_fields(constraints=["Budget", "SOX"], notes="Keep approvals")
+    assert fields_from_prompt(build_messages(fields)[1]["content"]) == fields
+    assert fields_from_prompt(build_messages(make_fields())[1]["content"]) == make_fields()
+
+
+def test_content_follows_the_requested_format():
+    fields = make_fields()
+    fake = FakeOpenAI(_args())
+    full = optimize_locally(fields)
+    assert json.loads(fake.content_for(build_messages(fields))) == full
+    assert json.loads(fake.content_for(build_section_messages(fields, full, ["glossary", "notes"]))) == {
+        "glossary": full["glossary"], "notes": full["notes"],
+    }
+    assert json.loads(fake.content_for(build_compact_messages(fields))) == encode_compact(full)
+    repair = [{"role": "user", "content": "PARTIAL_JSON_START:\n" + json.dumps(full)[:600] + "\nPARTIAL_JSON_END"}]
+    assert set(json.loads(fake.content_for(repair))) >= set(full)
+    assert fake.counts["synthetic"] == 3
+
+
+def test_recorded_results_are_replayed(tmp_path):
+    fields = make_fields()
+    path = tmp_path / "sweep.jsonl"
+    path.write_text(json.dumps({"cache_key": make_cache_key(fields, PROMPT_VERSION), "result": {"x": 1}}) + "\n")
+    fake = FakeOpenAI(_args(), fake_openai.load_recorded(str(path)))
+    assert json.loads(fake.content_for(build_messages(fields))) == {"x": 1}
+    assert fake.counts["recorded"] == 1
+
+
+def test_max_tokens_caps_the_completion(server_with):
+    base = server_with()
+    with _post(base, {"messages": build_messages(make_fields()), "max_tokens": 50}) as resp:
+        choice = json.loads(resp.read())["choices"][0]
+    assert choice["finish_reason"] == "length" and len(choice["message"]["content"]) == 200
+
+
+def test_injected_429_carries_retry_after(server_with):
+    base = server_with("--rate-429", "1", "--retry-after-ms", "1500")
+    with pytest.raises(urllib.error.HTTPError) as err:
+        _post(base, {"messages": build_messages(make_fields())})
+    assert err.value.code == 429 and err.value.headers["retry-after-ms"] == "1500"
+    with urllib.request.urlopen(base + "/stats", timeout=5) as resp:
+        stats = json.loads(resp.read())
+    assert stats["requests"] == stats["rate_limited"] == 1
+
+
+def test_streaming_sends_usage_when_asked(server_with):
+    base = server_with("--chunk-chars", "64")
+    body = {"messages": build_messages(make_fields()), "stream": True, "stream_options": {"include_usage": True}}
+    with _post(base, body) as resp:
+        events = [line[6:] for line in resp.read().decode().splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(e) for e in events[:-1]]
+    text = "".join(c["choices"][0]["delta"].get("content") or "" for c in chunks if c["choices"])
+    assert json.loads(text) == optimize_locally(make_fields())
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
+
+
+def test_percentiles_and_summary():
+    values = [float(v) for v in range(100, -1, -1)]
+    assert load_driver.percentile(values, 50) == 50 and load_driver.percentile(values, 99) == 99
+    assert load_driver.percentile(values, 100) == 100 and load_driver.percentile([3.0], 95) == 3
+    assert load_driver.percentile([], 50) is None
+    assert load_driver.summarize([]) == {"n": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_load_driver_against_the_fake_server(fake_openai, monkeypatch, tmp_path, capsys, stream):
+    monkeypatch.setenv("WORKFLOW_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("OPENAI_READ_TIMEOUT", "10")
+    base_url = f"http://127.0.0.1:{fake_openai.server_address[1]}/v1"
+    argv = ["--base-url", base_url, "--sessions", "3", "--requests", "2", "--seed", "7", "--json"]
+    assert load_driver.main(argv + (["--stream"] if stream else [])) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["requests"] == 6 and report["server"]["requests"] >= 6
+    assert set(report["outcomes"]) <= {"ok", "contract_errors"}
+    assert (report["ttft_s"]["n"] == 6) is stream
+    assert isinstance(report["repairs"], dict)
+
+
+def test_load_driver_outcomes_follow_the_engine_result():
+    assert load_driver.outcome_of(GenerationResult({}, "llm")) == "ok"
+    assert load_driver.outcome_of(GenerationResult({}, "coalesced")) == "coalesced"
+    assert load_driver.outcome_of(GenerationResult({}, "llm", contract_errors={"notes": ["x"]})) == "contract_errors"
+    assert load_driver.outcome_of(GenerationResult({}, "local", "Rate limit/quota hit — ...")) == "rate_limited"
+    assert load_driver.outcome_of(GenerationResult({}, "local", "AI service unavailable (APITimeoutError)")) == "degraded"
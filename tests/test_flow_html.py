@@ -0,0 +1,23 @@
+from flow_html import MAX_FLOW_STEPS, chip_class, flow_html, page_starts, shorten_label
+
+STEPS = [{"id": f"F{i}", "label": f"Step {i}", "actor": "AI+ERP", "intent": "Decision"} for i in range(1, 31)]
+
+
+def test_page_starts():
+    assert page_starts(0) == [0] and page_starts(12) == [0]
+    assert page_starts(13) == [0, 12] and page_starts(30) == [0, 12, 24]
+
+
+def test_one_page_of_steps_with_arrows_between():
+    html = flow_html(STEPS, start=12)
+    assert "F13" in html and "F24" in html and "F12<" not in html and "F25" not in html
+    assert html.count("arrow-down") == MAX_FLOW_STEPS - 1
+    assert flow_html(STEPS, start=24).count("idpill") == 6
+
+
+def test_future_highlights_and_actor_chips():
+    html = flow_html(STEPS[:1], highlight_future=True)
+    assert 'class="step ai-highlight human-upshift"' in html and "chip chip-mixed" in html
+    assert 'class="step"' in flow_html(STEPS[:1])
+    assert chip_class("erp") == "chip chip-erp" and chip_class("") == "chip chip-human"
+    assert shorten_label("Match invoice to purchase order") == "Match invoice to" and shorten_label("") == "Step"
@@ -0,0 +1,54 @@
+import json
+
+from json_stream import StepStreamParser
+
+DOC = {
+    "summary": "a {tricky} \"quoted\" [summary]",
+    "today_steps": [
+        {"id": 1, "label": "Receive {invoice}", "maps_to": [1]},
+        {"id": 2, "label": "Check \\ \"PO\" ]", "maps_to": [2, 3]},
+    ],
+    "notes": [{"id": 9, "label": "not a step"}],
+    "future_steps": [{"id": 1, "label": "Auto-ingest", "maps_to": [1, 2]}],
+}
+TEXT = json.dumps(DOC)
+
+
+def feed_in_chunks(parser, text, size):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+def test_emits_each_watched_step_once_whatever_the_chunking():
+    for size in (1, 3, 17, len(TEXT)):
+        parser = StepStreamParser()
+        events = feed_in_chunks(parser, TEXT, size)
+        assert events == [("today_steps", s) for s in DOC["today_steps"]] + \
+            [("future_steps", s) for s in DOC["future_steps"]]
+        assert parser.steps == {"today_steps": DOC["today_steps"], "future_steps": DOC["future_steps"]}
+        assert parser.text == TEXT
+
+
+def test_step_is_emitted_as_soon_as_it_closes():
+    parser = StepStreamParser()
+    first_end = TEXT.index('"maps_to": [1]}') + len('"maps_to": [1]}')
+    assert parser.feed(TEXT[:first_end - 1]) == []
+    assert parser.feed(TEXT[first_end - 1]) == [("today_steps", DOC["today_steps"][0])]
+
+
+def test_truncated_stream_keeps_completed_steps_only():
+    parser = StepStreamParser()
+    parser.feed(TEXT[:TEXT.index("Check")])
+    assert parser.steps["today_steps"] == DOC["today_steps"][:1]
+    assert parser.steps["future_steps"] == []
+    assert parser.feed("") == []
+
+
+def test_array_items_mode_skips_non_object_items():
+    parser = StepStreamParser(watch=("t",), item="[")
+    text = '{"t": [[1, "a [b]", [1]], [2, "c", [2]]], "f": [[9, "x", [1]]]}'
+    events = feed_in_chunks(parser, text, 5)
+    # the base parser only reports dicts; wire_format overrides _emit to decode rows
+    assert events == [] and parser.steps == {"t": []}
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from json_utils import extract_json_object, parse_json_safely, repair_truncated_json
+
+DOC = {
+    "summary": "s {x} \"y\"",
+    "today_steps": [{"id": i, "label": f"Step {i}", "maps_to": [i]} for i in range(1, 4)],
+    "future_steps": [{"id": 1, "label": "Auto", "maps_to": [1, 2]}],
+}
+TEXT = json.dumps(DOC)
+DEFAULTS = {"summary": "", "today_steps": [], "future_steps": []}
+
+
+def test_extract_first_object_ignores_braces_in_strings():
+    assert extract_json_object('pre {"a": "}{", "b": {"c": 1}} post {"d": 2}') == '{"a": "}{", "b": {"c": 1}}'
+    assert extract_json_object("no json here") is None
+    assert extract_json_object('{"open": ') is None
+    assert extract_json_object("") is None
+
+
+def test_parse_json_safely_accepts_fenced_output():
+    assert parse_json_safely(f"```json\n{TEXT}\n```") == DOC
+    assert parse_json_safely(f"  {TEXT}  ") == DOC
+    with pytest.raises(json.JSONDecodeError):
+        parse_json_safely("nothing")
+
+
+def test_repair_complete_text_is_identity():
+    assert repair_truncated_json(TEXT, DEFAULTS) == DOC
+
+
+@pytest.mark.parametrize("cut", range(1, len(TEXT)))
+def test_repair_every_prefix_yields_only_complete_steps(cut):
+    data = repair_truncated_json(TEXT[:cut], DEFAULTS)
+    assert data is not None
+    assert set(DEFAULTS) <= set(data)
+    for key in ("today_steps", "future_steps"):
+        for step in data[key]:
+            assert step in DOC[key]  # never a half-written step
+    assert data["summary"] in ("", DOC["summary"])
+
+
+def test_repair_defaults_are_fresh_copies():
+    defaults = {"today_steps": []}
+    data = repair_truncated_json('{"summary": "x"', defaults)
+    data["today_steps"].append(1)
+    assert defaults == {"today_steps": []}
+
+
+def test_repair_gives_up_without_an_object():
+    assert repair_truncated_json("no object") is None
+    assert repair_truncated_json("") is None
@@ -0,0 +1,62 @@
+import pytest
+
+from library_index import LibraryIndex, tokenize
+
+DOMAINS = {
+    "Finance": {
+        "Procure-to-Pay": {
+            "goal": "Pay suppliers on time",
+            "sub_processes": {
+                "Invoice Processing": {"goal": "Accurate invoices", "default_steps": ["Receive invoice", "Approve"]},
+                "Supplier Onboarding": {"default_steps": ["Collect bank details"]},
+            },
+        },
+        "Record-to-Report": {"goal": "Close the books", "sub_processes": {}},
+    },
+    "HR": {
+        "Hire-to-Retire": {
+            "sub_processes": {"Payroll": {"goal": "Pay staff", "default_steps": ["Run payroll", "Check invoice"]}},
+        },
+    },
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return LibraryIndex(DOMAINS)
+
+
+def test_tokenize():
+    assert tokenize("Procure-to-Pay (P2P)") == ["procure", "to", "pay", "p2p"]
+    assert tokenize(None) == []
+
+
+def test_lookup_and_first_sub_process_fallback(index):
+    assert len(index) == 3
+    entry = index.get("Finance", "Procure-to-Pay", "Supplier Onboarding")
+    assert entry.workflow_goal == "Pay suppliers on time" and entry.sub_process_goal == ""
+    assert index.get("Finance", "Procure-to-Pay", "Unknown").sub_process == "Invoice Processing"
+    assert index.get("Finance", "Procure-to-Pay").sub_process == "Invoice Processing"
+    assert index.get("Finance", "Record-to-Report") is None
+    assert index.default_steps("HR", "Hire-to-Retire") == ["Run payroll", "Check invoice"]
+    assert index.default_steps("Nope", "Nope") == []
+
+
+def test_search_ranks_by_field_weight(index):
+    # sub-process name hit (4) beats a step-label hit (1)
+    assert [e.sub_process for e in index.search("invoice")] == ["Invoice Processing", "Payroll"]
+
+
+def test_search_ands_tokens_and_prefixes_the_last(index):
+    assert [e.sub_process for e in index.search("pay onb")] == ["Supplier Onboarding"]
+    assert [e.sub_process for e in index.search("invoice pay")] == ["Invoice Processing", "Payroll"]
+    assert index.search("onb pay") == []  # only the last token is a prefix
+    assert index.search("payroll zz") == []
+    assert index.search("  ") == []
+    assert len(index.search("p", limit=10)) == 0  # below MIN_PREFIX: exact match only
+    assert len(index.search("pa", limit=1)) == 1
+
+
+def test_repeated_query_tokens_do_not_change_the_result(index):
+    assert index.search("invoice invoice") == index.search("invoice")
+    assert index.search("inv inv") == index.search("inv")
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+
+import pytest
+
+import process_library_source as src
+from library_index import LibraryIndex
+from library_pack import LazyDomains, LibraryPack, build_pack
+
+QUERIES = ["invoice", "pay", "recruit int", "hire hire", "p", "zz", "close the bo", "onboarding"]
+
+
+@pytest.fixture(scope="module")
+def pack(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("pack") / "library.sqlite3")
+    return LibraryPack(path)  # missing file: built from source on first query
+
+
+@pytest.fixture(scope="module")
+def index():
+    return LibraryIndex(src.DOMAINS)
+
+
+def test_nothing_is_read_until_first_access(tmp_path):
+    path = tmp_path / "library.sqlite3"
+    domains = LazyDomains(LibraryPack(str(path)))
+    assert not path.exists()
+    assert list(domains) == list(src.DOMAINS)
+    assert path.exists()
+
+
+def test_lazy_domains_match_the_source(pack):
+    domains = LazyDomains(pack)
+    for domain, workflows in src.DOMAINS.items():
+        assert domain in domains and list(domains[domain]) == list(workflows)
+        for workflow, wf in workflows.items():
+            lazy = domains[domain][workflow]
+            assert lazy["goal"] == wf.get("goal", "")
+            assert list(lazy["sub_processes"]) == list(wf.get("sub_processes") or {})
+            for name, sp in (wf.get("sub_processes") or {}).items():
+                assert lazy["sub_processes"][name]["default_steps"] == sp.get("default_steps", [])
+                assert lazy["sub_processes"][name].get("goal", "") == sp.get("goal", "")
+    with pytest.raises(KeyError):
+        domains["No such domain"]
+    assert pack.tool_library() == src.TOOL_LIBRARY
+
+
+def test_pack_answers_like_the_in_memory_index(pack, index):
+    assert len(pack) == len(index)
+    for (domain, workflow, sub_process), entry in index.lookup.items():
+        assert pack.get(domain, workflow, sub_process) == entry
+        assert pack.get(domain, workflow) == index.get(domain, workflow)
+        assert pack.default_steps(domain, workflow, "unknown") == index.default_steps(domain, workflow, "unknown")
+    for query in QUERIES:
+        assert pack.search(query, limit=5) == index.search(query, limit=5), query
+
+
+def test_stale_pack_is_rebuilt(tmp_path):
+    path = str(tmp_path / "library.sqlite3")
+    build_pack({"Old": {"Flow": {"sub_processes": {"Sp": {"default_steps": ["a"]}}}}}, {}, path, sha="stale")
+    assert LibraryPack(path).domain_names() == list(src.DOMAINS)
+    conn = sqlite3.connect(path)
+    assert dict(conn.execute("SELECT key, value FROM meta"))["source_sha"] != "stale"
+    conn.close()
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
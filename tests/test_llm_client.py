@@ -0,0 +1,126 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import APIConnectionError, RateLimitError
+
+import llm_client
+import rate_limiter
+from helpers import FakeClient
+from llm_client import call_async_with_retry, call_openai_streaming, call_openai_with_retry, try_repair_json
+from token_budget import max_tokens_for, repair_max_tokens
+
+MESSAGES = [{"role": "user", "content": "x" * 400}]
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _rate_limited() -> RateLimitError:
+    return RateLimitError("rate limited", response=httpx.Response(429, request=REQUEST), body=None)
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    """Net tokens held by the shared limiter: reservations minus refunds."""
+    limiter = rate_limiter._LIMITER
+    held = {"tokens": 0}
+    acquire, refund = limiter.acquire, limiter.refund
+
+    def tracked_acquire(tokens):
+        held["tokens"] += tokens
+        acquire(tokens)
+
+    def tracked_refund(tokens):
+        held["tokens"] -= max(tokens, 0)
+        refund(tokens)
+
+    async def tracked_acquire_async(tokens):
+        held["tokens"] += tokens
+
+    monkeypatch.setattr(limiter, "acquire", tracked_acquire)
+    monkeypatch.setattr(limiter, "refund", tracked_refund)
+    monkeypatch.setattr(limiter, "acquire_async", tracked_acquire_async)
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt, retry_after=None: 0.0)
+    return held
+
+
+def test_failed_attempts_are_refunded(ledger):
+    client = FakeClient(_rate_limited(), _rate_limited(), {"ok": True})
+    resp = call_openai_with_retry(client, MESSAGES, max_tokens=500)
+    assert resp.choices[0].message.content == '{"ok": true}'
+    assert len(client.calls) == 3
+    assert ledger["tokens"] == 600  # only the successful attempt (no usage reported to reconcile)
+
+
+def test_exhausted_retries_leave_nothing_reserved(ledger):
+    client = FakeClient(APIConnectionError(request=REQUEST))
+    with pytest.raises(APIConnectionError):
+        call_openai_with_retry(client, MESSAGES, max_retries=3, max_tokens=500)
+    assert ledger["tokens"] == 0
+
+
+def test_async_failed_attempts_are_refunded(ledger):
+    client = FakeClient(_rate_limited(), {"ok": True})
+
+    async def create(**kwargs):
+        return FakeClient.create(client, **kwargs)
+
+    client.chat.completions.create = create
+    resp, attempts = asyncio.run(call_async_with_retry(client, MESSAGES, max_tokens=500))
+    assert attempts == 2 and ledger["tokens"] == 600
+
+
+def test_stream_retries_before_first_token_and_reports_deltas(ledger):
+    client = FakeClient(_rate_limited(), '{"a": "' + "y" * 200 + '"}')
+    seen = []
+    text = call_openai_streaming(client, MESSAGES, seen.append, max_tokens=500)
+    assert "".join(seen) == text and text.startswith('{"a"')
+    assert ledger["tokens"] == 600
+
+
+def test_abandoned_stream_is_closed_and_refunded(ledger):
+    client = FakeClient('{"a": "' + "y" * 400 + '"}')
+
+    def stop(delta):
+        raise RuntimeError("superseded")
+
+    with pytest.raises(RuntimeError):
+        call_openai_streaming(client, MESSAGES, stop, max_tokens=500)
+    assert client.streams[0].closed
+    assert ledger["tokens"] == 100 + 40 // 4  # prompt estimate + the one delta that arrived
+
+
+def test_repair_uses_a_larger_budget():
+    client = FakeClient({"ok": True})
+    try_repair_json(client, '{"today_steps": [', n_steps=10)
+    assert client.calls[0]["max_tokens"] == repair_max_tokens(10) > max_tokens_for(10)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records llm_client's retry sleeps (real backoff math) without sleeping or pausing the limiter."""
+    recorded = {"sleeps": [], "pauses": []}
+    monkeypatch.setattr(llm_client, "time", SimpleNamespace(sleep=recorded["sleeps"].append,
+                                                            perf_counter=time.perf_counter))
+    monkeypatch.setattr(rate_limiter._LIMITER, "pause", recorded["pauses"].append)
+    return recorded
+
+
+def test_retry_after_is_honoured_with_jitter(sleeps):
+    response = httpx.Response(429, request=REQUEST, headers={"retry-after-ms": "2000"})
+    limited = RateLimitError("rate limited", response=response, body=None)
+    call_openai_with_retry(FakeClient(limited, {"ok": True}), MESSAGES, max_tokens=500)
+    assert sleeps["pauses"] == [2.0]
+    assert len(sleeps["sleeps"]) == 1 and 2.0 <= sleeps["sleeps"][0] <= 2.5
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_no_backoff_after_the_last_attempt(sleeps, stream):
+    client = FakeClient(APIConnectionError(request=REQUEST))
+    with pytest.raises(APIConnectionError):
+        if stream:
+            call_openai_streaming(client, MESSAGES, lambda d: None, max_retries=3, max_tokens=500)
+        else:
+            call_openai_with_retry(client, MESSAGES, max_retries=3, max_tokens=500)
+    assert len(client.calls) == 3 and len(sleeps["sleeps"]) == 2
@@ -0,0 +1,45 @@
+import pytest
+
+from helpers import STEPS, make_fields
+from local_optimizer import MAX_STEPS, MIN_STEPS, build_future_steps, build_today_steps, optimize_locally
+from process_library import TIME_HORIZONS, TOOL_LIBRARY
+from schema_validator import ResultValidator
+
+VALIDATOR = ResultValidator(TOOL_LIBRARY)
+AUTOMATABLE = [
+    "Receive invoice", "Key data entry", "Match PO", "Post to ledger", "Upload receipt", "Schedule payment",
+    "Update vendor record", "Capture form", "Search policy", "Draft report", "Monitor queue", "Track request",
+]
+
+
+def _covered(data: dict) -> bool:
+    mapped = {m for f in data["future_steps"] for m in f["maps_to"]}
+    return mapped == {t["id"] for t in data["today_steps"]}
+
+
+@pytest.mark.parametrize("n", range(4, 19))
+@pytest.mark.parametrize("horizon", TIME_HORIZONS)
+def test_result_meets_the_contract(n, horizon):
+    steps = [f"{(STEPS + AUTOMATABLE)[i % 19]} {i}" for i in range(n)]
+    data = optimize_locally(make_fields(steps, time_horizon=horizon))
+    assert VALIDATOR.validate(data) == {}
+    assert _covered(data)
+
+
+def test_short_flows_are_padded_and_say_so():
+    data = optimize_locally(make_fields(STEPS[:4]))
+    assert len(data["today_steps"]) == MIN_STEPS
+    assert [t["label"] for t in data["today_steps"][:4]] == [t["label"] for t in build_today_steps(STEPS[:4])][:4]
+    assert "generic closing steps" in data["notes"][0]
+
+
+def test_full_flow_without_control_keeps_last_steps_mapped():
+    today = build_today_steps([f"Relationship meeting with customer {i}" for i in range(MAX_STEPS)])
+    future = build_future_steps(today, horizon=0, maturity=1)
+    assert len(future) == MAX_STEPS
+    assert any(f["intent"] == "Control" for f in future)
+    assert {m for f in future for m in f["maps_to"]} == {t["id"] for t in today}
+
+
+def test_deterministic():
+    assert optimize_locally(make_fields()) == optimize_locally(make_fields())
@@ -0,0 +1,87 @@
+import io
+import json
+
+import pytest
+
+import metrics
+from metrics import Registry, configure_logging, span, write_metrics_file
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = Registry(buckets=(0.1, 1))
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    return registry
+
+
+def test_counters_render_per_label_set(registry):
+    registry.inc("workflow_requests_total", outcome="llm")
+    registry.inc("workflow_requests_total", 2, outcome="llm")
+    registry.inc("workflow_requests_total", outcome="local")
+    text = registry.render_prometheus()
+    assert "# TYPE workflow_requests_total counter" in text
+    assert 'workflow_requests_total{outcome="llm"} 3' in text
+    assert 'workflow_requests_total{outcome="local"} 1' in text
+    assert registry.snapshot()["counters"]["workflow_requests_total"] == {"outcome=llm": 3, "outcome=local": 1}
+
+
+def test_histogram_buckets_are_cumulative_and_le_inclusive(registry):
+    for value in (0.05, 0.1, 0.5, 3):
+        registry.observe("workflow_stage_seconds", value, stage="parse")
+    lines = registry.render_prometheus().splitlines()
+    assert 'workflow_stage_seconds_bucket{stage="parse",le="0.1"} 2' in lines
+    assert 'workflow_stage_seconds_bucket{stage="parse",le="1"} 3' in lines
+    assert 'workflow_stage_seconds_bucket{stage="parse",le="+Inf"} 4' in lines
+    assert 'workflow_stage_seconds_count{stage="parse"} 4' in lines
+    assert 'workflow_stage_seconds_sum{stage="parse"} 3.650000' in lines
+    assert registry.snapshot()["histograms"]["workflow_stage_seconds"]["stage=parse"] == {"count": 4, "sum": 3.65}
+
+
+def test_label_values_are_escaped(registry):
+    registry.inc("x_total", type='a"b\\c\nd')
+    assert 'x_total{type="a\\"b\\\\c\\nd"} 1' in registry.render_prometheus()
+
+
+def test_span_times_ok_and_counts_errors(registry):
+    with span("parse", mode="sync"):
+        pass
+    with pytest.raises(ValueError):
+        with span("parse", mode="sync"):
+            raise ValueError("bad")
+    snap = registry.snapshot()
+    assert snap["counters"]["workflow_errors_total"] == {"stage=parse,type=ValueError": 1}
+    assert set(snap["histograms"]["workflow_stage_seconds"]) == {
+        "mode=sync,outcome=ok,stage=parse", "mode=sync,outcome=error,stage=parse",
+    }
+
+
+def test_metrics_file_is_replaced_atomically(registry, tmp_path):
+    registry.inc("workflow_requests_total", outcome="llm")
+    path = tmp_path / "sub" / "metrics.prom"
+    write_metrics_file(str(path))
+    assert 'workflow_requests_total{outcome="llm"} 1' in path.read_text(encoding="utf-8")
+    assert [p.name for p in path.parent.iterdir()] == ["metrics.prom"]
+
+
+def test_span_is_logged_as_a_json_line(registry, monkeypatch):
+    monkeypatch.delenv("WORKFLOW_LOG_LEVEL", raising=False)
+    out = io.StringIO()
+    configure_logging(stream=out)
+    configure_logging(stream=out)  # a second call (Streamlit rerun) must not add a handler
+    with span("parse", mode="normal"):
+        pass
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 1
+    line = json.loads(lines[0])
+    assert line["event"] == "span" and line["stage"] == "parse"
+    assert line["outcome"] == "ok" and line["mode"] == "normal"
+    assert line["logger"] == "workflow_optimizer.metrics" and line["level"] == "INFO"
+
+
+def test_warning_level_drops_span_lines(registry, monkeypatch):
+    monkeypatch.setenv("WORKFLOW_LOG_LEVEL", "warning")
+    out = io.StringIO()
+    configure_logging(stream=out)
+    with span("parse"):
+        pass
+    assert out.getvalue() == ""
@@ -0,0 +1,78 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import InternalServerError
+
+from helpers import FakeStream
+from local_optimizer import optimize_locally
+from pipeline import ENRICHMENT_GROUPS, STEP_PHASE, enrich, generate_pipelined, generate_steps
+from prompt_builder import RESULT_DEFAULTS
+
+pytestmark = pytest.mark.usefixtures("no_backoff")
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+class SectionClient:
+    """Answers each request with the sections it asks for, taken from `full`."""
+
+    def __init__(self, full: dict, fail=(), truncate_steps: bool = False):
+        self.full, self.fail, self.truncate_steps = full, set(fail), truncate_steps
+        self.requested: list[tuple[str, ...]] = []
+        self.barrier = threading.Barrier(len(ENRICHMENT_GROUPS), timeout=5)
+        self.concurrent = True
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        keys = tuple(kwargs["messages"][-1]["content"].rsplit("exactly these keys: ", 1)[1].split(", "))
+        retry = keys in self.requested
+        self.requested.append(keys)
+        text = json.dumps({k: self.full[k] for k in keys})
+        if keys != tuple(STEP_PHASE):
+            if not retry:
+                try:
+                    self.barrier.wait()  # every enrichment branch must be in flight at once
+                except threading.BrokenBarrierError:
+                    self.concurrent = False
+            if self.fail & set(keys):
+                raise InternalServerError("down", response=httpx.Response(500, request=REQUEST), body=None)
+        elif self.truncate_steps:
+            text = text[:text.index('"future_steps"') + 200]
+        if kwargs.get("stream"):
+            return FakeStream(text)
+        message = SimpleNamespace(content=text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+
+@pytest.fixture
+def full(fields):
+    return optimize_locally(fields)
+
+
+def test_steps_stream_first_then_enrichment_in_parallel(fields, full):
+    client = SectionClient(full)
+    deltas = []
+    result = generate_pipelined(client, fields, deltas.append)
+    assert result == {k: full[k] for k in RESULT_DEFAULTS}
+    assert client.requested[0] == tuple(STEP_PHASE)
+    assert sorted(client.requested[1:]) == sorted(ENRICHMENT_GROUPS)
+    assert client.concurrent
+    assert json.loads("".join(deltas)) == {k: full[k] for k in STEP_PHASE}
+
+
+def test_failed_branch_leaves_only_its_sections_empty(fields, full):
+    client = SectionClient(full, fail={"glossary"})
+    result = enrich(client, fields, {k: full[k] for k in STEP_PHASE})
+    assert result["glossary"] == [] and client.requested.count(("glossary",)) == 2  # retried once
+    assert result["tool_suggestions"] == full["tool_suggestions"] and result["deltas"] == full["deltas"]
+
+
+def test_truncated_step_phase_is_repaired_locally(fields, full):
+    client = SectionClient(full, truncate_steps=True)
+    data = generate_steps(client, fields)
+    assert len(client.requested) == 1
+    assert data["today_steps"] == full["today_steps"]
+    assert all(step in full["future_steps"] for step in data["future_steps"])
@@ -0,0 +1,38 @@
+import asyncio
+import os
+
+import pytest
+
+import llm_client
+from llm_client import call_openai_with_retry, connection_stats, get_async_client, get_client
+from helpers import make_fields
+from prompt_builder import build_messages
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(llm_client, "_CLIENTS", {})
+
+
+def test_one_sync_client_per_key():
+    a = get_client("sk-a")
+    assert get_client("sk-a") is a
+    assert get_client("sk-b") is not a
+    assert a.max_retries == 0  # retries are ours, behind the shared limiter
+
+
+def test_async_client_is_replaced_once_closed():
+    a = get_async_client("sk-a")
+    assert get_async_client("sk-a") is a
+    asyncio.run(a.close())
+    assert get_async_client("sk-a") is not a
+
+
+def test_repeated_calls_reuse_one_connection(fake_openai):
+    client = get_client(os.environ["OPENAI_API_KEY"])
+    before = connection_stats()
+    for _ in range(3):
+        call_openai_with_retry(client, build_messages(make_fields()), n_steps=7)
+    after = connection_stats()
+    assert after["requests"] - before["requests"] == 3
+    assert after["new_connections"] - before["new_connections"] == 1
@@ -0,0 +1,55 @@
+import hashlib
+from types import SimpleNamespace
+
+import llm_client
+from helpers import make_fields
+from prompt_builder import (
+    SCHEMA_BLOCK, STATIC_PREFIX_SHA, STATIC_SYSTEM_PROMPT, TOOL_LIBRARY_BLOCK,
+    build_messages, build_section_messages, request_fields,
+)
+
+
+def test_static_prefix_is_identical_for_every_request():
+    a = build_messages(make_fields())
+    b = build_messages(make_fields(notes="different", steps=["x", "y"]))
+    assert a[0] == b[0] == {"role": "system", "content": STATIC_SYSTEM_PROMPT}
+    assert a[1]["role"] == "user" and a[1]["content"] != b[1]["content"]
+    assert STATIC_PREFIX_SHA == hashlib.sha256(STATIC_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+
+def test_request_specific_context_stays_out_of_the_prefix():
+    fields = make_fields(notes="ZZ-unique-note")
+    system, user = build_messages(fields)
+    assert "ZZ-unique-note" not in system["content"]
+    assert "ZZ-unique-note" in user["content"]
+    assert all(step in user["content"] for step in fields["steps"])
+
+
+def test_request_fields_are_canonical():
+    a = request_fields("d", "w", "s", "h", "i", "m", ["b", "a"], "  n  ", ["1", "2"])
+    b = request_fields("d", "w", "s", "h", "i", "m", ["a", "b"], "n", ["1", "2"])
+    assert a == b and a["constraints"] == ["a", "b"]
+
+
+def test_section_messages_ask_only_for_missing_sections():
+    data = {"summary_ignored": 1, "today_steps": [{"id": "T1"}], "notes": ["n"]}
+    system, user = build_section_messages(make_fields(), data, ["glossary"])
+    assert "glossary (array" in system["content"]
+    assert "today_steps (array" not in system["content"] and TOOL_LIBRARY_BLOCK not in system["content"]
+    assert '"today_steps":[{"id":"T1"}]' in user["content"] and "summary_ignored" not in user["content"]
+    assert user["content"].endswith("exactly these keys: glossary")
+    system, _ = build_section_messages(make_fields(), data, ["tool_suggestions"])
+    assert TOOL_LIBRARY_BLOCK in system["content"] and SCHEMA_BLOCK not in system["content"]
+
+
+def test_usage_accounting_reports_cached_prompt_share(monkeypatch):
+    monkeypatch.setattr(llm_client, "_USAGE_TOTALS", dict.fromkeys(llm_client._USAGE_TOTALS, 0))
+    assert llm_client.record_usage(None) is None
+    usage = SimpleNamespace(
+        prompt_tokens=1000, completion_tokens=200, prompt_tokens_details=SimpleNamespace(cached_tokens=768),
+    )
+    assert llm_client.record_usage(usage) == {"prompt_tokens": 1000, "cached_tokens": 768, "completion_tokens": 200}
+    llm_client.record_usage(SimpleNamespace(prompt_tokens=1000, completion_tokens=100, prompt_tokens_details=None))
+    totals = llm_client.usage_totals()
+    assert totals["requests"] == 2 and totals["completion_tokens"] == 300
+    assert totals["cached_prompt_ratio"] == 0.384
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+import rate_limiter
+from rate_limiter import RateLimiter, backoff_delay, estimate_tokens, retry_after_seconds
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    return RateLimiter(rpm=60, tpm=1000, state_path=str(tmp_path / "ratelimit.json"))
+
+
+def _rate_limit_error(headers: dict) -> RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return RateLimitError("rate limited", response=httpx.Response(429, headers=headers, request=request), body=None)
+
+
+def test_tokens_are_reserved_and_refunded(limiter):
+    assert limiter.try_acquire(800) == 0
+    assert limiter.try_acquire(800) > 0
+    limiter.refund(700)
+    assert limiter.try_acquire(800) == 0
+
+
+def test_state_is_shared_through_the_file(limiter, tmp_path):
+    other = RateLimiter(rpm=60, tpm=1000, state_path=limiter.state_path)
+    assert limiter.try_acquire(900) == 0
+    assert other.try_acquire(900) > 0
+
+
+def test_pause_blocks_every_caller(limiter):
+    limiter.pause(30)
+    assert limiter.try_acquire(1) >= 29
+
+
+def test_concurrent_acquires_never_overdraw(limiter):
+    granted = []
+
+    def worker():
+        granted.append(limiter.try_acquire(100) == 0)
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(granted) == 10
+
+
+def test_acquire_async_does_not_block_the_loop(limiter, monkeypatch):
+    loop_threads = set()
+    original = limiter.try_acquire
+
+    def try_acquire(tokens):
+        loop_threads.add(threading.current_thread())
+        return original(tokens)
+
+    monkeypatch.setattr(limiter, "try_acquire", try_acquire)
+
+    async def main():
+        await limiter.acquire_async(10)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(main())
+    assert loop_threads and loop_thread not in loop_threads
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds(_rate_limit_error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(_rate_limit_error({"retry-after": "3"})) == 3.0
+    assert retry_after_seconds(_rate_limit_error({})) is None
+
+
+def test_backoff_and_estimate():
+    assert 2.0 <= backoff_delay(0, retry_after=2.0) <= 2.5
+    assert 0 <= backoff_delay(10) <= 30
+    assert estimate_tokens([{"content": "x" * 400}], 100) == 200
+    # waiters released by a shared pause spread over a quarter of it
+    assert all(0 <= rate_limiter._wake_jitter(8.0) <= 2.0 for _ in range(100))
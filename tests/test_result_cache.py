@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from helpers import make_fields
+from prompt_builder import PROMPT_VERSION
+from result_cache import ResultCache, make_cache_key
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "results.sqlite3")
+
+
+def test_key_is_canonical_over_inputs_and_prompt_version():
+    fields = make_fields()
+    reordered = dict(reversed(list(fields.items())))
+    assert make_cache_key(fields, PROMPT_VERSION) == make_cache_key(reordered, PROMPT_VERSION)
+    assert make_cache_key(fields, PROMPT_VERSION) != make_cache_key(fields, PROMPT_VERSION + "x")
+    assert make_cache_key(fields, PROMPT_VERSION) != make_cache_key(make_fields(notes="other"), PROMPT_VERSION)
+    assert make_cache_key(fields, PROMPT_VERSION) != make_cache_key(make_fields(steps=["a", "b"]), PROMPT_VERSION)
+
+
+def test_roundtrip_and_shared_disk_level(path):
+    ResultCache(path).set("k", {"a": [1, "ü"]})
+    other = ResultCache(path)  # another session / process: empty memory level
+    assert other.get("k") == {"a": [1, "ü"]}
+    assert other.get("missing") is None
+    assert (other.hits, other.misses) == (1, 1)
+
+
+def test_ttl_expires_both_levels(path, monkeypatch):
+    cache = ResultCache(path, ttl_seconds=10)
+    cache.set("k", {"v": 1})
+    later = time.time() + 11
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("k") is None
+    assert ResultCache(path, ttl_seconds=10).get("k") is None
+
+
+def test_memory_level_is_lru_bounded(path):
+    cache = ResultCache(path, max_memory_entries=2)
+    for k in "abc":
+        cache.set(k, {"k": k})
+    assert list(cache._mem) == ["b", "c"]
+    assert cache.get("a") == {"k": "a"}  # still on disk
+    assert list(cache._mem) == ["c", "a"]
+
+
+def test_disk_level_evicts_least_recently_used(path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = ResultCache(path, max_memory_entries=0, max_disk_entries=2)
+    for k in "ab":
+        now[0] += 1
+        cache.set(k, {"k": k})
+    now[0] += 1
+    cache.get("a")  # a is now more recent than b
+    now[0] += 1
+    cache.set("c", {"k": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_clear_drops_both_levels(path):
+    cache = ResultCache(path)
+    cache.set("k", {"v": 1})
+    cache.clear()
+    assert cache.get("k") is None
+    assert ResultCache(path).get("k") is None
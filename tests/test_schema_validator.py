@@ -0,0 +1,91 @@
+import copy
+
+import pytest
+
+from local_optimizer import optimize_locally
+from process_library import TOOL_LIBRARY
+from schema_validator import ResultValidator, enforce_contract, sections_to_regenerate
+
+VALIDATOR = ResultValidator(TOOL_LIBRARY)
+
+
+@pytest.fixture
+def valid(fields):
+    return optimize_locally(fields)
+
+
+def test_local_result_is_valid(valid):
+    assert VALIDATOR.validate(valid) == {}
+
+
+def test_non_object_result():
+    assert VALIDATOR.validate([1, 2]) == {"$": ["result must be a JSON object"]}
+
+
+@pytest.mark.parametrize("section, index, key, value", [
+    ("today_steps", 0, "actor", ["AI", "HUMAN"]),
+    ("today_steps", 1, "id", ["T2"]),
+    ("future_steps", 0, "maps_to", [{"id": "T1"}]),
+    ("future_steps", 1, "actor", {"name": "AI"}),
+    ("future_steps", 2, "intent", ["Admin"]),
+    ("tool_suggestions", 0, "tool_category", ["Automation"]),
+])
+def test_non_scalar_values_are_violations(valid, section, index, key, value):
+    data = copy.deepcopy(valid)
+    data[section][index][key] = value
+    assert section in VALIDATOR.validate(data)
+
+
+def test_non_scalar_values_are_regenerated(fields, valid):
+    data = copy.deepcopy(valid)
+    data["today_steps"][0]["actor"] = ["AI", "HUMAN"]
+    data["future_steps"][0]["maps_to"] = [{"id": "T1"}]
+    data["tool_suggestions"][0]["tool_category"] = ["Automation"]
+    asked = []
+
+    def regenerate(current, sections):
+        asked.append(sections)
+        return {k: valid[k] for k in sections}
+
+    out, errors = enforce_contract(data, fields, VALIDATOR, regenerate)
+    assert asked == [["today_steps", "future_steps", "tool_suggestions"]]
+    assert errors == {}
+    assert out["today_steps"] == valid["today_steps"]
+
+
+def test_text_fields_and_dangling_maps_to_are_fixed_locally(fields, valid):
+    data = copy.deepcopy(valid)
+    data["functional_domain"] = ""
+    data["future_steps"][0]["maps_to"] = ["T1", "T99"]
+    data["future_steps"][1]["actor"] = "ai + human"
+
+    out, errors = enforce_contract(data, fields, VALIDATOR, regenerate=None)
+    assert errors == {}
+    assert out["functional_domain"] == fields["functional_domain"]
+    assert out["future_steps"][0]["maps_to"] == ["T1"]
+    assert out["future_steps"][1]["actor"] == "AI+HUMAN"
+
+
+def test_patch_kept_only_when_it_validates_better(fields, valid):
+    data = copy.deepcopy(valid)
+    data["notes"] = ["only one"]
+    out, errors = enforce_contract(data, fields, VALIDATOR, lambda d, s: {"notes": []})
+    assert out["notes"] == ["only one"]
+    assert "notes" in errors
+
+
+def test_regenerate_failure_keeps_result(fields, valid):
+    data = copy.deepcopy(valid)
+    data["deltas"] = []
+
+    def boom(d, s):
+        raise RuntimeError("provider down")
+
+    out, errors = enforce_contract(data, fields, VALIDATOR, boom)
+    assert out["deltas"] == [] and "deltas" in errors
+
+
+def test_bad_today_steps_pull_in_future_steps():
+    assert sections_to_regenerate({"today_steps": ["x"], "process_workflow": ["y"]}) == [
+        "today_steps", "future_steps",
+    ]
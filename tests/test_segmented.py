@@ -0,0 +1,67 @@
+import pytest
+
+from engine import Engine, GenerationResult
+from helpers import STEPS, make_fields
+from local_optimizer import optimize_locally
+from prompt_builder import PROMPT_VERSION
+from result_cache import ResultCache, make_cache_key
+from schema_validator import STEP_SECTIONS
+from segmented import (
+    MAX_SEGMENT_STEPS, MIN_SEGMENT_STEPS, generate_segmented, preview_segmented, segmented_cache_key,
+    split_segments, stitch,
+)
+
+LONG = [f"{STEPS[i % len(STEPS)]} ({i + 1})" for i in range(97)]
+
+
+def test_short_flow_is_one_segment():
+    assert split_segments(STEPS) == [STEPS]
+
+
+@pytest.mark.parametrize("n", [13, 18, 40, 97, 150])
+def test_segments_cover_the_flow_within_bounds(n):
+    steps = [f"Step {i}" for i in range(n)]
+    segments = split_segments(steps)
+    assert sum(segments, []) == steps
+    assert all(MIN_SEGMENT_STEPS <= len(s) <= MAX_SEGMENT_STEPS for s in segments)
+
+
+def test_stitch_renumbers_ids_and_maps_to():
+    seg = {
+        "today_steps": [{"id": "T1", "label": "a"}, {"id": "T2", "label": "b"}],
+        "future_steps": [{"id": "F1", "label": "x", "maps_to": ["T1", "T2", "T9"]}],
+        "notes": ["Same note", "Other"], "tool_suggestions": [{"tool_category": "RPA", "example_tools": ["A"]}],
+    }
+    second = dict(seg, notes=["same note "], tool_suggestions=[{"tool_category": "RPA", "example_tools": ["B"]}])
+    data = stitch(make_fields(), [seg, second])
+    assert [s["id"] for s in data["today_steps"]] == ["T1", "T2", "T3", "T4"]
+    assert [s["maps_to"] for s in data["future_steps"]] == [["T1", "T2"], ["T3", "T4"]]
+    assert data["notes"] == ["Same note", "Other"]
+    assert data["tool_suggestions"] == [{"tool_category": "RPA", "example_tools": ["A", "B"]}]
+
+
+def test_preview_maps_to_stays_consistent():
+    data = preview_segmented(make_fields(LONG))
+    assert len(data["today_steps"]) >= len(LONG) // MAX_SEGMENT_STEPS * MIN_SEGMENT_STEPS
+    today = {s["id"] for s in data["today_steps"]}
+    assert all(set(s["maps_to"]) <= today for s in data["future_steps"])
+
+
+def test_generate_segmented_without_key_degrades_locally():
+    result = generate_segmented(Engine(None), make_fields(LONG[:40]), use_cache=False)
+    assert result.source == "local"
+    assert all(result.data[k] for k in STEP_SECTIONS)
+
+
+def test_stitched_results_are_cached_apart_from_single_call_results(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "results.sqlite3"))
+    engine = Engine("sk-test", cache=cache)
+    monkeypatch.setattr(engine, "generate", lambda part, **kw: GenerationResult(optimize_locally(part), "llm"))
+    fields = make_fields(LONG[:16])  # also a valid normal-mode request
+    first = generate_segmented(engine, fields)
+    assert first.source == "llm"
+    assert cache.get(make_cache_key(fields, PROMPT_VERSION)) is None
+    assert engine.lookup(fields) is None  # normal mode never sees the stitched result
+    again = generate_segmented(engine, fields)
+    assert again.source == "cache" and again.data == first.data
+    assert cache.get(segmented_cache_key(fields)) == first.data
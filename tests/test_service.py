@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import pytest
+
+from engine import Engine
+from process_library import LIBRARY_INDEX
+from service import Service, validate_request
+
+ENTRY = LIBRARY_INDEX.search("invoice", 1)[0]
+BASE = {"functional_domain": ENTRY.domain, "process_workflow": ENTRY.workflow, "sub_process": ENTRY.sub_process}
+
+
+async def _exchange(raw: bytes) -> tuple[int, dict]:
+    """Send one raw request to an in-process service (no API key: local answers) and read the reply."""
+    service = Service(Engine(None))
+    server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        status = int(head.split()[1])
+        headers = dict(line.split(b": ", 1) for line in head.split(b"\r\n")[1:] if b": " in line)
+        length = int(headers[b"Content-Length"])
+        body = json.loads(await reader.readexactly(length))
+        writer.close()
+        return status, body
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def _post(payload: dict, length: str | None = None) -> tuple[int, dict]:
+    body = json.dumps(payload).encode()
+    head = (
+        f"POST /v1/optimize HTTP/1.1\r\nHost: x\r\nContent-Length: {length or len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return asyncio.run(_exchange(head.encode() + body))
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_bad_content_length_gets_400(length):
+    status, body = _post(BASE, length=length)
+    assert status == 400 and body["error"] == "invalid Content-Length"
+
+
+def test_optimize_answers_locally_without_key():
+    status, body = _post(BASE)
+    assert status == 200 and len(body["today_steps"]) >= 6
+
+
+def test_health():
+    status, body = asyncio.run(_exchange(b"GET /healthz HTTP/1.1\r\nConnection: close\r\n\r\n"))
+    assert status == 200 and body["status"] == "ok"
+
+
+def test_validation_errors():
+    status, body = _post({"functional_domain": "Nope"})
+    assert status == 400 and body["details"] == ["functional_domain: unknown domain"]
+
+
+@pytest.mark.parametrize("override, detail", [
+    ({"process_workflow": {}}, "process_workflow: must be a string"),
+    ({"sub_process": ["x"]}, "sub_process: must be a string"),
+    ({"functional_domain": 7}, "functional_domain: must be a string"),
+    ({"steps": [1, 2, 3, 4]}, "steps: must be a list of strings or one step per line"),
+    ({"steps": {"a": 1}}, "steps: must be a list of strings or one step per line"),
+    ({"notes": ["n"]}, "notes: must be a string"),
+])
+def test_malformed_types_get_400(override, detail):
+    status, body = _post(dict(BASE, **override))
+    assert status == 400 and detail in body["details"]
+
+
+def test_long_flows_are_segmented_only_on_request():
+    steps = [f"Handle case step {i}" for i in range(40)]
+    fields, errors = validate_request(dict(BASE, steps=steps))
+    assert not errors and len(fields["steps"]) == 18
+    fields, errors = validate_request(dict(BASE, steps=steps, segmented=True))
+    assert not errors and len(fields["steps"]) == 40
+    status, body = _post(dict(BASE, steps=steps[:15]))
+    assert status == 200 and len(body["today_steps"]) <= 12  # one request, not stitched segments
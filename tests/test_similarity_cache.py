@@ -0,0 +1,79 @@
+import pytest
+
+from helpers import STEPS, make_fields
+from prompt_builder import PROMPT_VERSION
+from result_cache import ResultCache, make_cache_key
+from similarity_cache import SimilarityCache, bench, features, jaccard, step_words
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "results.sqlite3"))
+
+
+def _store(cache, similar, fields, data=None):
+    key = make_cache_key(fields, PROMPT_VERSION)
+    cache.set(key, data or {"today_steps": fields["steps"]})
+    similar.add(fields, key)
+    return key
+
+
+def test_normalization_ignores_markers_case_and_punctuation():
+    assert step_words("  3) Approve the Invoice!") == ["approve", "invoice"]
+    assert step_words("- Step 2: Match to PO") == ["match", "po"]  # stacked markers
+    assert step_words("1. a) Check stock") == ["check", "stock"]
+    steps = [" ".join(reversed(STEPS[0].split()))] + STEPS[1:]
+    cosmetic = [f"{i + 1}. {s.upper()}." for i, s in enumerate(steps)]
+    assert features(make_fields(steps=cosmetic)) == features(make_fields())
+
+
+def test_step_order_still_counts():
+    swapped = [STEPS[1], STEPS[0]] + STEPS[2:]
+    score = jaccard(features(make_fields(steps=swapped)), features(make_fields()))
+    assert 0.6 <= score < 1
+
+
+def test_reuse_seed_and_miss(cache):
+    similar = SimilarityCache(cache, persist=False)
+    key = _store(cache, similar, make_fields())
+    reuse = similar.match(make_fields(steps=[s.lower() for s in STEPS]))
+    assert reuse.key == key and reuse.similarity == 1 and reuse.reusable
+    seed = similar.match(make_fields(steps=STEPS[:6] + ["Store documents"]))
+    assert seed is not None and not seed.reusable and seed.data == {"today_steps": STEPS}
+    assert similar.match(make_fields(steps=["Plan headcount", "Post job ad", "Interview", "Offer"])) is None
+
+
+def test_context_fields_must_match_exactly(cache):
+    similar = SimilarityCache(cache, persist=False)
+    _store(cache, similar, make_fields())
+    assert similar.match(make_fields(industry="Other")) is None
+    assert similar.match(make_fields(constraints=["SOX"])) is None
+
+
+def test_index_persists_next_to_the_results(cache):
+    key = _store(cache, SimilarityCache(cache), make_fields())
+    reopened = SimilarityCache(ResultCache(cache.path))
+    assert len(reopened) == 1 and reopened.match(make_fields()).key == key
+
+
+def test_entries_without_a_stored_result_are_dropped(cache):
+    similar = SimilarityCache(cache, persist=False)
+    similar.add(make_fields(), "gone")
+    assert similar.match(make_fields()) is None
+    assert len(similar) == 0
+
+
+def test_oldest_entries_are_evicted(cache):
+    similar = SimilarityCache(cache, max_entries=2)
+    keys = [_store(cache, similar, make_fields(notes=f"note {n}")) for n in range(3)]
+    assert len(similar) == 2 and similar.nearest(make_fields(notes="note 0"))[0] != keys[0]
+    assert len(SimilarityCache(cache, max_entries=2)) == 2
+
+
+def test_stats_and_bench():
+    result = bench(entries=50, probes=50)
+    assert result["entries"] > 0 and result["found"] >= 0.9 and result["right_entry"] >= 0.9
+    similar = SimilarityCache(ResultCache(":memory:"), persist=False)
+    for outcome in ("reused", "seeded", "miss", "miss"):
+        similar.record(outcome)
+    assert similar.stats()["hit_rate"] == 0.5
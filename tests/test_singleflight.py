@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from engine import Engine
+from helpers import FakeClient
+from local_optimizer import optimize_locally
+from singleflight import SingleFlight
+
+pytestmark = pytest.mark.usefixtures("no_backoff")
+
+
+def test_first_caller_leads_and_later_callers_follow():
+    sf = SingleFlight()
+    leader, is_leader = sf.join("k")
+    follower, is_follower_leader = sf.join("k")
+    assert is_leader and not is_follower_leader and follower is leader
+    assert sf.stats == {"leaders": 1, "followers": 1} and sf.in_flight() == 1
+    sf.finish(leader, result={"ok": 1})
+    assert follower.result(timeout=1) == {"ok": 1}
+    assert sf.in_flight() == 0
+    assert sf.join("k")[1]  # the retired key starts a fresh flight
+
+
+def test_followers_get_the_leaders_exception():
+    sf = SingleFlight()
+    flight, _ = sf.join("k")
+    sf.join("k")
+    sf.finish(flight, error=ValueError("boom"))
+    with pytest.raises(ValueError, match="boom"):
+        flight.result(timeout=1)
+
+
+def test_concurrent_joins_elect_exactly_one_leader():
+    sf = SingleFlight()
+    barrier = threading.Barrier(16)
+    roles = []
+
+    def worker():
+        barrier.wait()
+        roles.append(sf.join("k")[1])
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert roles.count(True) == 1 and sf.stats["followers"] == 15
+
+
+def test_identical_engine_requests_share_one_llm_call(fields):
+    gate = threading.Event()
+    client = FakeClient(optimize_locally(fields), gate=gate)
+    engine = Engine("sk-test")
+    engine._client = client
+    results, follower_steps = {}, {}
+
+    def run(name, **kwargs):
+        results[name] = engine.generate(fields, stream=True, use_cache=False, **kwargs)
+
+    leader = threading.Thread(target=run, args=("leader",))
+    leader.start()
+    assert client.started.wait(5)
+    follower = threading.Thread(target=run, args=("follower",),
+                                kwargs={"on_steps": lambda k, s: follower_steps.update({k: len(s)})})
+    follower.start()
+    deadline = time.monotonic() + 5
+    while engine.inflight.stats["followers"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    leader.join(5)
+    follower.join(5)
+    assert len(client.calls) == 1
+    assert results["leader"].source == "llm" and results["follower"].source == "coalesced"
+    assert results["follower"].data == results["leader"].data
+    assert follower_steps.get("today_steps")  # followers see the leader's streamed steps
+    assert engine.inflight.in_flight() == 0
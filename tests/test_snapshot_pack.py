@@ -0,0 +1,75 @@
+import json
+
+from prompt_builder import PROMPT_VERSION
+from result_cache import make_cache_key
+from snapshot_pack import MAGIC, SnapshotPack, main, results_from_jsonl, template_grid, write_snapshot
+
+RESULTS = {"k1": {"notes": ["ü"]}, "k2": {"today_steps": [{"id": "T1"}] * 20}}
+
+
+def test_roundtrip_inflates_entries_on_demand(tmp_path):
+    path = write_snapshot(RESULTS, str(tmp_path / "s.wfsnap"), prompt_version="v9")
+    pack = SnapshotPack.load(path)
+    assert len(pack) == 2 and "k1" in pack and set(pack.keys()) == set(RESULTS)
+    assert pack.meta["prompt_version"] == "v9" and pack.meta["format"] == 1
+    assert pack.get("k2") == RESULTS["k2"] and pack.get("k1") == RESULTS["k1"]
+    assert pack.get("missing") is None
+    assert pack.hits == 2
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_missing_or_corrupt_file_loads_empty(tmp_path):
+    assert len(SnapshotPack.load(str(tmp_path / "nope"))) == 0
+    bad = tmp_path / "bad.wfsnap"
+    bad.write_bytes(b"garbage")
+    assert len(SnapshotPack.load(str(bad))) == 0
+    bad.write_bytes(MAGIC + b"\x00\x00\x00\x05xxxxx")
+    assert SnapshotPack.load(str(bad)).get("k") is None
+
+
+def test_damaged_entry_reads_as_missing(tmp_path):
+    data = bytearray(open(write_snapshot(RESULTS, str(tmp_path / "s.wfsnap")), "rb").read())
+    pack = SnapshotPack(bytes(data))
+    (k1_offset, k1_length), (k2_offset, _) = pack._entries["k1"], pack._entries["k2"]
+    data[pack._base + k1_offset + k1_length // 2] ^= 0xFF
+    flipped = SnapshotPack(bytes(data))
+    assert flipped.get("k1") is None and flipped.get("k2") == RESULTS["k2"]
+    truncated = SnapshotPack(bytes(data[:pack._base + k2_offset + 5]))
+    assert truncated.get("k2") is None and truncated.hits == 0
+
+
+def _sweep_file(tmp_path, grid):
+    keys = [make_cache_key(f, PROMPT_VERSION) for f in grid[:4]]
+    records = [
+        {"cache_key": keys[0], "status": "ok", "result": {"a": 1}},
+        {"cache_key": keys[1], "status": "error", "result": None},
+        {"cache_key": keys[2], "status": "cached", "result": {"c": 3}, "contract_errors": []},
+        {"cache_key": keys[3], "status": "ok", "result": {"d": 4}, "contract_errors": ["today_steps: too few"]},
+        {"cache_key": "not-in-grid", "status": "ok", "result": {"x": 0}},
+    ]
+    path = tmp_path / "sweep.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n", encoding="utf-8")
+    return str(path), keys
+
+
+def test_only_successful_current_grid_records_are_packed(tmp_path):
+    path, keys = _sweep_file(tmp_path, template_grid())
+    assert results_from_jsonl(path) == {keys[0]: {"a": 1}, keys[2]: {"c": 3}}
+
+
+def test_cli_build_from_sweep_and_stats(tmp_path, capsys):
+    grid = template_grid()
+    source, _ = _sweep_file(tmp_path, grid)
+    out = str(tmp_path / "s.wfsnap")
+    assert main(["build", "--from", source, "--out", out]) == 0
+    capsys.readouterr()
+    assert main(["stats", out]) == 0
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["entries"] == stats["current"] == 2
+    assert stats["stale"] == 0 and stats["missing"] == len(grid) - 2
+    assert stats["prompt_version"] == PROMPT_VERSION
+
+
+def test_cli_build_needs_a_key_or_a_sweep(monkeypatch, tmp_path):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    assert main(["build", "--out", str(tmp_path / "s.wfsnap")]) == 2
@@ -0,0 +1,87 @@
+import copy
+import threading
+
+import pytest
+
+import rate_limiter
+import speculation
+from engine import Engine
+from helpers import FakeClient, make_fields
+from local_optimizer import optimize_locally
+from prompt_builder import PROMPT_VERSION
+from result_cache import ResultCache, make_cache_key
+from speculation import Speculator
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "results.sqlite3"))
+
+
+@pytest.fixture
+def no_settle(monkeypatch):
+    monkeypatch.setattr(speculation, "SETTLE_SECONDS", 0.0)
+
+
+def test_unstarted_job_is_not_handed_over(fields):
+    spec = Speculator()
+    job = spec.submit("s1", fields, FakeClient(optimize_locally(fields)))
+    assert spec.take("s1", fields) is None
+    assert job.cancelled.is_set()
+    assert spec.stats["not_started"] == 1
+
+
+def test_running_job_is_handed_over(fields, no_settle):
+    gate = threading.Event()
+    client = FakeClient(optimize_locally(fields), gate=gate)
+    spec = Speculator()
+    job = spec.submit("s1", fields, client)
+    assert client.started.wait(5)
+    assert spec.take("s1", fields) is job
+    gate.set()
+    assert job.result(timeout=5) is not None
+
+
+def test_superseded_stream_is_closed_and_refunded(fields, no_settle, monkeypatch):
+    refunds = []
+    limiter = rate_limiter._LIMITER
+    monkeypatch.setattr(limiter, "refund", lambda tokens: refunds.append(tokens))
+    gate = threading.Event()
+    client = FakeClient(optimize_locally(fields), gate=gate)
+    spec = Speculator()
+    first = spec.submit("s1", fields, client)
+    assert client.started.wait(5)
+    spec.cancel("s1")
+    gate.set()
+    assert first.result(timeout=5) is None
+    assert client.streams[0].closed
+    assert len(refunds) == 1 and refunds[0] > 0
+
+
+def test_invalid_result_is_not_cached_and_engine_regenerates(fields, cache, no_settle):
+    good = optimize_locally(fields)
+    bad = copy.deepcopy(good)
+    bad["notes"] = ["only one"]
+    client = FakeClient(bad, {"notes": good["notes"]})
+    spec = Speculator(cache=cache)
+    job = spec.submit("s1", fields, client)
+    assert job.result(timeout=5)["notes"] == ["only one"]
+    key = make_cache_key(fields, PROMPT_VERSION)
+    assert cache.get(key) is None
+    assert spec.stats["invalid"] == 1
+
+    engine = Engine("sk-test", cache=cache)
+    engine._client = client
+    result = engine.generate(fields, speculation=job, use_cache=False)
+    assert result.source == "speculation"
+    assert result.contract_errors == {}
+    assert result.data["notes"] == good["notes"]
+    assert cache.get(key)["notes"] == good["notes"]
+
+
+def test_valid_result_is_cached(cache, no_settle):
+    fields = make_fields()
+    spec = Speculator(cache=cache)
+    job = spec.submit("s1", fields, FakeClient(optimize_locally(fields)))
+    assert job.result(timeout=5) is not None
+    assert cache.get(make_cache_key(fields, PROMPT_VERSION)) is not None
@@ -0,0 +1,58 @@
+import json
+from types import SimpleNamespace
+
+import token_budget
+from token_budget import (
+    FULL_SECTIONS, MAX_BUDGET, MIN_SAMPLES, WIRE_COMPACT, TokenBudget, max_tokens_for, prior_tokens,
+    repair_max_tokens,
+)
+
+
+def _feed(budget: TokenBudget, n: int, per_step: int = 100, fixed: int = 600, finish: str = "stop") -> None:
+    for i in range(n):
+        steps = 4 + i % 9
+        budget.observe(steps, FULL_SECTIONS, fixed + per_step * steps, 4000, finish)
+
+
+def test_prior_grows_with_steps_and_compact_is_smaller():
+    assert prior_tokens(12, FULL_SECTIONS) > prior_tokens(6, FULL_SECTIONS)
+    assert prior_tokens(12, (*FULL_SECTIONS, WIRE_COMPACT)) < prior_tokens(12, FULL_SECTIONS)
+
+
+def test_fitted_budget_covers_observed_need():
+    budget = TokenBudget(None)
+    _feed(budget, MIN_SAMPLES * 2)
+    assert 600 + 100 * 12 <= budget.max_tokens(12) <= (600 + 100 * 12) * 1.3
+    assert budget.max_tokens(6) < budget.max_tokens(12)
+
+
+def test_truncated_samples_raise_the_budget():
+    clean, cut = TokenBudget(None), TokenBudget(None)
+    _feed(clean, MIN_SAMPLES * 2)
+    _feed(cut, MIN_SAMPLES * 2, finish="length")
+    assert cut.max_tokens(8) > clean.max_tokens(8)
+
+
+def test_repair_budget_exceeds_the_one_that_ran_out():
+    for n in (4, 8, 12, 18):
+        assert max_tokens_for(n) < repair_max_tokens(n) <= MAX_BUDGET
+    assert repair_max_tokens(None) == token_budget.FALLBACK_MAX_TOKENS
+
+
+def test_log_is_reloaded_and_stays_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(token_budget, "MAX_LOG_LINES", 50)
+    monkeypatch.setattr(token_budget, "MAX_SAMPLES", 30)
+    path = tmp_path / "usage.jsonl"
+    budget = TokenBudget(str(path))
+    _feed(budget, 200)
+    lines = path.read_text().splitlines()
+    assert len(lines) <= 50
+    assert all(json.loads(line)["shape"] for line in lines)
+    reloaded = TokenBudget(str(path))
+    assert reloaded.max_tokens(10) == budget.max_tokens(10)
+
+
+def test_module_observe_ignores_missing_usage():
+    token_budget.observe(8, FULL_SECTIONS, None, 1000, "stop")
+    token_budget.observe(8, FULL_SECTIONS, SimpleNamespace(completion_tokens=900), 1000, "stop")
+    assert sum(len(q) for q in token_budget.BUDGET._samples.values()) == 1
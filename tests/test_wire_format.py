@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from json_stream import StepStreamParser
+from json_utils import parse_json_safely
+from local_optimizer import optimize_locally
+from prompt_builder import RESULT_DEFAULTS
+from wire_format import CompactStreamParser, decode_compact, decode_step, encode_compact, repair_compact
+
+
+@pytest.fixture
+def full(fields):
+    return optimize_locally(fields)
+
+
+def test_roundtrip_is_exact(fields, full):
+    packed = json.loads(json.dumps(encode_compact(full)))
+    assert decode_compact(packed, fields) == {k: full[k] for k in RESULT_DEFAULTS}
+
+
+def test_full_format_passes_through(fields, full):
+    assert decode_compact(full, fields) is full
+
+
+@pytest.mark.parametrize("key, row", [
+    ("t", ["Probation check-in", "AH"]),
+    ("f", ["Probation check-in", "AH", "C"]),
+    ("f", "not a row"),
+])
+def test_short_rows_are_rejected(key, row):
+    assert decode_step(key, 0, row) is None
+
+
+def test_row_ids_stay_positional(fields):
+    data = decode_compact({"t": [["A", "H", "A"], ["B", "H"], ["C", "E", "C"]]}, fields)
+    assert [s["id"] for s in data["today_steps"]] == ["T1", "T3"]
+
+
+def _is_prefix(repaired: list, original: list) -> bool:
+    return repaired == original[:len(repaired)]
+
+
+def test_truncation_at_every_position_only_keeps_complete_rows(fields, full):
+    raw = json.dumps(encode_compact(full), ensure_ascii=False)
+    expected = {k: full[k] for k in RESULT_DEFAULTS}
+    for cut in range(len(raw) + 1):
+        data = repair_compact(raw[:cut], fields)
+        if data is None:
+            continue
+        for section in ("today_steps", "future_steps", "glossary", "tool_suggestions"):
+            assert _is_prefix(data[section], expected[section]), (cut, section)
+        for section in ("human_shift", "deltas", "notes"):
+            assert _is_prefix(data[section], expected[section]), (cut, section)
+    assert repair_compact(raw, fields) == expected
+
+
+def test_stream_parser_reports_decoded_steps_into_shared_parser(full):
+    raw = json.dumps(encode_compact(full))
+    shared = StepStreamParser()
+    parser = CompactStreamParser(into=shared)
+    events = []
+    for i in range(0, len(raw), 7):
+        events += parser.feed(raw[i:i + 7])
+    assert shared.steps["today_steps"] == full["today_steps"]
+    assert shared.steps["future_steps"] == full["future_steps"]
+    assert len(events) == len(full["today_steps"]) + len(full["future_steps"])
+    assert decode_compact(parse_json_safely(parser.text), {})["future_steps"] == full["future_steps"]
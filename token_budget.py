@@ -0,0 +1,287 @@
+# =========================
+# AI Workflow Optimizer — Per-request max_tokens from observed usage
+#
+# Completion size depends on how many steps the user entered and which
+# sections are asked for, so a fixed max_tokens both truncates long flows
+# (→ repair round-trips) and over-reserves for short ones (→ the TPM limiter
+# holds back tokens that are never used). Every LLM call records
+# (steps, sections, completion_tokens, finish_reason) from resp.usage to a
+# JSONL usage log; per request shape (the set of sections) a line
+#
+#     completion ≈ a + b · steps
+#
+# is fitted to those samples, and the budget is the prediction plus the 95th
+# percentile of the residuals plus SAFETY_MARGIN. Truncated samples are
+# censored (the real need was larger) and count as 1.25 × what was allowed.
+# Shapes with fewer than MIN_SAMPLES samples use a per-section prior, scaled
+# by how the observed requests compare to it. Only the newest MAX_SAMPLES per
+# shape are used, and the log is rewritten with just those once it passes
+# MAX_LOG_LINES, so it stays bounded.
+#
+#   python token_budget.py report      # fits, budgets and replayed truncation vs. logged budgets
+# =========================
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable
+
+from prompt_builder import RESULT_DEFAULTS
+
+DEFAULT_USAGE_LOG = os.environ.get(
+    "WORKFLOW_USAGE_LOG",
+    os.path.join(
+        os.environ.get(
+            "WORKFLOW_CACHE_DIR",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+        ),
+        "usage.jsonl",
+    ),
+)
+
+FULL_SECTIONS = tuple(RESULT_DEFAULTS)
+FALLBACK_MAX_TOKENS = 2000  # no step count known
+
+MIN_SAMPLES = 20
+MAX_SAMPLES = 2000          # per shape, most recent
+MAX_LOG_LINES = 20000       # usage log size that triggers a rewrite with the kept samples
+REFIT_EVERY = 20
+SAFETY_MARGIN = 0.10
+RESIDUAL_QUANTILE = 0.95
+CENSORED_FACTOR = 1.25
+MIN_BUDGET = 200
+MAX_BUDGET = 8000
+
+# Prior: section → (fixed tokens, tokens per input step). About 2000 for a full 12-step result.
+PRIOR = {
+    "functional_domain": (15, 0), "process_workflow": (15, 0), "sub_process": (15, 0), "time_horizon": (15, 0),
+    "today_steps": (10, 40), "future_steps": (10, 50),
+    "human_shift": (100, 0), "deltas": (130, 0), "glossary": (280, 0), "tool_suggestions": (330, 0),
+    "notes": (130, 0),
+}
+PRIOR_OVERHEAD = 40
+# Markers that change the output encoding rather than add a section: prior multiplier.
+WIRE_COMPACT = "wire:compact"
+PRIOR_FACTOR = {WIRE_COMPACT: 0.65}
+
+
+def shape_key(sections: Iterable[str]) -> str:
+    return ",".join(sorted(set(sections)))
+
+def prior_tokens(n_steps: int, sections: Iterable[str]) -> float:
+    total, factor = PRIOR_OVERHEAD, 1.0
+    for s in set(sections):
+        if s in PRIOR_FACTOR:
+            factor *= PRIOR_FACTOR[s]
+            continue
+        fixed, per_step = PRIOR.get(s, (30, 0))
+        total += fixed + per_step * n_steps
+    return total * factor
+
+def _quantile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _target(sample: dict) -> float:
+    """Tokens the request needed (a lower bound inflated when it was cut off)."""
+    if sample.get("finish") == "length":
+        return max(sample["completion"], sample.get("max_tokens") or 0) * CENSORED_FACTOR
+    return sample["completion"]
+
+
+class Fit:
+    """completion ≈ a + b · steps, plus the residual quantile."""
+
+    def __init__(self, samples: list[dict]):
+        xs = [s["steps"] for s in samples]
+        ys = [_target(s) for s in samples]
+        n = len(xs)
+        mx, my = sum(xs) / n, sum(ys) / n
+        var = sum((x - mx) ** 2 for x in xs)
+        self.b = max(0.0, sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var) if var else 0.0
+        self.a = my - self.b * mx
+        self.n = n
+        self.margin = max(0.0, _quantile([y - self.predict(x) for x, y in zip(xs, ys)], RESIDUAL_QUANTILE))
+
+    def predict(self, n_steps: int) -> float:
+        return self.a + self.b * n_steps
+
+    def budget(self, n_steps: int) -> float:
+        return (self.predict(n_steps) + self.margin) * (1 + SAFETY_MARGIN)
+
+
+class TokenBudget:
+    """max_tokens per request shape; thread-safe, samples appended to a JSONL usage log."""
+
+    def __init__(self, path: str | None = DEFAULT_USAGE_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque] = {}
+        self._fits: dict[str, tuple[int, Fit]] = {}  # shape → (sample count at fit time, fit)
+        self._prior_scale: float | None = None
+        self._added = 0
+        self._lines = 0  # lines in the usage log
+        self._loaded = path is None
+
+    def _load(self) -> None:
+        """Read the usage log once, on first use."""
+        self._loaded = True
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    self._lines += 1
+                    try:
+                        self._add(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError:
+            pass
+        if self._lines > MAX_LOG_LINES:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the usage log with only the samples still in use (best-effort: another
+        process appending at the same moment may lose that sample)."""
+        samples = sorted((s for q in self._samples.values() for s in q), key=lambda s: s.get("t", 0))
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                for s in samples:
+                    fh.write(json.dumps(s) + "\n")
+            os.replace(tmp, self.path)
+            self._lines = len(samples)
+        except OSError:
+            pass
+
+    def _add(self, sample: dict) -> None:
+        key = sample["shape"]
+        self._samples.setdefault(key, deque(maxlen=MAX_SAMPLES)).append(sample)
+        self._added += 1
+        if self._added % REFIT_EVERY == 0:
+            self._prior_scale = None
+
+    def _fit(self, key: str) -> Fit | None:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < MIN_SAMPLES:
+            return None
+        cached = self._fits.get(key)
+        if cached is None or len(samples) - cached[0] >= REFIT_EVERY or len(samples) < cached[0]:
+            cached = self._fits[key] = (len(samples), Fit(list(samples)))
+        return cached[1]
+
+    def _scale(self) -> float:
+        """How observed needs compare with the prior (90th percentile ratio), for unfitted shapes."""
+        if self._prior_scale is None:
+            ratios = [
+                _target(s) / prior_tokens(s["steps"], s["shape"].split(","))
+                for samples in self._samples.values() for s in samples
+            ]
+            self._prior_scale = min(2.0, max(0.5, _quantile(ratios, 0.9))) if len(ratios) >= MIN_SAMPLES else 1.0
+        return self._prior_scale
+
+    def max_tokens(self, n_steps: int, sections: Iterable[str] = FULL_SECTIONS) -> int:
+        key = shape_key(sections)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            fit = self._fit(key)
+            if fit is not None:
+                budget = fit.budget(n_steps)
+            else:
+                budget = prior_tokens(n_steps, key.split(",")) * self._scale() * (1 + SAFETY_MARGIN)
+        return int(min(MAX_BUDGET, max(MIN_BUDGET, math.ceil(budget))))
+
+    def observe(
+        self, n_steps: int, sections: Iterable[str], completion_tokens: int, max_tokens: int, finish: str | None,
+    ) -> None:
+        """Record one completion's usage (finish = the choice's finish_reason)."""
+        sample = {
+            "t": round(time.time(), 3), "shape": shape_key(sections), "steps": int(n_steps),
+            "completion": int(completion_tokens), "max_tokens": int(max_tokens), "finish": finish,
+        }
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._add(sample)
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as fh:
+                        fh.write(json.dumps(sample) + "\n")
+                    self._lines += 1
+                except OSError:
+                    pass  # calibration is best-effort
+                if self._lines > MAX_LOG_LINES:
+                    self._compact()
+
+    def report(self) -> list[dict]:
+        """Per shape: fit, budgets at typical sizes, and logged vs. replayed truncation / reservation."""
+        rows = []
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            keys = sorted(self._samples, key=lambda k: -len(self._samples[k]))
+        for key in keys:
+            samples = list(self._samples[key])
+            sections = key.split(",")
+            budgets = [self.max_tokens(s["steps"], sections) for s in samples]
+            with self._lock:
+                fit = self._fit(key)
+            rows.append({
+                "shape": key if key != shape_key(FULL_SECTIONS) else "(full result)",
+                "samples": len(samples),
+                "fit": {"a": round(fit.a, 1), "b": round(fit.b, 1), "margin": round(fit.margin, 1)} if fit else None,
+                "budget_at": {n: self.max_tokens(n, sections) for n in (6, 12, 18)},
+                "logged_mean_max_tokens": round(sum(s["max_tokens"] for s in samples) / len(samples), 1),
+                "new_mean_max_tokens": round(sum(budgets) / len(budgets), 1),
+                "logged_truncation_rate": round(sum(s["finish"] == "length" for s in samples) / len(samples), 4),
+                # Would this budget have cut the (uncensored) completions we saw?
+                "replayed_truncation_rate": round(
+                    sum(_target(s) > b for s, b in zip(samples, budgets)) / len(samples), 4
+                ),
+            })
+        return rows
+
+
+BUDGET = TokenBudget()
+
+
+def max_tokens_for(n_steps: int | None, sections: Iterable[str] = FULL_SECTIONS) -> int:
+    """Budget for a request over `sections` for a workflow of n_steps steps."""
+    if n_steps is None:
+        return FALLBACK_MAX_TOKENS
+    return BUDGET.max_tokens(n_steps, sections)
+
+def repair_max_tokens(n_steps: int | None, sections: Iterable[str] = FULL_SECTIONS) -> int:
+    """Budget for re-emitting a whole result after a truncation: above the budget that just ran out."""
+    if n_steps is None:
+        return FALLBACK_MAX_TOKENS
+    budget = math.ceil(max_tokens_for(n_steps, sections) * CENSORED_FACTOR)
+    return int(min(MAX_BUDGET, max(FALLBACK_MAX_TOKENS, budget)))
+
+def observe(n_steps: int | None, sections: Iterable[str], usage, max_tokens: int, finish: str | None) -> None:
+    completion = getattr(usage, "completion_tokens", None)
+    if n_steps is None or completion is None:
+        return
+    BUDGET.observe(n_steps, sections, completion, max_tokens, finish)
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fitted max_tokens budgets from the usage log.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--log", default=DEFAULT_USAGE_LOG)
+    args = parser.parse_args(argv)
+    print(json.dumps(TokenBudget(args.log).report(), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
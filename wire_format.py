@@ -0,0 +1,256 @@
+# =========================
+# AI Workflow Optimizer — Compact wire format (optional)
+#
+# The normal output repeats every key (label, actor, intent, maps_to,
+# tool_category, use_in_workflow, fit_notes, ...) for every element, and those
+# repeated keys are a large share of the completion tokens. In compact mode
+# the model returns one-letter sections holding positional tuples, with enum
+# codes for actors and intents, integer step references and implicit ids:
+#
+#   {"t": [["Invoice intake", "H", "A"], ...],
+#    "f": [["Auto capture", "AE", "A", [1, 2]], ...],
+#    "h": [...], "x": [...], "g": [[term, definition], ...],
+#    "u": [[category, [tools], use, fit], ...], "n": [...]}
+#
+# decode_compact() expands that into exactly the dict the renderer and the
+# validator read (text fields are filled from the request, not generated).
+# Rows with fewer fields than their section's arity are dropped, never padded
+# with defaults, and repair_compact() only cuts a truncated reply between rows.
+#
+#   python wire_format.py bench [--from sweep.jsonl]   # completion tokens vs. the full format
+# =========================
+
+import json
+import sys
+
+from json_stream import StepStreamParser
+from json_utils import repair_truncated_json
+from token_budget import WIRE_COMPACT
+from prompt_builder import (
+    INTENTS, RESULT_DEFAULTS, RULES_BLOCK, SYSTEM_MESSAGE, TOOL_LIBRARY_BLOCK, build_context_block,
+    normalize_actor,
+)
+
+ACTOR_CODES = {"H": "HUMAN", "E": "ERP", "A": "AI", "AH": "AI+HUMAN", "AE": "AI+ERP", "AEH": "AI+ERP+HUMAN"}
+INTENT_CODES = {i[0]: i for i in INTENTS}  # A / C / D / R
+ACTOR_TO_CODE = {v: k for k, v in ACTOR_CODES.items()}
+INTENT_TO_CODE = {v: k for k, v in INTENT_CODES.items()}
+
+# Compact key → full section.
+SECTIONS = {
+    "t": "today_steps", "f": "future_steps", "h": "human_shift", "x": "deltas",
+    "g": "glossary", "u": "tool_suggestions", "n": "notes",
+}
+COMPACT_DEFAULTS = {k: [] for k in SECTIONS}
+# Fields per row; shorter rows are incomplete.
+ROW_ARITY = {"t": 3, "f": 4, "g": 2, "u": 4}
+# Rows sit at depth 3 (root object → section array → row): cut a truncated reply at depth 2 at most.
+ROW_DEPTH = 2
+# Shape for token_budget: the generated sections, compactly encoded.
+COMPACT_SIZING = (*SECTIONS.values(), WIRE_COMPACT)
+TEXT_FIELDS = ("functional_domain", "process_workflow", "sub_process", "time_horizon")  # taken from the request
+
+COMPACT_SCHEMA_BLOCK = """
+Compact JSON output (exact keys, positional arrays, no other keys):
+t: today steps, array of 6–12 [label, actor, intent]; ids are implicit: T1, T2, ... in order
+f: future steps, array of 6–12 [label, actor, intent, [numbers of the today steps it replaces/absorbs]]
+actor codes: H=HUMAN, E=ERP, A=AI, AH=AI+HUMAN, AE=AI+ERP, AEH=AI+ERP+HUMAN (today: H or E only)
+intent codes: A=Admin, C=Control, D=Decision, R=Relationship
+h: human_shift, array of 3 strings
+x: deltas, array of 4 strings
+g: glossary, array of 6 [term, definition]
+u: tool_suggestions, array of 4 [tool_category, [1–3 example tools], use_in_workflow, fit_notes]
+n: notes, array of 3 strings
+Example: {"t":[["Receive invoice","H","A"]],"f":[["Auto capture","AE","A",[1]]],...}
+""".strip()
+
+# Same rules and tool library as the full prompt; only the schema differs.
+COMPACT_SYSTEM_PROMPT = "\n\n".join([SYSTEM_MESSAGE, RULES_BLOCK, TOOL_LIBRARY_BLOCK, COMPACT_SCHEMA_BLOCK])
+
+
+def build_compact_messages(fields: dict) -> list[dict]:
+    return [
+        {"role": "system", "content": COMPACT_SYSTEM_PROMPT},
+        {"role": "user", "content": build_context_block(fields)},
+    ]
+
+
+# -------------------------
+# Decode / encode
+# -------------------------
+def _at(row: list, i: int, default=""):
+    return row[i] if len(row) > i and row[i] is not None else default
+
+def _actor(code) -> str:
+    code = str(code or "").strip().upper()
+    return ACTOR_CODES.get(code) or normalize_actor(code)
+
+def _intent(code) -> str:
+    code = str(code or "").strip()
+    return INTENT_CODES.get(code[:1].upper(), code) if len(code) <= 1 else code.capitalize()
+
+def _today_ref(ref) -> str:
+    ref = str(ref).strip().upper()
+    return ref if ref.startswith("T") else f"T{ref}"
+
+def decode_step(key: str, index: int, row) -> dict | None:
+    """One compact step tuple → the step dict (index is 0-based within its list)."""
+    if isinstance(row, dict):
+        return row  # already in the full format
+    if not isinstance(row, list) or len(row) < ROW_ARITY[key]:
+        return None
+    step = {
+        "id": f"{'T' if key == 't' else 'F'}{index + 1}",
+        "label": str(_at(row, 0)),
+        "actor": _actor(_at(row, 1, "H")),
+        "intent": _intent(_at(row, 2, "A")),
+    }
+    if key == "f":
+        refs = _at(row, 3, [])
+        step["maps_to"] = [_today_ref(r) for r in (refs if isinstance(refs, list) else [refs])]
+    return step
+
+def _pairs(rows, keys: tuple[str, ...]) -> list:
+    out = []
+    for row in rows if isinstance(rows, list) else []:
+        if isinstance(row, dict):
+            out.append(row)
+        elif isinstance(row, list) and len(row) >= len(keys):
+            item = {k: _at(row, i) for i, k in enumerate(keys)}
+            if "example_tools" in item and not isinstance(item["example_tools"], list):
+                item["example_tools"] = [item["example_tools"]] if item["example_tools"] else []
+            out.append(item)
+    return out
+
+def decode_compact(obj, fields: dict) -> dict:
+    """Compact result → the full result dict (a full-format object passes through unchanged)."""
+    if not isinstance(obj, dict) or "today_steps" in obj or "future_steps" in obj:
+        return obj
+    data = {k: fields.get(k, "") for k in TEXT_FIELDS}
+    for key in ("t", "f"):
+        rows = obj.get(key) if isinstance(obj.get(key), list) else []
+        data[SECTIONS[key]] = [s for s in (decode_step(key, i, r) for i, r in enumerate(rows)) if s is not None]
+    for key in ("h", "x", "n"):
+        rows = obj.get(key)
+        data[SECTIONS[key]] = [str(r) for r in rows] if isinstance(rows, list) else []
+    data["glossary"] = _pairs(obj.get("g"), ("term", "definition"))
+    data["tool_suggestions"] = _pairs(obj.get("u"), ("tool_category", "example_tools", "use_in_workflow", "fit_notes"))
+    return {k: data.get(k, RESULT_DEFAULTS[k]) for k in RESULT_DEFAULTS}
+
+def repair_compact(raw: str, fields: dict) -> dict | None:
+    """Close a truncated compact reply at the last complete row and decode it (None if nothing usable)."""
+    obj = repair_truncated_json(raw, COMPACT_DEFAULTS, max_depth=ROW_DEPTH)
+    return decode_compact(obj, fields) if obj is not None else None
+
+def encode_compact(data: dict) -> dict:
+    """Full result → compact form (what a compact-mode model returns for the same content)."""
+    today = data.get("today_steps") or []
+    index = {s.get("id"): i + 1 for i, s in enumerate(today)}
+    return {
+        "t": [[s.get("label", ""), ACTOR_TO_CODE.get(s.get("actor"), "H"), INTENT_TO_CODE.get(s.get("intent"), "A")]
+              for s in today],
+        "f": [[s.get("label", ""), ACTOR_TO_CODE.get(s.get("actor"), "H"), INTENT_TO_CODE.get(s.get("intent"), "A"),
+               [index[m] for m in s.get("maps_to") or [] if m in index]]
+              for s in data.get("future_steps") or []],
+        "h": list(data.get("human_shift") or []),
+        "x": list(data.get("deltas") or []),
+        "g": [[g.get("term", ""), g.get("definition", "")] for g in data.get("glossary") or []],
+        "u": [[t.get("tool_category", ""), list(t.get("example_tools") or []), t.get("use_in_workflow", ""),
+               t.get("fit_notes", "")] for t in data.get("tool_suggestions") or []],
+        "n": list(data.get("notes") or []),
+    }
+
+
+class CompactStreamParser(StepStreamParser):
+    """Reports decoded step dicts from a streamed compact completion.
+
+    `into`: another parser whose `steps` dict should receive the decoded steps
+    (the single-flight parser that followers read).
+    """
+
+    def __init__(self, into: StepStreamParser | None = None):
+        super().__init__(watch=("t", "f"), item="[")
+        self.steps = into.steps if into is not None else {"today_steps": [], "future_steps": []}
+        self._rows = {"t": 0, "f": 0}  # ids are positional, so dropped rows still count
+
+    def _emit(self, key: str, obj) -> tuple[str, dict] | None:
+        section = SECTIONS[key]
+        step = decode_step(key, self._rows[key], obj)
+        self._rows[key] += 1
+        if step is None:
+            return None
+        self.steps[section].append(step)
+        return section, step
+
+
+# -------------------------
+# Benchmark: completion tokens, full vs. compact
+# -------------------------
+def token_counter():
+    """(name, count) — the model's tokenizer when tiktoken is installed, else ~4 chars per token."""
+    try:
+        import tiktoken
+    except ImportError:
+        return "chars/4", lambda text: max(1, len(text) // 4)
+    enc = tiktoken.get_encoding("o200k_base")
+    return "o200k_base", lambda text: len(enc.encode(text))
+
+def bench(results: list[tuple[dict, dict]]) -> dict:
+    """Token counts of each result serialized both ways, plus decode(encode(x)) == x (generated sections)."""
+    name, count = token_counter()
+    full, compact, mismatches = [], [], 0
+    for fields, data in results:
+        packed = encode_compact(data)
+        full.append(count(json.dumps(data, ensure_ascii=False)))
+        compact.append(count(json.dumps(packed, ensure_ascii=False)))
+        decoded = decode_compact(packed, fields)
+        if any(decoded[k] != data.get(k, RESULT_DEFAULTS[k]) for k in SECTIONS.values()):
+            mismatches += 1
+    n = len(full)
+    ratios = sorted(c / f for c, f in zip(compact, full))
+    return {
+        "tokenizer": name,
+        "results": n,
+        "full_mean": round(sum(full) / n, 1),
+        "compact_mean": round(sum(compact) / n, 1),
+        "saved_mean": round(1 - sum(compact) / sum(full), 4),
+        "ratio_p50": round(ratios[n // 2], 4),
+        "ratio_max": round(ratios[-1], 4),
+        "roundtrip_mismatches": mismatches,
+    }
+
+def _library_results() -> list[tuple[dict, dict]]:
+    from local_optimizer import optimize_locally
+    from snapshot_pack import template_grid
+
+    return [(f, optimize_locally(f)) for f in template_grid()]
+
+def _recorded_results(path: str) -> list[tuple[dict, dict]]:
+    out = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            rec = json.loads(line)
+            if rec.get("status") in ("ok", "repaired", "cached") and isinstance(rec.get("result"), dict):
+                out.append((rec, rec["result"]))  # sweep records carry the request's text fields
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compact wire format tools.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="completion tokens: full vs. compact format")
+    b.add_argument("--from", dest="source", help="batch_sweep.py JSONL with recorded model results")
+    args = parser.parse_args(argv)
+
+    results = _recorded_results(args.source) if args.source else _library_results()
+    if not results:
+        print("no results to compare", file=sys.stderr)
+        return 1
+    print(json.dumps(bench(results), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())